@@ -0,0 +1,193 @@
+"""
+Servidor local que imita lo que usa api/google_sync.py de la API de Google
+Calendar, para probar y medir la sincronización sin salir a Internet.
+
+    GET  /calendar/v3/calendars/<id>/events   events.list (pageToken, syncToken, maxResults)
+    POST /token                               refresco del access token
+    POST /_stub/mutate?updated=N&cancelled=M  cambia eventos (genera trabajo incremental)
+    POST /_stub/expire                        invalida los sync tokens (→ 410)
+
+Cada calendario (uno por access token) tiene --events eventos deterministas. Los
+sync tokens son "v<versión>": con syncToken solo se devuelve lo cambiado desde esa
+versión. Con --rate-limit-every N una de cada N peticiones responde 429 con
+Retry-After, para ver el backoff. El token "expired" responde 401.
+
+    $ python benchmarks/google_stub.py --port 8765 --events 5000
+    $ GOOGLE_API_BASE_URL=http://localhost:8765/calendar/v3 \\
+      GOOGLE_TOKEN_URL=http://localhost:8765/token flask google-sync
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class Store:
+    """Eventos por calendario con la versión en la que cambiaron por última vez."""
+
+    def __init__(self, events: int, seed: int):
+        self.events = events
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.version = 1
+        self.min_version = 1
+        self.calendars = {}
+        self.requests = 0
+
+    def _calendar(self, key: str) -> dict:
+        cal = self.calendars.get(key)
+        if cal is None:
+            rng = random.Random(f"{self.seed}:{key}")
+            start = datetime(2025, 1, 1)
+            cal = self.calendars[key] = {}
+            for i in range(self.events):
+                cal[f"evt{i:07d}"] = (_make_event(f"evt{i:07d}", rng, start), 1)
+        return cal
+
+    def list(self, key: str, since: int, offset: int, limit: int):
+        with self.lock:
+            cal = self._calendar(key)
+            if since:
+                # Incremental: todo lo cambiado, incluidos los cancelados
+                items = [ev for ev, v in cal.values() if v > since]
+            else:
+                items = [ev for ev, _ in cal.values() if ev["status"] != "cancelled"]
+            return items[offset:offset + limit], len(items), self.version
+
+    def mutate(self, updated: int, cancelled: int):
+        with self.lock:
+            self.version += 1
+            rng = random.Random(self.version)
+            for cal in self.calendars.values():
+                ids = list(cal)
+                for gid in rng.sample(ids, min(updated, len(ids))):
+                    ev = dict(cal[gid][0], summary=f"Editado v{self.version}")
+                    cal[gid] = (ev, self.version)
+                for gid in rng.sample(ids, min(cancelled, len(ids))):
+                    cal[gid] = ({"id": gid, "status": "cancelled"}, self.version)
+            return self.version
+
+
+def _make_event(gid: str, rng, start: datetime) -> dict:
+    day = start + timedelta(days=rng.randrange(365))
+    if rng.random() < 0.1:
+        return {"id": gid, "status": "confirmed", "summary": "Todo el día",
+                "start": {"date": day.date().isoformat()},
+                "end": {"date": (day + timedelta(days=1)).date().isoformat()}}
+    begin = day + timedelta(hours=rng.randrange(8, 19))
+    return {"id": gid, "status": "confirmed", "summary": f"Evento {gid}",
+            "description": "stub",
+            "start": {"dateTime": begin.isoformat() + "+02:00"},
+            "end": {"dateTime": (begin + timedelta(minutes=60)).isoformat() + "+02:00"}}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, como Google
+    store: Store = None
+    rate_limit_every = 0
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode()
+        if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            data = gzip.compress(data)
+            headers = dict(headers or {}, **{"Content-Encoding": "gzip"})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, reason: str, retry_after: int = None):
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+        self._send(status, {"error": {"code": status, "message": reason,
+                                      "errors": [{"reason": reason}]}}, headers)
+
+    def _rate_limited(self) -> bool:
+        with self.store.lock:
+            self.store.requests += 1
+            n = self.store.requests
+        if self.rate_limit_every and n % self.rate_limit_every == 0:
+            self._error(429, "rateLimitExceeded", retry_after=0)
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 5 or parts[2] != "calendars" or parts[4] != "events":
+            return self._error(404, "notFound")
+        token = (self.headers.get("Authorization") or "").removeprefix("Bearer ")
+        if not token or token == "expired":
+            return self._error(401, "authError")
+        if self._rate_limited():
+            return
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        limit = min(int(q.get("maxResults", 250)), 2500)
+        if "pageToken" in q:
+            since, offset = (int(x) for x in q["pageToken"].split(":"))
+        elif "syncToken" in q:
+            since, offset = int(q["syncToken"].lstrip("v")), 0
+            if since < self.store.min_version:
+                return self._error(410, "fullSyncRequired")
+        else:
+            since, offset = 0, 0
+        items, total, version = self.store.list(f"{token}:{parts[3]}", since, offset, limit)
+        body = {"items": items}
+        if offset + limit < total:
+            body["nextPageToken"] = f"{since}:{offset + limit}"
+        else:
+            body["nextSyncToken"] = f"v{version}"
+        self._send(200, body)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode()) if length else {}
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/token":
+            if form.get("refresh_token", [""])[0] == "revoked":
+                return self._send(400, {"error": "invalid_grant"})
+            return self._send(200, {"access_token": f"stub-{form.get('refresh_token', ['x'])[0]}",
+                                    "expires_in": 3599})
+        if url.path == "/_stub/mutate":
+            version = self.store.mutate(int(q.get("updated", 10)), int(q.get("cancelled", 0)))
+            return self._send(200, {"version": version})
+        if url.path == "/_stub/expire":
+            with self.store.lock:
+                self.store.version += 1
+                self.store.min_version = self.store.version
+            return self._send(200, {"min_version": self.store.min_version})
+        self._error(404, "notFound")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--events", type=int, default=1000, help="eventos por calendario")
+    parser.add_argument("--rate-limit-every", type=int, default=0,
+                        help="responde 429 a una de cada N peticiones (0 = nunca)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    Handler.store = Store(args.events, args.seed)
+    Handler.rate_limit_every = args.rate_limit_every
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Google Calendar stub en http://{args.host}:{args.port}/calendar/v3")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
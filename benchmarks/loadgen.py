@@ -0,0 +1,273 @@
+"""
+Generador de carga que simula clientes del calendario contra una app en marcha.
+
+Solo usa la librería estándar (hilos + http.client), así se puede lanzar desde
+cualquier máquina sin instalar nada. Cada usuario virtual abre una conexión
+keep-alive y repite una sesión realista:
+
+    login → barra lateral (calendarios + grupos de tareas) → vista de mes
+    (GET /api/events?start=&end=) → a veces edita un evento o marca una tarea
+
+con un tiempo de espera ("think time") exponencial entre acciones. Al terminar
+muestra throughput, distribución de latencias y errores por operación.
+
+Los usuarios salen de `flask seed` (seed<id>@seed.local / 123456):
+
+    $ pipenv run start                      # o gunicorn con la config a probar
+    $ python benchmarks/loadgen.py --url http://localhost:3001 \\
+          --concurrency 50 --duration 60 --user-ids 1-1000
+
+Sirve para dimensionar workers/hilos de gunicorn y el pool de la BD: repetir con
+distintas configuraciones y comparar el throughput y el p95 con los mismos
+parámetros de carga.
+"""
+import argparse
+import gzip
+import http.client
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class Stats:
+    """Latencias y errores por operación, compartidos por todos los hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def record(self, op: str, ms: float, status):
+        with self._lock:
+            self.latencies.setdefault(op, []).append(ms)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if not isinstance(status, int) or status >= 400:
+                self.errors[op] = self.errors.get(op, 0) + 1
+
+    def report(self, elapsed: float) -> dict:
+        with self._lock:
+            ops = {}
+            for op, values in sorted(self.latencies.items()):
+                values = sorted(values)
+                ops[op] = {
+                    "requests": len(values),
+                    "errors": self.errors.get(op, 0),
+                    "rps": round(len(values) / elapsed, 2),
+                    "p50_ms": _percentile(values, 50),
+                    "p90_ms": _percentile(values, 90),
+                    "p95_ms": _percentile(values, 95),
+                    "p99_ms": _percentile(values, 99),
+                    "max_ms": round(values[-1], 2),
+                    "mean_ms": round(statistics.fmean(values), 2),
+                }
+            total = sum(o["requests"] for o in ops.values())
+            errors = sum(o["errors"] for o in ops.values())
+            return {
+                "seconds": round(elapsed, 2),
+                "requests": total,
+                "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+                "error_rate": round(errors / total, 4) if total else None,
+                "statuses": {str(k): v for k, v in sorted(self.statuses.items(), key=str)},
+                "operations": ops,
+            }
+
+
+def _percentile(sorted_values: list, p: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 2)
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, args, user_id: int, stats: Stats, stop: threading.Event, seed: int):
+        super().__init__(daemon=True)
+        self.args = args
+        self.user_id = user_id
+        self.email = args.email_pattern.format(user_id)
+        self.stats = stats
+        self.stop_event = stop
+        self.rng = random.Random(seed)
+        url = urlsplit(args.url)
+        self.host, self.port = url.hostname, url.port
+        self.https = url.scheme == "https"
+        self.conn = None
+        self.token = None
+        self.events = []
+        self.tasks = []
+
+    # ---------- HTTP ----------
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.conn = cls(self.host, self.port, timeout=self.args.timeout)
+
+    def request(self, op: str, method: str, path: str, body=None):
+        headers = {"Accept": "application/json", "Accept-Encoding": "gzip"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+
+        started = time.perf_counter()
+        try:
+            if self.conn is None:
+                self._connect()
+            self.conn.request(method, path, body=data, headers=headers)
+            resp = self.conn.getresponse()
+            payload = resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException) as e:
+            # Conexión caída (p. ej. worker reiniciado): se reabre en la siguiente
+            self.conn.close()
+            self.conn = None
+            self.stats.record(op, (time.perf_counter() - started) * 1000, type(e).__name__)
+            return None
+        self.stats.record(op, (time.perf_counter() - started) * 1000, status)
+        if status >= 400 or not payload:
+            return None
+        try:
+            if resp.getheader("Content-Encoding") == "gzip":
+                payload = gzip.decompress(payload)
+            return json.loads(payload)
+        except (ValueError, OSError):
+            return None
+
+    # ---------- sesión ----------
+
+    def think(self):
+        if self.args.think_time > 0:
+            self.stop_event.wait(self.rng.expovariate(1 / self.args.think_time))
+
+    def login(self) -> bool:
+        data = self.request("login", "POST", "/api/login",
+                            {"email": self.email, "password": self.args.password})
+        self.token = (data or {}).get("token")
+        return self.token is not None
+
+    def sidebar(self):
+        self.request("sidebar.calendars", "GET", "/api/calendars")
+        groups = self.request("sidebar.task_groups", "GET", "/api/task-groups") or []
+        self.tasks = [t for g in groups for t in g.get("tasks", [])]
+
+    def month_view(self):
+        month = self.rng.randint(1, 12)
+        year = self.args.year
+        end = f"{year + 1}-01-01" if month == 12 else f"{year}-{month + 1:02d}-01"
+        self.events = self.request(
+            "month_view", "GET", f"/api/events?start={year}-{month:02d}-01&end={end}") or []
+
+    def edit_event(self):
+        if not self.events:
+            return
+        ev = self.rng.choice(self.events)
+        self.request("edit_event", "PUT", f"/api/events/{ev['id']}",
+                     {"description": f"loadgen {time.time():.0f}"})
+
+    def toggle_task(self):
+        if not self.tasks:
+            return
+        task = self.rng.choice(self.tasks)
+        task["status"] = not task.get("status")
+        self.request("toggle_task", "PUT",
+                     f"/api/users/{self.user_id}/tasks/{task['id']}",
+                     {"status": task["status"]})
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if not self.login():
+                self.stop_event.wait(1)
+                continue
+            self.think()
+            # Una "sesión" de navegador: varias vistas de mes con ediciones ocasionales
+            for _ in range(self.args.actions_per_session):
+                if self.stop_event.is_set():
+                    break
+                self.sidebar()
+                self.think()
+                self.month_view()
+                self.think()
+                if self.rng.random() < self.args.edit_ratio:
+                    self.edit_event()
+                    self.think()
+                if self.rng.random() < self.args.toggle_ratio:
+                    self.toggle_task()
+                    self.think()
+        if self.conn is not None:
+            self.conn.close()
+
+
+def _parse_ids(value: str) -> list:
+    ids = []
+    for part in value.split(","):
+        if "-" in part:
+            lo, hi = part.split("-")
+            ids.extend(range(int(lo), int(hi) + 1))
+        elif part:
+            ids.append(int(part))
+    return ids
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:3001")
+    parser.add_argument("--concurrency", type=int, default=10, help="usuarios virtuales")
+    parser.add_argument("--duration", type=float, default=30, help="segundos de carga")
+    parser.add_argument("--ramp-up", type=float, default=5,
+                        help="segundos en los que se van arrancando los usuarios")
+    parser.add_argument("--think-time", type=float, default=1.0,
+                        help="media (s) de la espera entre acciones; 0 = sin esperas")
+    parser.add_argument("--actions-per-session", type=int, default=10)
+    parser.add_argument("--edit-ratio", type=float, default=0.2)
+    parser.add_argument("--toggle-ratio", type=float, default=0.3)
+    parser.add_argument("--user-ids", default="1-100", help="p. ej. 1-1000 o 3,5,8")
+    parser.add_argument("--email-pattern", default="seed{}@seed.local")
+    parser.add_argument("--password", default="123456")
+    parser.add_argument("--year", type=int, default=2025, help="año de la vista de mes")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="guarda el informe en JSON")
+    args = parser.parse_args(argv)
+
+    user_ids = _parse_ids(args.user_ids)
+    stats = Stats()
+    stop = threading.Event()
+    users = []
+    started = time.perf_counter()
+    try:
+        for i in range(args.concurrency):
+            vu = VirtualUser(args, user_ids[i % len(user_ids)], stats, stop, args.seed + i)
+            vu.start()
+            users.append(vu)
+            if args.ramp_up and args.concurrency > 1:
+                stop.wait(args.ramp_up / args.concurrency)
+        stop.wait(max(0.0, args.duration - (time.perf_counter() - started)))
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    for vu in users:
+        vu.join(args.timeout)
+    report = stats.report(time.perf_counter() - started)
+    report["concurrency"] = args.concurrency
+
+    print(f"{'operación':<22} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} "
+          f"{'p95':>8} {'p99':>8} {'max':>8}")
+    for op, r in report["operations"].items():
+        print(f"{op:<22} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['max_ms']:>8}")
+    print(f"\n{report['requests']} peticiones en {report['seconds']} s → "
+          f"{report['throughput_rps']} req/s, errores {report['error_rate']}, "
+          f"status {report['statuses']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["requests"] == 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""ON DELETE CASCADE on child foreign keys and indexes on them
+
+Revision ID: 4c496ddd27cd
+Revises: 17cbff0c09c0
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4c496ddd27cd'
+down_revision = '17cbff0c09c0'
+branch_labels = None
+depends_on = None
+
+# (tabla, constraint por defecto de Postgres, columna, tabla referenciada)
+FOREIGN_KEYS = [
+    ('event', 'event_user_id_fkey', 'user_id', 'user'),
+    ('task', 'task_user_id_fkey', 'user_id', 'user'),
+    ('task', 'task_task_group_id_fkey', 'task_group_id', 'task_group'),
+    ('task_group', 'task_group_user_id_fkey', 'user_id', 'user'),
+    ('calendar', 'calendar_user_id_fkey', 'user_id', 'user'),
+]
+
+
+def upgrade():
+    for table, name, column, referred in FOREIGN_KEYS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete='CASCADE')
+
+    # Índices para que el borrado en cascada (y los listados) no recorran toda la tabla
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.create_index('ix_event_calendar_id', ['calendar_id'], unique=False)
+        batch_op.create_index('ix_event_user_id_start_date', ['user_id', 'start_date'], unique=False)
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.create_index('ix_task_task_group_id', ['task_group_id'], unique=False)
+        batch_op.create_index('ix_task_user_id', ['user_id'], unique=False)
+    with op.batch_alter_table('task_group', schema=None) as batch_op:
+        batch_op.create_index('ix_task_group_user_id', ['user_id'], unique=False)
+    with op.batch_alter_table('calendar', schema=None) as batch_op:
+        batch_op.create_index('ix_calendar_user_id', ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('calendar', schema=None) as batch_op:
+        batch_op.drop_index('ix_calendar_user_id')
+    with op.batch_alter_table('task_group', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_group_user_id')
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_user_id')
+        batch_op.drop_index('ix_task_task_group_id')
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.drop_index('ix_event_user_id_start_date')
+        batch_op.drop_index('ix_event_calendar_id')
+
+    for table, name, column, referred in FOREIGN_KEYS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referred, [column], ['id'])
@@ -0,0 +1,38 @@
+"""user_shard directory and shard_id_sequence for event/task sharding
+
+Revision ID: a94c2e7d5b13
+Revises: f3b8d61a5c27
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a94c2e7d5b13'
+down_revision = 'f3b8d61a5c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Las tablas de los shards no van en las migraciones: las crea `flask shards-init`
+    op.create_table('user_shard',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.String(length=50), nullable=False),
+    sa.Column('moving', sa.Boolean(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('shard_id_sequence',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('next_id', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('shard_id_sequence')
+    op.drop_table('user_shard')
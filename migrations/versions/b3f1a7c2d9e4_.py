@@ -0,0 +1,42 @@
+"""google_sync_state table and unique (user_id, google_event_id) on event
+
+Revision ID: b3f1a7c2d9e4
+Revises: 4c496ddd27cd
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f1a7c2d9e4'
+down_revision = '4c496ddd27cd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('google_sync_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('calendar_id', sa.Integer(), nullable=True),
+    sa.Column('google_calendar_id', sa.String(length=255), nullable=False),
+    sa.Column('sync_token', sa.Text(), nullable=True),
+    sa.Column('last_synced_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['calendar_id'], ['calendar.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.create_index('ux_event_user_id_google_event_id',
+                              ['user_id', 'google_event_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.drop_index('ux_event_user_id_google_event_id')
+
+    op.drop_table('google_sync_state')
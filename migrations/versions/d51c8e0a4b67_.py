@@ -0,0 +1,57 @@
+"""reminder and scheduler_lease tables
+
+Revision ID: d51c8e0a4b67
+Revises: b3f1a7c2d9e4
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd51c8e0a4b67'
+down_revision = 'b3f1a7c2d9e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reminder',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=True),
+    sa.Column('task_id', sa.Integer(), nullable=True),
+    sa.Column('minutes_before', sa.Integer(), nullable=False),
+    sa.Column('remind_at', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['task_id'], ['task.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('reminder', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_reminder_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_reminder_event_id'), ['event_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_reminder_task_id'), ['task_id'], unique=False)
+        batch_op.create_index('ix_reminder_pending_remind_at', ['remind_at'], unique=False,
+                              postgresql_where=sa.text('sent_at IS NULL'),
+                              sqlite_where=sa.text('sent_at IS NULL'))
+
+    op.create_table('scheduler_lease',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('holder', sa.String(length=64), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('scheduler_lease')
+    with op.batch_alter_table('reminder', schema=None) as batch_op:
+        batch_op.drop_index('ix_reminder_pending_remind_at')
+        batch_op.drop_index(batch_op.f('ix_reminder_task_id'))
+        batch_op.drop_index(batch_op.f('ix_reminder_event_id'))
+        batch_op.drop_index(batch_op.f('ix_reminder_user_id'))
+
+    op.drop_table('reminder')
@@ -0,0 +1,41 @@
+"""calendar_share table
+
+Revision ID: e7a24c9b1f30
+Revises: d51c8e0a4b67
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a24c9b1f30'
+down_revision = 'd51c8e0a4b67'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_share',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('calendar_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('role', sa.String(length=10), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['calendar_id'], ['calendar.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('calendar_share', schema=None) as batch_op:
+        batch_op.create_index('ux_calendar_share_calendar_id_user_id',
+                              ['calendar_id', 'user_id'], unique=True)
+        batch_op.create_index(batch_op.f('ix_calendar_share_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_share', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_calendar_share_user_id'))
+        batch_op.drop_index('ux_calendar_share_calendar_id_user_id')
+
+    op.drop_table('calendar_share')
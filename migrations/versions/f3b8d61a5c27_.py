@@ -0,0 +1,54 @@
+"""task.completed_at and task_completion_daily rollup
+
+Backfill: las tareas ya completadas no tienen fecha de finalización. Se usa su
+fecha (date) y, si no tienen (task.date es opcional), el momento de la migración.
+Así todas las completadas cuentan en los rollups, que se rellenan después con
+`flask rebuild-task-stats`.
+
+Revision ID: f3b8d61a5c27
+Revises: e7a24c9b1f30
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d61a5c27'
+down_revision = 'e7a24c9b1f30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('completed_at', sa.DateTime(), nullable=True))
+    # Completadas sin fecha de finalización: su fecha o, sin ella, la de la migración
+    op.execute("UPDATE task SET completed_at = COALESCE(date, CURRENT_TIMESTAMP) "
+               "WHERE status AND completed_at IS NULL")
+
+    op.create_table('task_completion_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('task_group_id', sa.Integer(), nullable=True),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['task_group_id'], ['task_group.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_task_completion_daily_user_id_day_group', 'task_completion_daily',
+                    ['user_id', 'day', sa.text('coalesce(task_group_id, 0)')], unique=True)
+    op.create_index(op.f('ix_task_completion_daily_task_group_id'), 'task_completion_daily',
+                    ['task_group_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_task_completion_daily_task_group_id'),
+                  table_name='task_completion_daily')
+    op.drop_index('ux_task_completion_daily_user_id_day_group',
+                  table_name='task_completion_daily')
+    op.drop_table('task_completion_daily')
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_column('completed_at')
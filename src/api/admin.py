@@ -1,24 +1,147 @@
-  
 import os
+import time
+from flask import g
 from flask_admin import Admin
-from .models import db, User,Calendar, TaskGroup
+from sqlalchemy import literal, text
+from sqlalchemy.orm import load_only
+from .models import db, User, Calendar, TaskGroup, Event, Task, Job
 from flask_admin.contrib.sqla import ModelView
 
-class UserAdmin(ModelView):
-    column_list = ('id', 'display_name', 'name', 'is_active','email', 'password', 'signup_date', 'profile_pic', 'last_session', 'google_id','user_id')
-class CalendarView(ModelView):
+# A partir de este nº de filas se usa un recuento estimado en la paginación
+ESTIMATED_COUNT_THRESHOLD = 100000
+_estimates = {}
+
+
+def estimated_count(table: str):
+    """
+    Recuento aproximado y barato de filas (cacheado 60 s):
+    - Postgres: estadísticas del planner (pg_class.reltuples)
+    - SQLite: MAX(id), que sale del índice de la clave primaria
+    """
+    cached = _estimates.get(table)
+    if cached and time.monotonic() - cached[1] < 60:
+        return cached[0]
+
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        value = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :t"),
+            {"t": table}).scalar()
+    elif dialect == "sqlite":
+        value = db.session.execute(text(f'SELECT MAX(id) FROM "{table}"')).scalar()
+    else:
+        value = None
+    _estimates[table] = (value, time.monotonic())
+    return value
+
+
+class FastModelView(ModelView):
+    """
+    Vista base para tablas grandes:
+    - páginas acotadas y orden por defecto por la clave primaria (indexada)
+    - solo se cargan las columnas que se muestran (load_only)
+    - sin búsqueda ni filtros, las tablas grandes usan un recuento estimado en
+      lugar de COUNT(*) exacto
+    """
+    page_size = 50
+    can_set_page_size = True
+    page_size_options = (20, 50, 100)
+    column_default_sort = ('id', True)
+    column_display_pk = True
+
+    def get_query(self):
+        query = super().get_query()
+        if self.column_list:
+            columns = [getattr(self.model, c) for c in self.column_list
+                       if c in self.model.__table__.columns]
+            query = query.options(load_only(*columns))
+        return query
+
+    def get_count_query(self):
+        estimate = g.pop('admin_estimated_count', None)
+        if estimate is not None:
+            return self.session.query(literal(estimate))
+        return super().get_count_query()
+
+    def get_list(self, page, sort_column, sort_desc, search, filters,
+                 execute=True, page_size=None):
+        if not search and not filters:
+            estimate = estimated_count(self.model.__tablename__)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                g.admin_estimated_count = int(estimate)
+        return super().get_list(page, sort_column, sort_desc, search, filters,
+                                execute=execute, page_size=page_size)
+
+
+class UserAdmin(FastModelView):
+    # Nunca se listan ni editan el hash de la contraseña ni los tokens de Google.
+    # Sin contraseña (NOT NULL) no se puede crear un usuario: se crean con /api/signup
+    can_create = False
+    column_list = ('id', 'display_name', 'name', 'is_active', 'email', 'rol',
+                   'signup_date', 'last_session', 'status', 'google_id')
+    column_sortable_list = ('id', 'email')
+    column_searchable_list = ('email',)
+    form_excluded_columns = ('password', 'google_refresh_token', 'google_access_token',
+                             'events', 'tasks', 'task_groups', 'calendars')
+
+
+class CalendarView(FastModelView):
     column_list = ('id', 'title', 'color', 'user_id')
+    column_sortable_list = ('id', 'user_id')
+    column_filters = ('user_id',)
     form_columns = ('title', 'color', 'user_id')
 
-def setup_admin(app):
+
+class TaskGroupView(FastModelView):
+    column_list = ('id', 'title', 'color', 'user_id')
+    column_sortable_list = ('id', 'user_id')
+    column_filters = ('user_id',)
+    form_excluded_columns = ('tasks',)
+    form_ajax_refs = {'user': {'fields': ('email',), 'page_size': 10}}
+
+
+class EventView(FastModelView):
+    column_list = ('id', 'title', 'start_date', 'end_date', 'all_day', 'status',
+                   'user_id', 'calendar_id')
+    column_sortable_list = ('id', 'calendar_id')
+    column_filters = ('user_id', 'calendar_id')
+    form_ajax_refs = {
+        'user': {'fields': ('email',), 'page_size': 10},
+        'calendar': {'fields': ('title',), 'page_size': 10},
+    }
+
+
+class TaskView(FastModelView):
+    column_list = ('id', 'title', 'status', 'date', 'user_id', 'task_group_id')
+    column_sortable_list = ('id', 'user_id', 'task_group_id')
+    column_filters = ('user_id', 'task_group_id')
+    form_ajax_refs = {
+        'user': {'fields': ('email',), 'page_size': 10},
+        'task_groups': {'fields': ('title',), 'page_size': 10},
+    }
+
+
+class JobView(FastModelView):
+    column_list = ('id', 'kind', 'status', 'attempts', 'max_attempts', 'user_id',
+                   'created_at', 'finished_at', 'error')
+    column_sortable_list = ('id',)
+    column_filters = ('status', 'kind')
+    can_create = False
+
+
+def setup_admin(app, url='/admin'):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
-    admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
+    admin = Admin(app, name='4Geeks Admin', url=url, template_mode='bootstrap3')
+
 
-    
     # Add your models here, for example this is how we add a the User model to the admin
     admin.add_view(UserAdmin(User, db.session))
     admin.add_view(CalendarView(Calendar, db.session))
-    admin.add_view(ModelView(TaskGroup, db.session))
+    admin.add_view(TaskGroupView(TaskGroup, db.session))
+    admin.add_view(EventView(Event, db.session))
+    # endpoint propio: 'task' ya es el nombre del blueprint de routesTasks
+    admin.add_view(TaskView(Task, db.session, endpoint='admin_task'))
+    admin.add_view(JobView(Job, db.session))
     # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    # admin.add_view(ModelView(YourModelName, db.session))
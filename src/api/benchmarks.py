@@ -0,0 +1,571 @@
+"""
+Benchmarks de rendimiento que se lanzan desde la CLI de Flask (ver commands.py).
+
+- startup: mide el cold start importando `app` en procesos nuevos.
+- cascade_delete: borrado de un calendario con muchos eventos, cargando los hijos
+  en la sesión (cascada ORM, comportamiento anterior) frente a ON DELETE CASCADE.
+- routes: todas las rutas de la API con el test client sobre la BD configurada
+  (poblada con `flask seed`), comparadas contra un baseline guardado en JSON. El
+  baseline depende de la máquina, así que no se versiona: sin él el comando falla
+  salvo con --allow-missing-baseline.
+- stream: memoria por suscriptor y coste del fan-out del broker SSE (api/push.py).
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# El hijo mide solo el import de la app; el padre mide además el arranque del intérprete
+_STARTUP_SNIPPET = (
+    "import time; t = time.perf_counter(); import app; "
+    "print(round((time.perf_counter() - t) * 1000, 2))"
+)
+
+
+def _parse_importtime(stderr: str, top: int) -> list:
+    """Devuelve los módulos de primer nivel con más tiempo acumulado (-X importtime)."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            modules.append((name.strip(), int(parts[1]) / 1000))
+    modules.sort(key=lambda m: m[1], reverse=True)
+    return [{"module": m, "ms": round(ms, 2)} for m, ms in modules[:top]]
+
+
+def bench_startup(runs: int = 5, mode: str = None, top: int = 10) -> dict:
+    env = dict(os.environ)
+    if mode:
+        env["STARTUP_MODE"] = mode
+
+    import_ms, wall_ms, slowest = [], [], []
+    for i in range(runs + 1):
+        args = [sys.executable]
+        if i == 0:
+            args += ["-X", "importtime"]
+        args += ["-c", _STARTUP_SNIPPET]
+        started = time.perf_counter()
+        proc = subprocess.run(args, cwd=SRC_DIR, env=env,
+                              capture_output=True, text=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+        if i == 0:
+            # La pasada con -X importtime es más lenta: solo sirve para el desglose
+            slowest = _parse_importtime(proc.stderr, top)
+            continue
+        import_ms.append(float(proc.stdout.strip().splitlines()[-1]))
+        wall_ms.append(elapsed)
+
+    return {
+        "mode": env.get("STARTUP_MODE", "default"),
+        "runs": len(import_ms),
+        "import_ms": {"min": min(import_ms), "median": statistics.median(import_ms)},
+        "process_ms": {"min": round(min(wall_ms), 2),
+                       "median": round(statistics.median(wall_ms), 2)},
+        "slowest_imports": slowest,
+    }
+
+
+def write_report(report: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+@contextmanager
+def count_statements(engine):
+    """Cuenta las sentencias SQL emitidas en `engine` dentro del bloque."""
+    from sqlalchemy import event
+
+    counter = {"statements": 0}
+
+    def _count(*args):
+        counter["statements"] += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+
+def _seed_calendar(n_events: int, batch: int = 5000):
+    from sqlalchemy import insert
+    from .models import db, User, Calendar, Event
+
+    user = User(email=f"bench-{uuid.uuid4().hex[:12]}@bench.local", name="Bench",
+                display_name="Bench", is_active=True, password="!", profile_pic="",
+                last_session=datetime.utcnow())
+    cal = Calendar(user=user, title="bench", color="#000000")
+    db.session.add_all([user, cal])
+    db.session.commit()
+
+    start = datetime(2025, 1, 1, 8)
+    for offset in range(0, n_events, batch):
+        rows = [{
+            "user_id": user.id, "calendar_id": cal.id, "title": f"Evento {i}",
+            "start_date": start + timedelta(minutes=30 * i),
+            "end_date": start + timedelta(minutes=30 * i + 25),
+            "all_day": False, "status": "confirmed",
+        } for i in range(offset, min(offset + batch, n_events))]
+        db.session.execute(insert(Event), rows)
+    db.session.commit()
+    return user.id, cal.id
+
+
+def bench_cascade_delete(n_events: int = 10000) -> dict:
+    from .models import db, User, Calendar, Event
+
+    report = {"events": n_events}
+    for mode in ("orm_loaded", "db_cascade"):
+        user_id, calendar_id = _seed_calendar(n_events)
+        db.session.expunge_all()
+
+        with count_statements(db.engine) as counter:
+            started = time.perf_counter()
+            cal = db.session.get(Calendar, calendar_id)
+            if mode == "orm_loaded":
+                # Comportamiento anterior a passive_deletes: cada hijo pasa por la sesión
+                for ev in list(cal.events):
+                    db.session.delete(ev)
+            db.session.delete(cal)
+            db.session.commit()
+            elapsed = time.perf_counter() - started
+
+        remaining = db.session.query(Event.id).filter_by(calendar_id=calendar_id).count()
+        report[mode] = {"ms": round(elapsed * 1000, 2),
+                        "statements": counter["statements"],
+                        "remaining_events": remaining}
+
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+    report["speedup"] = round(report["orm_loaded"]["ms"] / max(report["db_cascade"]["ms"], 0.001), 1)
+    return report
+
+
+# ---------- Rutas de la API ----------
+
+ROUTE_MARKER = "bench-route"          # título/email de todo lo que crea el benchmark
+REPO_DIR = os.path.dirname(SRC_DIR)
+DEFAULT_ROUTE_BASELINE = os.path.join(REPO_DIR, "benchmarks", "routes-baseline.json")
+
+
+def _bench_context(user_id: int = None) -> dict:
+    """
+    Usuario sobre el que se mide: `user_id` o el primer usuario de `flask seed`
+    (determinista con la misma semilla). Se crean un calendario, evento, grupo,
+    tarea y trabajo propios para las rutas que operan sobre un id.
+    """
+    from .models import db, User, Calendar, CalendarShare, Event, TaskGroup, Task, Job
+    from .routes import create_token
+    from . import seed
+
+    if user_id is None:
+        user = (User.query.filter(User.email.like("seed%@seed.local"))
+                .order_by(User.id.asc()).first())
+        if user is None:
+            seed.seed(users=100)
+            return _bench_context()
+    else:
+        user = db.session.get(User, user_id)
+        if user is None:
+            raise ValueError(f"Usuario {user_id} no encontrado")
+
+    cal = Calendar(user_id=user.id, title=ROUTE_MARKER, color="#000000")
+    group = TaskGroup(user_id=user.id, title=ROUTE_MARKER, color="#000000")
+    db.session.add_all([cal, group])
+    db.session.flush()
+    ev = Event(user_id=user.id, calendar_id=cal.id, title=ROUTE_MARKER,
+               start_date=datetime(2025, 3, 10, 10), end_date=datetime(2025, 3, 10, 11))
+    task = Task(user_id=user.id, task_group_id=group.id, title=ROUTE_MARKER, color="#000000")
+    job = Job(user_id=user.id, kind="delete_calendar", status="succeeded")
+    db.session.add_all([ev, task, job])
+    db.session.commit()
+
+    token = create_token({"user_id": user.id, "email": user.email})
+    # Otros 11 usuarios para el buscador de huecos (una docena de participantes). Solo
+    # se admiten contactos: se les comparte el calendario de la medición
+    peers = [uid for (uid,) in db.session.query(User.id).filter(User.id != user.id)
+             .order_by(User.id.asc()).limit(11)]
+    db.session.add_all([CalendarShare(calendar_id=cal.id, user_id=uid, role="read")
+                        for uid in peers])
+    db.session.commit()
+    return {
+        "user_id": user.id, "email": user.email, "name": user.name,
+        "password": seed.SEED_PASSWORD, "token": token,
+        "calendar_id": cal.id, "event_id": ev.id, "group_id": group.id,
+        "task_id": task.id, "job_id": job.id, "peers": peers,
+        "reset_token": create_token({"user_id": user.id, "email": user.email,
+                                     "scope": "reset"}),
+    }
+
+
+def _cleanup_bench(ctx: dict):
+    from .models import db, User, Calendar, CalendarShare, Event, TaskGroup, Task, Job
+
+    uid = ctx["user_id"]
+    db.session.query(CalendarShare).filter_by(calendar_id=ctx["calendar_id"]).delete(
+        synchronize_session=False)
+    for model in (Event, Task, TaskGroup, Calendar):
+        db.session.query(model).filter_by(user_id=uid, title=ROUTE_MARKER).delete(
+            synchronize_session=False)
+    db.session.query(Job).filter_by(id=ctx["job_id"]).delete(synchronize_session=False)
+    db.session.query(User).filter(User.email.like(f"{ROUTE_MARKER}-%")).delete(
+        synchronize_session=False)
+    db.session.commit()
+
+
+def _new_row(model, **fields):
+    """Preparación de las rutas DELETE: cada iteración borra una fila recién creada."""
+    def setup(ctx):
+        from .models import db
+        row = model(user_id=ctx["user_id"], title=ROUTE_MARKER, color="#000000", **{
+            k: (ctx[v[1:]] if isinstance(v, str) and v.startswith("$") else v)
+            for k, v in fields.items()})
+        db.session.add(row)
+        db.session.commit()
+        return {"new_id": row.id}
+    return setup
+
+
+def _route_scenarios() -> list:
+    """
+    (método, ruta, body, status esperado, preparación). La ruta y el body se
+    formatean con el contexto; `preparación(ctx)` corre fuera de la medición.
+    """
+    from .models import Calendar, Event, TaskGroup, Task
+
+    event_body = {"title": ROUTE_MARKER, "start_date": "2025-03-12T10:00",
+                  "end_date": "2025-03-12T11:00", "calendar_id": "{calendar_id}"}
+    new_event = _new_row(Event, calendar_id="$calendar_id",
+                         start_date=datetime(2025, 3, 1, 9), end_date=datetime(2025, 3, 1, 10))
+    return [
+        # routes.py
+        ("GET", "/api/hello", None, 200, None),
+        ("OPTIONS", "/api/signup", None, 204, None),
+        ("OPTIONS", "/api/login", None, 204, None),
+        ("POST", "/api/signup", {"email": ROUTE_MARKER + "-{uniq}@bench.local",
+                                 "password": "{password}"}, 201,
+         lambda ctx: {"uniq": uuid.uuid4().hex[:12]}),
+        ("POST", "/api/login", {"email": "{email}", "password": "{password}"}, 200, None),
+        ("GET", "/api/profile", None, 200, None),
+        ("GET", "/api/metrics", None, 403, None),
+        ("POST", "/api/forgot-password", {"email": "{email}"}, 200, None),
+        ("POST", "/api/reset-password", {"token": "{reset_token}",
+                                         "password": "{password}"}, 200, None),
+        # routesEvent.py
+        ("OPTIONS", "/api/events", None, 204, None),
+        ("GET", "/api/events", None, 200, None),
+        ("GET", "/api/events?start=2025-03-01&end=2025-04-01", None, 200, None),
+        ("POST", "/api/events", event_body, 201, None),
+        ("OPTIONS", "/api/events/{event_id}", None, 204, None),
+        ("GET", "/api/events/{event_id}", None, 200, None),
+        ("PUT", "/api/events/{event_id}", {"title": ROUTE_MARKER}, 200, None),
+        ("DELETE", "/api/events/{new_id}", None, 200, new_event),
+        ("OPTIONS", "/api/calendars", None, 204, None),
+        ("GET", "/api/calendars", None, 200, None),
+        ("OPTIONS", "/api/calendars/{calendar_id}", None, 204, None),
+        ("GET", "/api/calendars/{calendar_id}", None, 200, None),
+        ("POST", "/api/calendars", {"title": ROUTE_MARKER, "color": "#000000"}, 201, None),
+        ("PUT", "/api/calendars/{calendar_id}", {"title": ROUTE_MARKER}, 200, None),
+        ("DELETE", "/api/calendars/{new_id}", None, 200,
+         _new_row(Calendar)),
+        # routesTasks.py
+        ("GET", "/api/users/{user_id}/tasks", None, 200, None),
+        ("POST", "/api/users/{user_id}/tasks", {"title": ROUTE_MARKER, "color": "#000000"},
+         201, None),
+        ("PUT", "/api/users/{user_id}/tasks/{task_id}", {"status": True}, 200, None),
+        ("DELETE", "/api/users/{user_id}/tasks/{new_id}", None, 200, _new_row(Task)),
+        ("GET", "/api/users/{user_id}/groups", None, 200, None),
+        ("POST", "/api/users/{user_id}/groups", {"title": ROUTE_MARKER, "color": "#000000"},
+         201, None),
+        ("GET", "/api/users/{user_id}/groups/{group_id}", None, 200, None),
+        ("POST", "/api/users/{user_id}/groups/{group_id}/tasks",
+         {"title": ROUTE_MARKER, "color": "#000000"}, 201, None),
+        ("PUT", "/api/users/{user_id}/groups/{group_id}", {"title": ROUTE_MARKER}, 200, None),
+        ("DELETE", "/api/users/{user_id}/groups/{new_id}", None, 200, _new_row(TaskGroup)),
+        ("PUT", "/api/users/{user_id}/groups/{group_id}/tasks/{task_id}",
+         {"status": False}, 200, None),
+        ("DELETE", "/api/users/{user_id}/groups/{group_id}/tasks/{new_id}", None, 200,
+         _new_row(Task, task_group_id="$group_id")),
+        # routesLateral.py
+        ("OPTIONS", "/api/task-groups", None, 204, None),
+        ("GET", "/api/task-groups", None, 200, None),
+        ("POST", "/api/task-groups", {"title": ROUTE_MARKER, "color": "#000000"}, 201, None),
+        ("OPTIONS", "/api/task-groups/{group_id}", None, 204, None),
+        ("PUT", "/api/task-groups/{group_id}", {"title": ROUTE_MARKER}, 200, None),
+        ("DELETE", "/api/task-groups/{new_id}", None, 200,
+         _new_row(TaskGroup)),
+        # routesConfig.py
+        ("OPTIONS", "/api/config", None, 204, None),
+        ("GET", "/api/config", None, 200, None),
+        ("PUT", "/api/config", {"name": "{name}"}, 200, None),
+        # routesJobs.py
+        ("OPTIONS", "/api/jobs/{job_id}", None, 204, None),
+        ("GET", "/api/jobs/{job_id}", None, 200, None),
+        # routesScheduling.py
+        ("POST", "/api/scheduling/find-slots",
+         {"participants": "{peers}", "duration_minutes": 60, "start": "2025-03-03",
+          "end": "2025-03-28", "limit": 50}, 200, None),
+    ]
+
+
+def _fill(value, params: dict):
+    if isinstance(value, str):
+        # "{peers}" → la lista tal cual
+        if re.fullmatch(r"\{\w+\}", value) and isinstance(params.get(value[1:-1]), list):
+            return params[value[1:-1]]
+        formatted = value.format(**params)
+        # "{calendar_id}" → int, para que el body lleve el tipo correcto
+        return int(formatted) if re.fullmatch(r"\{\w+_id\}", value) else formatted
+    if isinstance(value, dict):
+        return {k: _fill(v, params) for k, v in value.items()}
+    return value
+
+
+def _percentile(sorted_ms: list, p: float) -> float:
+    index = min(len(sorted_ms) - 1, max(0, round(p / 100 * (len(sorted_ms) - 1))))
+    return round(sorted_ms[index], 3)
+
+
+def _uncovered_routes(app, scenarios) -> list:
+    """Rutas de /api registradas en la app que no tienen escenario."""
+    covered = {(m, re.sub(r"\{\w+\}", "<>", p.split("?")[0])) for m, p, *_ in scenarios}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if not rule.rule.startswith("/api/"):
+            continue
+        path = re.sub(r"<[^>]+>", "<>", rule.rule)
+        for method in sorted(rule.methods - {"HEAD"}):
+            # El OPTIONS automático de Flask no es una ruta nuestra
+            if method == "OPTIONS" and getattr(rule, "provide_automatic_options", False):
+                continue
+            if method == "PATCH" and ("PUT", path) in covered:
+                continue
+            if (method, path) not in covered and f"{method} {rule.rule}" not in missing:
+                missing.append(f"{method} {rule.rule}")
+    return missing
+
+
+def bench_routes(app, iterations: int = 30, warmup: int = 3, alloc_samples: int = 5,
+                 user_id: int = None, use_cache: bool = False, only: str = None) -> dict:
+    """
+    Recorre todas las rutas de la API con el test client de Flask y devuelve, por
+    ruta, latencia p50/p95/p99, sentencias SQL por petición y memoria asignada
+    (pico de tracemalloc). Las asignaciones se miden en pasadas aparte para que
+    tracemalloc no infle la latencia.
+    """
+    import tracemalloc
+    from . import cache
+    from .models import db
+
+    ctx = _bench_context(user_id)
+    headers = {"Authorization": f"Bearer {ctx['token']}"}
+    client = app.test_client()
+    scenarios = _route_scenarios()
+    # La caché de respuestas ocultaría el coste real de los GET
+    saved_cache = cache._cache
+    if not use_cache:
+        cache._cache = None
+
+    results = {}
+    try:
+        for method, path, body, expected, setup in scenarios:
+            name = f"{method} {path}"
+            if only and only not in name:
+                continue
+
+            def one_request():
+                params = dict(ctx, **(setup(ctx) if setup else {}))
+                db.session.remove()
+                with count_statements(db.engine) as counter:
+                    started = time.perf_counter()
+                    resp = client.open(_fill(path, params), method=method,
+                                       headers=headers, json=_fill(body, params))
+                    elapsed = (time.perf_counter() - started) * 1000
+                return resp.status_code, elapsed, counter["statements"]
+
+            for _ in range(warmup):
+                one_request()
+
+            latencies, statements, errors = [], [], 0
+            for _ in range(iterations):
+                status, ms, n = one_request()
+                latencies.append(ms)
+                statements.append(n)
+                if status != expected:
+                    errors += 1
+
+            alloc = []
+            tracemalloc.start()
+            try:
+                for _ in range(alloc_samples):
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.get_traced_memory()[0]
+                    one_request()
+                    alloc.append(tracemalloc.get_traced_memory()[1] - before)
+            finally:
+                tracemalloc.stop()
+
+            latencies.sort()
+            results[name] = {
+                "p50_ms": _percentile(latencies, 50),
+                "p95_ms": _percentile(latencies, 95),
+                "p99_ms": _percentile(latencies, 99),
+                "queries": max(statements),
+                "alloc_kb": round(statistics.median(alloc) / 1024, 1) if alloc else None,
+                "errors": errors,
+            }
+    finally:
+        cache._cache = saved_cache
+        db.session.remove()
+        _cleanup_bench(ctx)
+
+    return {
+        "iterations": iterations,
+        "database": db.engine.dialect.name,
+        "cache": use_cache,
+        "uncovered": _uncovered_routes(app, scenarios),
+        "routes": results,
+    }
+
+
+def compare_routes(report: dict, baseline: dict, threshold: float = 0.25,
+                   min_ms: float = 2.0) -> list:
+    """
+    Regresiones frente al baseline. Latencia (p95) y memoria cuentan si crecen más
+    de `threshold` (y, la latencia, más de `min_ms` para ignorar ruido); el nº de
+    sentencias SQL es determinista y cualquier aumento es regresión.
+    """
+    regressions = []
+    for name, now in report["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if not before:
+            continue
+        if now["errors"]:
+            regressions.append(f"{name}: {now['errors']} respuestas con status inesperado")
+        if now["queries"] > before["queries"]:
+            regressions.append(f"{name}: queries {before['queries']} → {now['queries']}")
+        if (now["p95_ms"] > before["p95_ms"] * (1 + threshold)
+                and now["p95_ms"] - before["p95_ms"] > min_ms):
+            regressions.append(f"{name}: p95 {before['p95_ms']} → {now['p95_ms']} ms")
+        if (before.get("alloc_kb") and now.get("alloc_kb")
+                and now["alloc_kb"] > before["alloc_kb"] * (1 + threshold)):
+            regressions.append(f"{name}: alloc {before['alloc_kb']} → {now['alloc_kb']} KB")
+    return regressions
+
+
+def _rss_bytes():
+    """RSS actual del proceso (solo Linux; None en otros sistemas)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def bench_stream(subscribers: int = 10000, users: int = 1000, publishes: int = 10000,
+                 threads: int = 500) -> dict:
+    """
+    Broker SSE sin red:
+    - memoria Python por suscriptor (tracemalloc) con `subscribers` conexiones
+      repartidas entre `users` usuarios
+    - coste de publicar un commit y de entregar/heartbeat por conexión
+    - con `threads` hilos realmente bloqueados (como en gunicorn gthread): RSS por
+      hilo y latencia hasta que todos reciben un cambio publicado
+    """
+    import tracemalloc
+    from .push import Broker, event_stream
+
+    broker = Broker(max_connections=subscribers)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    streams = []
+    for i in range(subscribers):
+        user_id = i % users
+        channel, seq = broker.subscribe(user_id)
+        stream = event_stream(broker, user_id, channel, seq, heartbeat=0,
+                              max_seconds=3600, resync=False)
+        next(stream)    # mensaje "ready"
+        streams.append(stream)
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for i in range(publishes):
+        broker.publish({("event", i % users)})
+    publish_us = (time.perf_counter() - started) / publishes * 1e6
+
+    started = time.perf_counter()
+    for stream in streams:
+        next(stream)    # cambio pendiente (o heartbeat)
+    deliver_us = (time.perf_counter() - started) / subscribers * 1e6
+    started = time.perf_counter()
+    for stream in streams:
+        next(stream)    # ya sin cambios: heartbeat
+    heartbeat_us = (time.perf_counter() - started) / subscribers * 1e6
+    for stream in streams:
+        stream.close()
+
+    report = {
+        "subscribers": subscribers,
+        "users": users,
+        "bytes_per_subscriber": round(per_subscriber),
+        "publish_us": round(publish_us, 2),
+        "deliver_us_per_subscriber": round(deliver_us, 2),
+        "heartbeat_us_per_subscriber": round(heartbeat_us, 2),
+        "connections_after_close": broker.connections,
+    }
+
+    if threads:
+        broker = Broker(max_connections=threads)
+        woken = []
+        lock = threading.Lock()
+
+        def idle_connection(user_id):
+            channel, seq = broker.subscribe(user_id)
+            stream = event_stream(broker, user_id, channel, seq, heartbeat=60,
+                                  max_seconds=3600, resync=False)
+            next(stream)
+            next(stream)    # bloqueado hasta que llegue un cambio
+            with lock:
+                woken.append(time.perf_counter())
+            stream.close()
+
+        rss_before = _rss_bytes()
+        workers = [threading.Thread(target=idle_connection, args=(i % users,), daemon=True)
+                   for i in range(threads)]
+        for t in workers:
+            t.start()
+        while broker.connections < threads:
+            time.sleep(0.01)
+        time.sleep(0.2)
+        rss_after = _rss_bytes()
+        started = time.perf_counter()
+        broker.publish({("event", i) for i in range(users)})
+        for t in workers:
+            t.join(10)
+        report["threads"] = {
+            "connections": threads,
+            "rss_bytes_per_thread": (round((rss_after - rss_before) / threads)
+                                     if rss_before and rss_after else None),
+            "fanout_ms_all_woken": round((max(woken) - started) * 1000, 2) if woken else None,
+            "woken": len(woken),
+        }
+    return report
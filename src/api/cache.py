@@ -0,0 +1,181 @@
+"""
+Caché de respuestas para los GET de listados (eventos, calendarios, grupos de tareas).
+
+Las entradas se indexan por usuario, recurso y URL, e incluyen el "generation
+counter" de cada tabla de la que depende la respuesta. Cada commit que toca una
+tabla de un usuario (ver api/changes.py) incrementa su contador, con lo que las
+entradas antiguas dejan de ser alcanzables y el LRU las acaba expulsando. Así los
+POST/PUT/DELETE invalidan sin tener que conocer las claves de la caché.
+
+Backends (CACHE_BACKEND):
+- "memory": LRU en proceso acotado por nº de entradas y bytes (por worker)
+- "shared": tabla hash en memoria compartida (mmap) común a todos los workers
+            de la máquina, con los contadores de generación también compartidos
+            (ver api/shm_cache.py)
+- "none":   desactivada
+Con "memory" y varios workers, cada worker tiene su propia caché: CACHE_TTL
+acota cuánto puede tardar en verse un cambio hecho a través de otro worker.
+Con "shared" la invalidación llega a todos y CACHE_TTL puede ser 0.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, request
+
+from . import changes
+from .metrics import metrics
+
+# Borrar un padre borra sus hijos (cascada en BD): invalida también esas tablas
+_DEPENDENTS = {
+    "user": ("calendar", "event", "task_group", "task"),
+    "calendar": ("event",),
+    "task_group": ("task",),
+    # Compartir o dejar de compartir cambia los calendarios y eventos visibles
+    "calendar_share": ("calendar", "event"),
+}
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = value
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes,
+                "evictions": self.evictions}
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float = 0):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.incr("cache.hits" if hit else "cache.misses")
+
+    def key(self, user_id, tables) -> str:
+        gens = ",".join(str(self.backend.generation(f"{t}:{user_id}")) for t in tables)
+        # Sin TTL la ventana es constante; con TTL la clave cambia al cumplirse
+        window = int(time.time() // self.ttl) if self.ttl else 0
+        return f"{user_id}|{request.full_path}|{gens}|{window}"
+
+    def invalidate(self, changed):
+        for table, user_id in changed:
+            if user_id is None:
+                continue
+            for t in (table,) + _DEPENDENTS.get(table, ()):
+                self.backend.bump(f"{t}:{user_id}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        data = {"backend": self.backend.name, "hits": self.hits, "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else None}
+        data.update(self.backend.stats())
+        return data
+
+
+_cache = None
+
+
+def cached_response(*tables):
+    """
+    Cachea la respuesta 200 de un GET. `tables` son las tablas de las que depende.
+    El usuario sale de `auth_payload` (token_required) o del `user_id` de la URL.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _cache is None or request.method != "GET":
+                return fn(*args, **kwargs)
+            payload = kwargs.get("auth_payload") or {}
+            user_id = payload.get("user_id", kwargs.get("user_id"))
+            if user_id is None:
+                return fn(*args, **kwargs)
+
+            key = _cache.key(user_id, tables)
+            body = _cache.backend.get(key)
+            if body is not None:
+                _cache.count(hit=True)
+                response = Response(body, status=200, mimetype="application/json")
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            _cache.count(hit=False)
+            rv = fn(*args, **kwargs)
+            response, status = rv if isinstance(rv, tuple) else (rv, 200)
+            if status == 200 and isinstance(response, Response) and not response.is_streamed:
+                _cache.backend.set(key, response.get_data())
+                response.headers["X-Cache"] = "MISS"
+            return rv
+        return wrapper
+    return decorator
+
+
+def setup_cache(app):
+    global _cache
+    backend_name = app.config.get("CACHE_BACKEND", "memory")
+    if backend_name == "none":
+        _cache = None
+        return
+    if backend_name == "memory":
+        backend = MemoryBackend(
+            max_entries=int(app.config.get("CACHE_MAX_ENTRIES", 2048)),
+            max_bytes=int(app.config.get("CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+    elif backend_name == "shared":
+        from .shm_cache import SharedMemoryBackend
+        backend = SharedMemoryBackend(
+            path=app.config.get("CACHE_SHM_PATH"),
+            n_slots=int(app.config.get("CACHE_SHM_SLOTS", 4096)),
+            slot_size=int(app.config.get("CACHE_SHM_SLOT_BYTES", 16 * 1024)))
+    else:
+        raise RuntimeError(f"CACHE_BACKEND desconocido: {backend_name}")
+
+    _cache = ResponseCache(backend, ttl=float(app.config.get("CACHE_TTL", 60)))
+    changes.subscribe(_cache.invalidate)
+    metrics.register_collector("cache", _cache.stats)
@@ -0,0 +1,68 @@
+"""
+Seguimiento de cambios confirmados (commit) por recurso y usuario.
+
+Durante el flush se anotan las filas insertadas/modificadas/borradas como pares
+(tabla, user_id) y, solo si la transacción hace commit, se notifica a los
+suscriptores. Lo usan el enrutado a réplica (read-after-write), la caché de
+respuestas y las notificaciones push, sin que cada handler tenga que avisarles.
+
+Las operaciones masivas que no pasan por el flush (query.delete(), update()
+sobre la tabla...) deben anotarse a mano con `record()`.
+"""
+import logging
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("api.changes")
+
+_subscribers = []
+
+
+def subscribe(fn):
+    """`fn(changes)` recibe un set de (tabla, user_id) tras cada commit."""
+    _subscribers.append(fn)
+    return fn
+
+
+def record(session, table: str, user_id: int):
+    session.info.setdefault("changes", set()).add((table, user_id))
+
+
+def _owner_id(obj):
+    if obj.__tablename__ == "user":
+        return obj.id
+    return getattr(obj, "user_id", None)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    changes = session.info.setdefault("changes", set())
+    for obj in session.new | session.dirty | session.deleted:
+        table = getattr(obj, "__tablename__", None)
+        if table is None:
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        changes.add((table, _owner_id(obj)))
+        # Si cambia el propietario, ambos usuarios se ven afectados
+        if "user_id" in inspect(obj).attrs:
+            for old in inspect(obj).attrs.user_id.history.deleted:
+                changes.add((table, old))
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch(session):
+    changes = session.info.pop("changes", None)
+    if not changes:
+        return
+    for fn in list(_subscribers):
+        try:
+            fn(changes)
+        except Exception:
+            logger.exception("Change subscriber failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("changes", None)
@@ -1,6 +1,11 @@
 
+import json
+import os
 import click
+from datetime import datetime
+from werkzeug.security import generate_password_hash
 from api.models import db, User
+from api import benchmarks, google_sync, seed
 
 """
 In this file, you can add as many commands as you want using the @app.cli.command decorator
@@ -18,17 +23,227 @@ def setup_commands(app):
     @click.argument("count") # argument of out command
     def insert_test_users(count):
         print("Creating test users")
+        # Mismo hash para todos (la contraseña es "123456") y un único commit
+        password_hash = generate_password_hash(seed.SEED_PASSWORD)
+        now = datetime.utcnow()
+        users = []
         for x in range(1, int(count) + 1):
             user = User()
             user.email = "test_user" + str(x) + "@test.com"
-            user.password = "123456"
+            user.password = password_hash
+            user.name = "Test User " + str(x)
+            user.display_name = "Test " + str(x)
+            user.profile_pic = ""
+            user.last_session = now
             user.is_active = True
-            db.session.add(user)
-            db.session.commit()
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        for user in users:
             print("User: ", user.email, " created.")
 
         print("All test users created")
 
     @app.cli.command("insert-test-data")
     def insert_test_data():
-        pass
\ No newline at end of file
+        """Datos de ejemplo pequeños para desarrollo (10 usuarios)."""
+        report = seed.seed(users=10, events=50, tasks=20)
+        print(json.dumps(report, indent=2))
+
+    @app.cli.command("seed")
+    @click.option("--users", default=1000, help="Usuarios a crear")
+    @click.option("--calendars", default=2, help="Calendarios por usuario (media)")
+    @click.option("--events", default=100, help="Eventos por usuario (media)")
+    @click.option("--task-groups", default=3, help="Grupos de tareas por usuario (media)")
+    @click.option("--tasks", default=30, help="Tareas por usuario (media)")
+    @click.option("--days", default=365, help="Días a lo largo de los que se reparten")
+    @click.option("--seed", "seed_value", default=42, help="Semilla (mismos datos con la misma)")
+    @click.option("--batch", default=10000, help="Filas por INSERT masivo")
+    def seed_command(users, calendars, events, task_groups, tasks, days, seed_value, batch):
+        """Genera datos sintéticos a escala: $ flask seed --users 100000 --events 100"""
+        def progress(done, counts):
+            print(f"{done}/{users} usuarios", counts)
+
+        report = seed.seed(users=users, calendars=calendars, events=events,
+                           task_groups=task_groups, tasks=tasks, days=days,
+                           seed_value=seed_value, batch=batch, progress=progress)
+        print(json.dumps(report, indent=2))
+
+    @app.cli.command("bench-startup")
+    @click.option("--runs", default=5, help="Arranques a medir (más uno con -X importtime)")
+    @click.option("--mode", type=click.Choice(["full", "lite"]), default=None,
+                  help="STARTUP_MODE a medir (por defecto el del entorno)")
+    @click.option("--max-ms", type=float, default=None,
+                  help="Falla si la mediana del import supera este valor")
+    @click.option("--output", default=None, help="Guarda el informe en JSON")
+    def bench_startup(runs, mode, max_ms, output):
+        """Mide el cold start de la app: $ flask bench-startup --mode lite"""
+        report = benchmarks.bench_startup(runs=runs, mode=mode)
+        print(json.dumps(report, indent=2))
+        if output:
+            benchmarks.write_report(report, output)
+        if max_ms is not None and report["import_ms"]["median"] > max_ms:
+            raise click.ClickException(
+                f"Cold start {report['import_ms']['median']} ms > {max_ms} ms")
+
+    @app.cli.command("bench-cascade-delete")
+    @click.option("--events", default=10000, help="Eventos en el calendario a borrar")
+    @click.option("--output", default=None, help="Guarda el informe en JSON")
+    def bench_cascade_delete(events, output):
+        """Compara borrar un calendario grande vía ORM vs ON DELETE CASCADE."""
+        report = benchmarks.bench_cascade_delete(n_events=events)
+        print(json.dumps(report, indent=2))
+        if output:
+            benchmarks.write_report(report, output)
+
+    @app.cli.command("bench-routes")
+    @click.option("--iterations", default=30, help="Peticiones medidas por ruta")
+    @click.option("--warmup", default=3, help="Peticiones de calentamiento por ruta")
+    @click.option("--user-id", type=int, default=None,
+                  help="Usuario a usar (por defecto el primero de `flask seed`)")
+    @click.option("--only", default=None, help="Solo rutas que contengan este texto")
+    @click.option("--cache/--no-cache", default=False, help="Mide con la caché de respuestas")
+    @click.option("--baseline", default=benchmarks.DEFAULT_ROUTE_BASELINE,
+                  help="Baseline JSON con el que comparar")
+    @click.option("--update-baseline", is_flag=True, help="Guarda el resultado como baseline")
+    @click.option("--allow-missing-baseline", is_flag=True,
+                  help="No falla si no hay baseline (solo mide)")
+    @click.option("--threshold", default=0.25, help="Empeoramiento tolerado (0.25 = 25%)")
+    @click.option("--min-ms", default=2.0, help="Diferencia de p95 por debajo de la cual es ruido")
+    @click.option("--output", default=None, help="Guarda el informe en JSON")
+    def bench_routes(iterations, warmup, user_id, only, cache, baseline,
+                     update_baseline, allow_missing_baseline, threshold, min_ms, output):
+        """Benchmark de todas las rutas de la API: $ flask bench-routes --baseline b.json"""
+        report = benchmarks.bench_routes(app, iterations=iterations, warmup=warmup,
+                                         user_id=user_id, use_cache=cache, only=only)
+        print(f"{'ruta':<60} {'p50':>8} {'p95':>8} {'p99':>8} {'sql':>4} {'KB':>8}")
+        for name, r in report["routes"].items():
+            print(f"{name:<60} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} "
+                  f"{r['queries']:>4} {r['alloc_kb']:>8}" + ("  ERR" if r["errors"] else ""))
+        if report["uncovered"]:
+            print("Rutas sin escenario:", ", ".join(report["uncovered"]))
+        if output:
+            benchmarks.write_report(report, output)
+
+        if update_baseline:
+            os.makedirs(os.path.dirname(os.path.abspath(baseline)), exist_ok=True)
+            benchmarks.write_report(report, baseline)
+            print(f"Baseline guardado en {baseline}")
+            return
+        if not os.path.exists(baseline):
+            # Sin baseline no hay comprobación: que no pase en silencio en CI
+            if allow_missing_baseline:
+                print(f"Sin baseline en {baseline}: no se comparan regresiones")
+                return
+            raise click.ClickException(
+                f"Sin baseline en {baseline}: genéralo en esta máquina con "
+                "--update-baseline o usa --allow-missing-baseline")
+        with open(baseline) as f:
+            regressions = benchmarks.compare_routes(report, json.load(f),
+                                                    threshold=threshold, min_ms=min_ms)
+        if regressions:
+            raise click.ClickException("Regresiones:\n  " + "\n  ".join(regressions))
+        print("Sin regresiones frente al baseline")
+
+    @app.cli.command("bench-stream")
+    @click.option("--subscribers", default=10000, help="Conexiones SSE simuladas")
+    @click.option("--users", default=1000, help="Usuarios entre los que se reparten")
+    @click.option("--publishes", default=10000, help="Commits publicados")
+    @click.option("--threads", default=500, help="Hilos bloqueados reales (0 = no)")
+    @click.option("--output", default=None, help="Guarda el informe en JSON")
+    def bench_stream(subscribers, users, publishes, threads, output):
+        """Memoria por suscriptor y fan-out del broker SSE: $ flask bench-stream"""
+        report = benchmarks.bench_stream(subscribers=subscribers, users=users,
+                                         publishes=publishes, threads=threads)
+        print(json.dumps(report, indent=2))
+        if output:
+            benchmarks.write_report(report, output)
+
+    @app.cli.command("jobs-worker")
+    def jobs_worker():
+        """Procesa trabajos en segundo plano en un proceso dedicado: $ flask jobs-worker"""
+        from api.jobs import setup_jobs
+        runner = setup_jobs(app, start=False)
+        if runner is None:
+            raise click.ClickException("JOBS_WORKERS debe ser mayor que 0")
+        print(f"Job worker {runner.worker_id} con {runner.workers} hilos")
+        runner.start()
+        try:
+            runner._thread.join()
+        except KeyboardInterrupt:
+            runner.stop()
+
+    @app.cli.command("reminders-worker")
+    def reminders_worker():
+        """Planificador de recordatorios en un proceso dedicado: $ flask reminders-worker"""
+        from api.reminders import setup_reminders
+        scheduler = setup_reminders(app, start=False)
+        if scheduler is None:
+            raise click.ClickException(
+                "Recordatorios desactivados (REMINDERS_ENABLED=0 o DATABASE_SHARD_URLS)")
+        print(f"Reminder scheduler {scheduler.worker_id} "
+              f"({type(scheduler.notifier).__name__})")
+        scheduler.start()
+        try:
+            scheduler._thread.join()
+        except KeyboardInterrupt:
+            scheduler.stop()
+
+    @app.cli.command("rebuild-task-stats")
+    @click.option("--user-id", type=int, multiple=True,
+                  help="Usuario(s) a recalcular (por defecto todos)")
+    @click.option("--batch", default=1000, help="Usuarios por lote (y por commit)")
+    def rebuild_task_stats(user_id, batch):
+        """Recalcula los rollups de tareas completadas: $ flask rebuild-task-stats"""
+        from api import task_stats
+
+        def progress(totals):
+            print(f"{totals['users']} usuarios, {totals['rows']} filas")
+
+        report = task_stats.rebuild(list(user_id) or None, batch=batch, progress=progress)
+        print(json.dumps(report, indent=2))
+
+    @app.cli.command("google-sync")
+    @click.option("--user-id", type=int, multiple=True,
+                  help="Usuario(s) a sincronizar (por defecto todos los enlazados)")
+    @click.option("--workers", type=int, default=None,
+                  help="Hilos en paralelo (por defecto GOOGLE_SYNC_WORKERS)")
+    def google_sync_command(user_id, workers):
+        """Sincroniza Google Calendar de forma incremental: $ flask google-sync"""
+        report = google_sync.sync_users(app, list(user_id) or None, workers)
+        print(json.dumps(report, indent=2))
+        if report["failed"]:
+            raise click.ClickException(f"{report['failed']} usuario(s) con error")
+
+    @app.cli.command("shards-init")
+    def shards_init():
+        """Crea las tablas event y task en cada shard: $ flask shards-init"""
+        from api import sharding
+        try:
+            binds = sharding.init_shards()
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        print(f"Tablas listas en {', '.join(binds)}")
+
+    @app.cli.command("shards-rebalance")
+    @click.option("--user-id", type=int, multiple=True,
+                  help="Usuario(s) a mover (por defecto todos los que no están en su shard)")
+    @click.option("--batch", default=100, help="Usuarios por lote (una espera por lote)")
+    @click.option("--rows-batch", default=1000, help="Filas por bloque copiado")
+    @click.option("--dry-run", is_flag=True, help="Solo muestra qué se movería")
+    def shards_rebalance(user_id, batch, rows_batch, dry_run):
+        """Mueve usuarios al shard que les toca por hash: $ flask shards-rebalance"""
+        from api import sharding
+
+        def progress(totals):
+            print(f"{totals['users']} usuarios, {totals['events']} eventos, "
+                  f"{totals['tasks']} tareas")
+
+        try:
+            report = sharding.rebalance(batch=batch, rows_batch=rows_batch,
+                                        user_ids=list(user_id) or None,
+                                        dry_run=dry_run, progress=progress)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        report["shards"] = sharding.status()
+        print(json.dumps(report, indent=2))
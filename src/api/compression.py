@@ -0,0 +1,142 @@
+"""
+Compresión de respuestas de la API (gzip y, si está instalado, brotli).
+
+Se aplica en un after_request a las respuestas cuyo Content-Type esté en la lista
+permitida (JSON por defecto) y superen COMPRESS_MIN_SIZE bytes. Se omiten las que
+ya traen Content-Encoding (p. ej. assets precomprimidos de dist/) y las parciales.
+Las respuestas en streaming (generadores) se comprimen chunk a chunk con flush,
+así el cliente sigue recibiendo datos a medida que se generan.
+
+El tiempo de CPU y los bytes ahorrados se publican en api.metrics.
+
+Configuración:
+- COMPRESS_MIN_SIZE   bytes mínimos para comprimir (por defecto 1024)
+- COMPRESS_LEVEL      nivel gzip 1-9 (por defecto 6)
+- COMPRESS_MIMETYPES  lista separada por comas
+"""
+import zlib
+
+from flask import request
+
+from .metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él solo se ofrece gzip
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/plain",
+    "text/csv",
+)
+
+
+class _Gzip:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        # wbits=31 → cabecera y checksum gzip
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    name = "br"
+
+    def __init__(self, level: int):
+        # Calidad moderada: brotli 11 es demasiado caro para respuestas dinámicas
+        self._obj = brotli.Compressor(quality=min(level, 5))
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+def _pick_compressor(level: int):
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return _Brotli(level)
+    if accepted["gzip"]:
+        return _Gzip(level)
+    return None
+
+
+def _stream(iterable, compressor):
+    """Comprime un generador sin acumularlo; mide CPU por chunk."""
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if not chunk:
+                continue
+            with metrics.cpu_timer(f"compression.{compressor.name}.stream"):
+                out = compressor.compress(chunk) + compressor.flush()
+            metrics.incr("compression.bytes_in", len(chunk))
+            metrics.incr("compression.bytes_out", len(out))
+            if out:
+                yield out
+        with metrics.cpu_timer(f"compression.{compressor.name}.stream"):
+            tail = compressor.finish()
+        metrics.incr("compression.bytes_out", len(tail))
+        if tail:
+            yield tail
+    finally:
+        close = getattr(iterable, "close", None)
+        if close is not None:
+            close()
+
+
+def setup_compression(app):
+    min_size = int(app.config.get("COMPRESS_MIN_SIZE", 1024))
+    level = int(app.config.get("COMPRESS_LEVEL", 6))
+    mimetypes = frozenset(app.config.get("COMPRESS_MIMETYPES") or DEFAULT_MIMETYPES)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough
+                or "Content-Encoding" in response.headers
+                or "Content-Range" in response.headers
+                or response.mimetype not in mimetypes):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        compressor = _pick_compressor(level)
+        if compressor is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _stream(response.response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                metrics.incr("compression.skipped_small")
+                return response
+            with metrics.cpu_timer(f"compression.{compressor.name}"):
+                compressed = compressor.compress(data) + compressor.finish()
+            metrics.incr("compression.bytes_in", len(data))
+            metrics.incr("compression.bytes_out", len(compressed))
+            response.set_data(compressed)
+
+        response.headers["Content-Encoding"] = compressor.name
+        etag, weak = response.get_etag()
+        if etag:
+            # Misma entidad, distinta representación: el ETag no puede ser el mismo
+            response.set_etag(f"{etag}-{compressor.name}", weak=weak)
+        return response
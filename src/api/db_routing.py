@@ -0,0 +1,159 @@
+"""
+Enrutado de lecturas a una réplica de la base de datos.
+
+Si se configura DATABASE_REPLICA_URL (bind "replica"), las peticiones GET leen de
+la réplica y todo lo demás va al primario. Para no devolver datos viejos justo
+después de que un usuario escriba (read-after-write), sus GET vuelven al primario
+durante REPLICA_STICKY_SECONDS tras cada commit que toque sus datos.
+
+Esa marca viaja con el cliente: la respuesta que hace commit lleva una cookie
+firmada (db_sticky, caduca a los REPLICA_STICKY_SECONDS) y la misma marca en la
+cabecera X-DB-Sticky, que los clientes sin cookies pueden reenviar. Así funciona
+aunque el GET caiga en otro worker de gunicorn. Además cada proceso recuerda a los
+usuarios afectados por sus commits (p. ej. el dueño de un calendario compartido).
+
+Dentro de una misma sesión, en cuanto hay un flush (una escritura) el resto de
+sentencias también van al primario.
+
+Para probarlo en local basta con dos ficheros SQLite:
+    DATABASE_URL=sqlite:////tmp/primary.db
+    DATABASE_REPLICA_URL=sqlite:////tmp/replica.db
+
+Las tablas event y task, si hay shards (DATABASE_SHARD_URLS), no siguen estas reglas:
+van siempre al shard del usuario que elige api/sharding.py.
+"""
+import math
+import threading
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event
+
+from . import changes
+from .metrics import metrics
+
+REPLICA_BIND = "replica"
+STICKY_COOKIE = "db_sticky"
+STICKY_HEADER = "X-DB-Sticky"
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        router = (current_app.extensions.get("shard_router")
+                  if bind is None and has_app_context() else None)
+        if router is not None:
+            engine = router.bind_for(self, mapper, clause)
+            if engine is not None:
+                return engine
+        if bind is None and self._reads_from_replica():
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self) -> bool:
+        if not has_request_context() or g.get("db_target") != REPLICA_BIND:
+            return False
+        if self._flushing or self.info.get("wrote"):
+            return False
+        return not (self.new or self.dirty or self.deleted)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_wrote(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+@event.listens_for(RoutingSession, "after_rollback")
+def _reset_wrote(session):
+    session.info.pop("wrote", None)
+
+
+class RecentWriters:
+    """user_id → instante de su última escritura (por proceso)."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._last_write = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id: int):
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[user_id] = now
+            if len(self._last_write) > 10000:
+                # Limpieza perezosa de entradas caducadas
+                self._last_write = {u: t for u, t in self._last_write.items()
+                                    if now - t < self.window}
+
+    def is_recent(self, user_id: int) -> bool:
+        t = self._last_write.get(user_id)
+        return t is not None and time.monotonic() - t < self.window
+
+
+def request_user_id():
+    """user_id de la petición: de la URL (/users/<id>/...) o del token Bearer."""
+    if request.view_args and "user_id" in request.view_args:
+        return request.view_args["user_id"]
+    auth = request.headers.get("Authorization", "")
+    parts = auth.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        return None
+    from .routes import verify_token
+    try:
+        return verify_token(parts[1]).get("user_id")
+    except Exception:
+        return None
+
+
+def setup_read_replica(app):
+    if REPLICA_BIND not in (app.config.get("SQLALCHEMY_BINDS") or {}):
+        return
+
+    window = float(app.config.get("REPLICA_STICKY_SECONDS", 5))
+    writers = RecentWriters(window)
+    app.extensions["recent_writers"] = writers
+    signer = URLSafeTimedSerializer(app.secret_key, salt="db-sticky")
+
+    @changes.subscribe
+    def _remember_writers(changed):
+        for _, user_id in changed:
+            if user_id is not None:
+                writers.mark(user_id)
+        if has_request_context():
+            g.db_wrote = True
+
+    def sticky_user(user_id) -> bool:
+        token = request.cookies.get(STICKY_COOKIE) or request.headers.get(STICKY_HEADER)
+        if not token:
+            return False
+        try:
+            return signer.loads(token, max_age=window) == user_id
+        except BadSignature:    # también SignatureExpired
+            return False
+
+    @app.before_request
+    def choose_database():
+        if request.method not in ("GET", "HEAD"):
+            return
+        user_id = request_user_id()
+        if user_id is not None and (sticky_user(user_id) or writers.is_recent(user_id)):
+            metrics.incr("db.reads.primary_sticky")
+            return
+        g.db_target = REPLICA_BIND
+        metrics.incr("db.reads.replica")
+
+    @app.after_request
+    def mark_sticky(response):
+        if not g.get("db_wrote"):
+            return response
+        user_id = request_user_id()
+        if user_id is not None:
+            token = signer.dumps(user_id)
+            response.set_cookie(STICKY_COOKIE, token, max_age=math.ceil(window),
+                                httponly=True, samesite="Lax")
+            response.headers[STICKY_HEADER] = token
+        return response
@@ -0,0 +1,468 @@
+"""
+Sincronización incremental de Google Calendar → tabla `event`.
+
+Por usuario (los que tienen google_access_token / google_refresh_token):
+- La primera vez se hace una sincronización completa y Google devuelve un
+  nextSyncToken; las siguientes piden solo lo cambiado desde ese token
+  (GoogleSyncState.sync_token). Si Google responde 410 (token caducado) se
+  repite la sincronización completa y se borran los eventos que ya no existen.
+- Se pide el máximo de eventos por página (GOOGLE_SYNC_PAGE_SIZE) y solo los
+  campos que se usan (`fields`), con gzip y conexiones keep-alive por hilo.
+- Cada página se escribe con un único INSERT ... ON CONFLICT (user_id,
+  google_event_id) DO UPDATE masivo y un DELETE para los cancelados, con un
+  commit por página: si se corta a mitad, la siguiente pasada continúa.
+- Varios usuarios se sincronizan en paralelo con un pool de GOOGLE_SYNC_WORKERS
+  hilos.
+- Ante límites de cuota (429, 403 rateLimitExceeded) y errores 5xx se reintenta
+  con backoff exponencial con jitter (o lo que diga Retry-After), y la pausa se
+  aplica a todos los hilos que comparten el cliente.
+
+GOOGLE_API_BASE_URL y GOOGLE_TOKEN_URL son configurables para poder probar el
+motor contra un servidor local (benchmarks/google_stub.py).
+
+Uso: `flask google-sync [--user-id N]` o el trabajo "google_sync" (api/jobs.py).
+"""
+import gzip
+import http.client
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, urlencode, urlsplit
+
+from flask import current_app
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import changes, sharding
+from .jobs import job_handler
+from .metrics import metrics
+from .models import db, User, Calendar, Event, GoogleSyncState
+
+logger = logging.getLogger("api.google_sync")
+
+DEFAULT_API_BASE_URL = "https://www.googleapis.com/calendar/v3"
+DEFAULT_TOKEN_URL = "https://oauth2.googleapis.com/token"
+# Respuesta parcial: solo lo que se guarda en `event`
+EVENT_FIELDS = ("items(id,status,summary,description,start,end),"
+                "nextPageToken,nextSyncToken")
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+UPSERT_COLUMNS = ("calendar_id", "title", "start_date", "end_date", "description",
+                  "all_day", "status")
+SYNC_CALENDAR_TITLE = "Google Calendar"
+SYNC_CALENDAR_COLOR = "#4285f4"
+
+
+class GoogleAPIError(Exception):
+    def __init__(self, status: int, reason: str = None, message: str = ""):
+        super().__init__(f"{status} {reason or ''} {message}".strip())
+        self.status = status
+        self.reason = reason
+
+
+class SyncTokenExpired(GoogleAPIError):
+    pass
+
+
+class GoogleCalendarClient:
+    """Cliente mínimo (librería estándar) para events.list y el refresco del token."""
+
+    def __init__(self, base_url: str = DEFAULT_API_BASE_URL,
+                 token_url: str = DEFAULT_TOKEN_URL, client_id: str = None,
+                 client_secret: str = None, timeout: float = 30,
+                 max_retries: int = 5, backoff_base: float = 1.0,
+                 backoff_max: float = 64.0):
+        self.base_url = base_url.rstrip("/")
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._local = threading.local()
+        self._pause_lock = threading.Lock()
+        self._pause_until = 0.0
+
+    # ---------- HTTP ----------
+
+    def _connection(self, scheme: str, netloc: str):
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get((scheme, netloc))
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = conns[(scheme, netloc)] = cls(netloc, timeout=self.timeout)
+        return conn
+
+    def _drop_connection(self, scheme: str, netloc: str):
+        conn = getattr(self._local, "conns", {}).pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def _wait_for_quota(self):
+        delay = self._pause_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _pause(self, seconds: float):
+        # Una respuesta 429 suele ser de cuota del proyecto: frena a todos los hilos
+        with self._pause_lock:
+            self._pause_until = max(self._pause_until, time.monotonic() + seconds)
+
+    def _backoff(self, attempt: int, retry_after: str = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _send(self, method: str, url: str, headers: dict, body: bytes = None):
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        conn = self._connection(parts.scheme, parts.netloc)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            payload = resp.read()
+        except (OSError, http.client.HTTPException):
+            # Conexión keep-alive cerrada por el servidor: se reabre al reintentar
+            self._drop_connection(parts.scheme, parts.netloc)
+            raise
+        if resp.getheader("Content-Encoding") == "gzip":
+            payload = gzip.decompress(payload)
+        return resp.status, resp.getheader("Retry-After"), payload
+
+    def request(self, method: str, url: str, headers: dict = None, body: bytes = None) -> dict:
+        headers = dict(headers or {}, **{"Accept-Encoding": "gzip",
+                                         "User-Agent": "calendar-sync (gzip)"})
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_quota()
+            try:
+                status, retry_after, payload = self._send(method, url, headers, body)
+            except (OSError, http.client.HTTPException) as e:
+                if attempt == self.max_retries:
+                    raise GoogleAPIError(0, "connection", str(e))
+                time.sleep(self._backoff(attempt))
+                continue
+            metrics.incr(f"google_sync.http.{status}")
+            if status < 400:
+                return json.loads(payload) if payload else {}
+
+            reason, message = _error_reason(payload)
+            if status == 410:
+                raise SyncTokenExpired(status, reason, message)
+            retryable = (status == 429 or status >= 500
+                         or (status == 403 and reason in RATE_LIMIT_REASONS))
+            if not retryable or attempt == self.max_retries:
+                raise GoogleAPIError(status, reason, message)
+            delay = self._backoff(attempt, retry_after)
+            if status in (403, 429):
+                self._pause(delay)
+            metrics.incr("google_sync.retries")
+            logger.info("Google API retry", extra={"status": status, "reason": reason,
+                                                   "attempt": attempt + 1, "delay": delay})
+            time.sleep(delay)
+
+    # ---------- API ----------
+
+    def refresh_access_token(self, refresh_token: str) -> str:
+        body = urlencode({"grant_type": "refresh_token", "refresh_token": refresh_token,
+                          "client_id": self.client_id or "",
+                          "client_secret": self.client_secret or ""}).encode()
+        data = self.request("POST", self.token_url, body=body, headers={
+            "Content-Type": "application/x-www-form-urlencoded"})
+        return data["access_token"]
+
+    def list_events(self, access_token: str, calendar_id: str, sync_token: str = None,
+                    page_token: str = None, page_size: int = 2500) -> dict:
+        params = {"maxResults": page_size, "singleEvents": "true", "fields": EVENT_FIELDS}
+        if page_token:
+            params["pageToken"] = page_token
+        elif sync_token:
+            params["syncToken"] = sync_token
+        else:
+            params["showDeleted"] = "true"
+        url = (f"{self.base_url}/calendars/{quote(calendar_id, safe='')}/events?"
+               f"{urlencode(params)}")
+        return self.request("GET", url, headers={"Authorization": f"Bearer {access_token}"})
+
+
+def _error_reason(payload: bytes):
+    try:
+        error = json.loads(payload).get("error") or {}
+    except (ValueError, AttributeError):
+        return None, payload[:200].decode("utf-8", "replace")
+    if isinstance(error, str):      # errores OAuth: {"error": "invalid_grant"}
+        return error, ""
+    details = error.get("errors") or [{}]
+    return details[0].get("reason"), error.get("message", "")
+
+
+def client_from_config(config) -> GoogleCalendarClient:
+    return GoogleCalendarClient(
+        base_url=config.get("GOOGLE_API_BASE_URL") or DEFAULT_API_BASE_URL,
+        token_url=config.get("GOOGLE_TOKEN_URL") or DEFAULT_TOKEN_URL,
+        client_id=config.get("GOOGLE_CLIENT_ID"),
+        client_secret=config.get("GOOGLE_CLIENT_SECRET"),
+        timeout=float(config.get("GOOGLE_SYNC_TIMEOUT", 30)),
+        max_retries=int(config.get("GOOGLE_SYNC_MAX_RETRIES", 5)))
+
+
+# ---------- conversión ----------
+
+def _parse_google_time(value: dict):
+    """(datetime UTC sin tz, es_todo_el_día) de un start/end de Google."""
+    if value.get("dateTime"):
+        dt = datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt, False
+    return datetime.fromisoformat(value["date"]), True
+
+
+def _event_row(item: dict):
+    try:
+        start_dt, all_day = _parse_google_time(item["start"])
+        end_dt, _ = _parse_google_time(item["end"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if all_day:
+        # Google da el fin exclusivo (día siguiente); aquí se guarda 23:59:59 del último día
+        end_dt -= timedelta(seconds=1)
+    return {
+        "title": (item.get("summary") or "(Sin título)")[:200],
+        "start_date": start_dt,
+        "end_date": max(end_dt, start_dt),
+        "description": item.get("description"),
+        "all_day": all_day,
+        "status": item.get("status") or "confirmed",
+    }
+
+
+def _upsert_statement():
+    dialect = db.session.get_bind(mapper=Event.__mapper__).dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(Event.__table__)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(Event.__table__)
+    else:
+        raise RuntimeError(f"Upsert no soportado en {dialect}")
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "google_event_id"],
+        set_={column: stmt.excluded[column] for column in UPSERT_COLUMNS})
+
+
+def apply_page(user_id: int, calendar_id: int, items: list) -> tuple:
+    """Aplica una página de cambios: (eventos insertados/actualizados, borrados)."""
+    rows, cancelled = {}, []
+    for item in items:
+        google_id = item.get("id")
+        if not google_id:
+            continue
+        if item.get("status") == "cancelled":
+            cancelled.append(google_id)
+            rows.pop(google_id, None)
+            continue
+        row = _event_row(item)
+        if row is not None:
+            rows[google_id] = dict(row, user_id=user_id, calendar_id=calendar_id,
+                                   google_event_id=google_id)
+
+    deleted = 0
+    if cancelled:
+        deleted = db.session.execute(
+            delete(Event).where(Event.user_id == user_id,
+                                Event.google_event_id.in_(cancelled))).rowcount
+    if rows:
+        # Con shards el id lo pone la aplicación; si la fila ya existía conserva el suyo
+        db.session.execute(_upsert_statement(),
+                           sharding.assign_ids(Event, list(rows.values())))
+    if rows or deleted:
+        # Escritura masiva sin flush del ORM: se avisa a caché/réplica a mano
+        changes.record(db.session, "event", user_id)
+    return len(rows), deleted
+
+
+def _delete_missing(user_id: int, seen: set) -> int:
+    """Tras una sincronización completa, borra los eventos de Google que ya no están."""
+    local = db.session.scalars(
+        select(Event.google_event_id).where(Event.user_id == user_id,
+                                            Event.google_event_id.is_not(None))).all()
+    missing = [gid for gid in local if gid not in seen]
+    for i in range(0, len(missing), 1000):
+        db.session.execute(delete(Event).where(
+            Event.user_id == user_id, Event.google_event_id.in_(missing[i:i + 1000])))
+    if missing:
+        changes.record(db.session, "event", user_id)
+    return len(missing)
+
+
+# ---------- sincronización ----------
+
+def _get_state(user: User) -> GoogleSyncState:
+    state = db.session.scalar(
+        select(GoogleSyncState).where(GoogleSyncState.user_id == user.id))
+    if state is None:
+        state = GoogleSyncState(user_id=user.id, google_calendar_id="primary")
+        db.session.add(state)
+    if state.calendar_id is None or db.session.get(Calendar, state.calendar_id) is None:
+        calendar = Calendar(user_id=user.id, title=SYNC_CALENDAR_TITLE,
+                            color=SYNC_CALENDAR_COLOR)
+        db.session.add(calendar)
+        db.session.flush()
+        state.calendar_id = calendar.id
+        # Un calendario nuevo no tiene eventos: hace falta una sincronización completa
+        state.sync_token = None
+    db.session.commit()
+    return state
+
+
+class _UserSync:
+    def __init__(self, client: GoogleCalendarClient, user: User, state: GoogleSyncState,
+                 page_size: int):
+        self.client = client
+        self.user = user
+        self.state = state
+        self.page_size = page_size
+        self.refreshed = False
+
+    def _access_token(self) -> str:
+        if not self.user.google_access_token:
+            self._refresh()
+        return self.user.google_access_token
+
+    def _refresh(self):
+        if self.refreshed or not self.user.google_refresh_token:
+            raise GoogleAPIError(401, "authError", "Sin refresh token válido")
+        self.user.google_access_token = self.client.refresh_access_token(
+            self.user.google_refresh_token)
+        self.refreshed = True
+        db.session.commit()
+
+    def _list(self, sync_token, page_token) -> dict:
+        try:
+            return self.client.list_events(self._access_token(), self.state.google_calendar_id,
+                                           sync_token, page_token, self.page_size)
+        except GoogleAPIError as e:
+            if e.status != 401 or isinstance(e, SyncTokenExpired):
+                raise
+            self._refresh()     # access token caducado: se renueva una vez
+            return self.client.list_events(self._access_token(), self.state.google_calendar_id,
+                                           sync_token, page_token, self.page_size)
+
+    def run(self) -> dict:
+        report = {"user_id": self.user.id, "pages": 0, "upserted": 0, "deleted": 0,
+                  "full": self.state.sync_token is None}
+        sync_token, page_token = self.state.sync_token, None
+        seen = set() if report["full"] else None
+        while True:
+            try:
+                data = self._list(sync_token, page_token)
+            except SyncTokenExpired:
+                if report["full"]:
+                    raise
+                logger.info("Sync token expired, full resync", extra={"user_id": self.user.id})
+                metrics.incr("google_sync.full_resync")
+                self.state.sync_token = sync_token = page_token = None
+                db.session.commit()
+                report["full"], seen = True, set()
+                continue
+
+            items = data.get("items") or []
+            if seen is not None:
+                seen.update(i["id"] for i in items
+                            if i.get("id") and i.get("status") != "cancelled")
+            upserted, deleted = apply_page(self.user.id, self.state.calendar_id, items)
+            report["pages"] += 1
+            report["upserted"] += upserted
+            report["deleted"] += deleted
+            page_token = data.get("nextPageToken")
+            if page_token:
+                db.session.commit()
+                continue
+
+            if seen is not None:
+                report["deleted"] += _delete_missing(self.user.id, seen)
+            self.state.sync_token = data.get("nextSyncToken")
+            self.state.last_synced_at = datetime.utcnow()
+            self.state.last_error = None
+            db.session.commit()
+            metrics.incr("google_sync.events", upserted)
+            return report
+
+
+def sync_user(client: GoogleCalendarClient, user_id: int, page_size: int = 2500) -> dict:
+    user = db.session.get(User, user_id)
+    if user is None or not (user.google_access_token or user.google_refresh_token):
+        return {"user_id": user_id, "skipped": True}
+    state = _get_state(user)
+    started = time.perf_counter()
+    try:
+        with sharding.for_user(user_id):
+            report = _UserSync(client, user, state, page_size).run()
+    except Exception as e:
+        db.session.rollback()
+        state = db.session.get(GoogleSyncState, state.id)
+        state.last_error = f"{type(e).__name__}: {e}"[:1000]
+        db.session.commit()
+        metrics.incr("google_sync.failed")
+        raise
+    finally:
+        metrics.observe("google_sync.user", time.perf_counter() - started)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def linked_user_ids() -> list:
+    return db.session.scalars(
+        select(User.id).where((User.google_access_token.is_not(None))
+                              | (User.google_refresh_token.is_not(None)))
+        .order_by(User.id)).all()
+
+
+def sync_users(app, user_ids: list = None, workers: int = None) -> dict:
+    """Sincroniza varios usuarios en paralelo (pool acotado); un fallo no para al resto."""
+    config = app.config
+    workers = workers or int(config.get("GOOGLE_SYNC_WORKERS", 4))
+    page_size = int(config.get("GOOGLE_SYNC_PAGE_SIZE", 2500))
+    client = client_from_config(config)
+    if user_ids is None:
+        user_ids = linked_user_ids()
+
+    def run(user_id):
+        with app.app_context():
+            try:
+                return sync_user(client, user_id, page_size)
+            except Exception as e:
+                logger.warning("Google sync failed", exc_info=e, extra={"user_id": user_id})
+                return {"user_id": user_id, "error": f"{type(e).__name__}: {e}"}
+            finally:
+                db.session.remove()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers),
+                            thread_name_prefix="google-sync") as pool:
+        results = list(pool.map(run, user_ids))
+    return {
+        "users": len(results),
+        "failed": sum(1 for r in results if "error" in r),
+        "upserted": sum(r.get("upserted", 0) for r in results),
+        "deleted": sum(r.get("deleted", 0) for r in results),
+        "seconds": round(time.perf_counter() - started, 3),
+        "results": results,
+    }
+
+
+@job_handler("google_sync")
+def google_sync_job(payload: dict):
+    app = current_app._get_current_object()
+    user_ids = [payload["user_id"]] if payload.get("user_id") else None
+    report = sync_users(app, user_ids)
+    if report["failed"] and user_ids:
+        # Un único usuario: que el runner de trabajos lo reintente con su backoff
+        raise RuntimeError(report["results"][0]["error"])
+    return {k: v for k, v in report.items() if k != "results"}
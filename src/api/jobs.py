@@ -0,0 +1,274 @@
+"""
+Trabajos en segundo plano dentro del propio proceso.
+
+Las operaciones pesadas (borrar un calendario enorme, importaciones, recálculos)
+se encolan como filas de la tabla `job` y las ejecuta un pool de hilos, de modo
+que el endpoint puede responder 202 al momento. El cliente consulta el estado en
+GET /api/jobs/<id>.
+
+- Un hilo despachador reclama trabajos pendientes con un UPDATE condicional
+  (status='queued' → 'running'), así varios workers de gunicorn pueden compartir
+  la misma tabla sin ejecutar dos veces el mismo trabajo.
+- Si un trabajo falla se reintenta con backoff exponencial hasta max_attempts.
+- Recuperación ante caídas: los trabajos 'running' cuyo lease (JOBS_LEASE_SECONDS)
+  ha caducado vuelven a 'queued', o a 'failed' si ya agotaron max_attempts. Mientras
+  el handler corre, un latido renueva locked_at cada JOBS_LEASE_SECONDS / 3, así un
+  trabajo largo no se relanza en paralelo.
+
+Los handlers se registran con @job_handler("tipo") y reciben el payload (dict).
+También se puede levantar un proceso dedicado con `flask jobs-worker`.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from . import sharding
+from .metrics import metrics
+from .models import db, Job
+
+logger = logging.getLogger("api.jobs")
+
+_handlers = {}
+_runner = None
+
+
+def job_handler(kind: str):
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(kind: str, payload: dict = None, user_id: int = None,
+            max_attempts: int = 3) -> Job:
+    """Crea el trabajo (hace commit) y despierta al despachador de este proceso."""
+    if kind not in _handlers:
+        raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+    job = Job(kind=kind, payload=json.dumps(payload or {}), user_id=user_id,
+              max_attempts=max_attempts)
+    db.session.add(job)
+    db.session.commit()
+    metrics.incr(f"jobs.enqueued.{kind}")
+    if _runner is not None:
+        _runner.wake()
+    return job
+
+
+class JobRunner:
+    def __init__(self, app, workers: int = 2, poll_seconds: float = 2.0,
+                 lease_seconds: float = 300.0):
+        self.app = app
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._slots = threading.Semaphore(workers)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_recovery = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="job-dispatcher",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._pool.shutdown(wait=True)
+
+    def wake(self):
+        self._wake.set()
+
+    # ---------- despachador ----------
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    if time.monotonic() - self._last_recovery > self.lease_seconds / 2:
+                        self.recover_stale()
+                        self._last_recovery = time.monotonic()
+                    claimed = self._claim_and_submit()
+                    db.session.remove()
+            except Exception:
+                logger.exception("Job dispatcher error")
+                claimed = 0
+            if not claimed:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def recover_stale(self) -> int:
+        """
+        Devuelve a la cola los trabajos cuyo worker murió a mitad; los que ya agotaron
+        sus intentos (p. ej. uno que tumba al worker cada vez) se dan por fallidos.
+        """
+        now = datetime.utcnow()
+        stale = (Job.status == "running",
+                 Job.locked_at < now - timedelta(seconds=self.lease_seconds))
+        failed = db.session.execute(
+            update(Job)
+            .where(*stale, Job.attempts >= Job.max_attempts)
+            .values(status="failed", locked_by=None, locked_at=None, finished_at=now,
+                    error="Lease caducado: el worker murió en cada intento")).rowcount
+        result = db.session.execute(
+            update(Job)
+            .where(*stale)
+            .values(status="queued", locked_by=None, locked_at=None))
+        db.session.commit()
+        if failed:
+            logger.warning("Stale jobs out of attempts", extra={"count": failed})
+            metrics.incr("jobs.failed", failed)
+        if result.rowcount:
+            logger.warning("Recovered stale jobs", extra={"count": result.rowcount})
+            metrics.incr("jobs.recovered", result.rowcount)
+        return result.rowcount
+
+    def _claim_and_submit(self) -> int:
+        claimed = 0
+        while self._slots.acquire(blocking=False):
+            job_id = self._claim_one()
+            if job_id is None:
+                self._slots.release()
+                break
+            claimed += 1
+            self._pool.submit(self._run, job_id)
+        return claimed
+
+    def _claim_one(self):
+        now = datetime.utcnow()
+        candidates = db.session.query(Job.id).filter(
+            Job.status == "queued", Job.run_after <= now
+        ).order_by(Job.id.asc()).limit(5).all()
+        for (job_id,) in candidates:
+            # Compare-and-set: solo un worker consigue pasar la fila a 'running'
+            result = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "queued")
+                .values(status="running", locked_by=self.worker_id, locked_at=now,
+                        attempts=Job.attempts + 1))
+            db.session.commit()
+            if result.rowcount == 1:
+                return job_id
+        return None
+
+    # ---------- ejecución ----------
+
+    def _run(self, job_id: int):
+        try:
+            with self.app.app_context():
+                try:
+                    self._execute(job_id)
+                finally:
+                    db.session.remove()
+        finally:
+            self._slots.release()
+            self._wake.set()
+
+    def _heartbeat(self, engine, job_id: int, stop: threading.Event):
+        """Renueva locked_at mientras el trabajo sigue siendo de este worker."""
+        while not stop.wait(self.lease_seconds / 3):
+            try:
+                with engine.begin() as conn:
+                    renewed = conn.execute(
+                        update(Job.__table__)
+                        .where(Job.__table__.c.id == job_id,
+                               Job.__table__.c.status == "running",
+                               Job.__table__.c.locked_by == self.worker_id)
+                        .values(locked_at=datetime.utcnow())).rowcount
+            except Exception:
+                logger.exception("Job heartbeat failed", extra={"job_id": job_id})
+                continue
+            if not renewed:
+                logger.warning("Job lease lost", extra={"job_id": job_id})
+                return
+
+    def _execute(self, job_id: int):
+        job = db.session.get(Job, job_id)
+        if job is None:
+            logger.warning("Job vanished before running", extra={"job_id": job_id})
+            return
+        handler = _handlers.get(job.kind)
+        started = time.perf_counter()
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, name=f"job-heartbeat-{job_id}",
+                                     args=(db.engine, job_id, stop), daemon=True)
+        heartbeat.start()
+        try:
+            if handler is None:
+                raise RuntimeError(f"Sin handler para '{job.kind}'")
+            # Con shards, las consultas a event/task van al shard del dueño del trabajo
+            with sharding.for_user(job.user_id):
+                result = handler(json.loads(job.payload or "{}"))
+        except Exception as e:
+            stop.set()
+            heartbeat.join()
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            if job is None:
+                logger.warning("Job vanished while running", exc_info=e,
+                               extra={"job_id": job_id})
+                return
+            logger.warning("Job failed", exc_info=e,
+                           extra={"job_id": job_id, "kind": job.kind,
+                                  "attempt": job.attempts})
+            job.error = f"{type(e).__name__}: {e}"
+            job.locked_by = job.locked_at = None
+            if job.attempts < job.max_attempts:
+                job.status = "queued"
+                job.run_after = datetime.utcnow() + timedelta(seconds=2 ** job.attempts)
+                metrics.incr("jobs.retried")
+            else:
+                job.status = "failed"
+                job.finished_at = datetime.utcnow()
+                metrics.incr("jobs.failed")
+            db.session.commit()
+            return
+        finally:
+            stop.set()
+        heartbeat.join()
+
+        job = db.session.get(Job, job_id)
+        if job is None:
+            logger.warning("Job vanished while running", extra={"job_id": job_id})
+            return
+        job.status = "succeeded"
+        job.result = json.dumps(result) if result is not None else None
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        job.locked_by = job.locked_at = None
+        db.session.commit()
+        metrics.observe(f"jobs.{job.kind}", time.perf_counter() - started)
+
+
+def setup_jobs(app, start: bool = True):
+    """Crea el runner; el despachador arranca con la primera petición del proceso."""
+    global _runner
+    workers = int(app.config.get("JOBS_WORKERS", 2))
+    if workers <= 0:
+        return None
+    _runner = JobRunner(app, workers=workers,
+                        poll_seconds=float(app.config.get("JOBS_POLL_SECONDS", 2)),
+                        lease_seconds=float(app.config.get("JOBS_LEASE_SECONDS", 300)))
+    if not start:
+        return _runner
+
+    started = threading.Lock()
+
+    @app.before_request
+    def start_job_runner():
+        # Se arranca aquí y no al importar: con gunicorn --preload los hilos
+        # creados en el master no sobreviven al fork de los workers
+        if _runner._thread is None and started.acquire(blocking=False):
+            _runner.start()
+
+    return _runner
@@ -0,0 +1,40 @@
+"""
+Carga diferida del panel /admin.
+
+flask_admin (y sus vistas sobre todos los modelos) es de lo más pesado del arranque
+y casi nunca se usa en producción. LazyAdminApp se monta en /admin con un
+DispatcherMiddleware y solo importa y construye el admin con la primera petición,
+en una mini-app Flask propia (Flask no permite registrar rutas en la app principal
+una vez que ya ha atendido peticiones).
+"""
+import threading
+
+from flask import Flask
+
+from .models import db
+
+
+class LazyAdminApp:
+    def __init__(self, parent: Flask):
+        self.parent = parent
+        self._app = None
+        self._lock = threading.Lock()
+
+    def _build(self) -> Flask:
+        from .admin import setup_admin
+        from .querylog import setup_query_log
+
+        admin_app = Flask(__name__)
+        admin_app.config.update(self.parent.config)
+        db.init_app(admin_app)
+        setup_query_log(admin_app)
+        # El middleware ya recorta el prefijo /admin del PATH_INFO
+        setup_admin(admin_app, url='/')
+        return admin_app
+
+    def __call__(self, environ, start_response):
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    self._app = self._build()
+        return self._app(environ, start_response)
@@ -0,0 +1,166 @@
+"""
+Logging estructurado (JSON) y no bloqueante.
+
+Los handlers de la petición solo encolan el registro (QueueHandler); un hilo de
+fondo (QueueListener) lo formatea y lo escribe. Así una ráfaga de errores 500 no
+pone a los workers a esperar por stdout.
+
+- Cada línea lleva el `request_id` de la petición (cabecera X-Request-ID entrante
+  o uno generado), que también se devuelve en la respuesta.
+- Las trazas idénticas (mismo tipo de excepción y mismos frames) se deduplican:
+  dentro de LOG_DEDUP_SECONDS solo se escribe la primera y después se indica
+  cuántas se suprimieron.
+- Si la cola se llena, los registros se descartan (y se cuentan) en lugar de bloquear.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+from .metrics import metrics
+
+_listeners = []
+
+# Atributos estándar de LogRecord: lo demás se considera "extra" y va al JSON
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id", "suppressed"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc_type"] = record.exc_info[0].__name__
+            entry["traceback"] = "".join(traceback.format_exception(*record.exc_info))
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Se ejecuta en el hilo que loguea, donde aún existe el contexto de la petición."""
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = g.get("request_id") if has_request_context() else None
+        return True
+
+
+class DedupFilter(logging.Filter):
+    """Deja pasar una traza idéntica como mucho una vez cada `window` segundos."""
+
+    def __init__(self, window: float = 60.0, max_keys: int = 1024):
+        super().__init__()
+        self.window = window
+        self.max_keys = max_keys
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(exc_info):
+        # Recorrer los frames es barato; formatear la traza no, y eso se hace después
+        exc_type, _, tb = exc_info
+        frames = []
+        while tb is not None:
+            frames.append((tb.tb_frame.f_code.co_filename, tb.tb_lineno))
+            tb = tb.tb_next
+        return (exc_type, tuple(frames))
+
+    def filter(self, record):
+        if not record.exc_info or record.exc_info[0] is None:
+            return True
+        key = self._key(record.exc_info)
+        now = time.monotonic()
+        with self._lock:
+            first_seen, count = self._seen.get(key, (None, 0))
+            if first_seen is not None and now - first_seen < self.window:
+                self._seen[key] = (first_seen, count + 1)
+                metrics.incr("logs.deduplicated")
+                return False
+            if len(self._seen) >= self.max_keys:
+                self._seen.clear()
+            self._seen[key] = (now, 0)
+        record.suppressed = count
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # A diferencia del QueueHandler estándar no formateamos aquí la traza:
+        # lo hace el hilo de fondo. Solo resolvemos msg % args.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.incr("logs.dropped")
+
+
+def attach_queued_handler(logger: logging.Logger, handler: logging.Handler,
+                          maxsize: int = 10000, filters=()):
+    """Conecta `handler` a `logger` a través de una cola drenada por un hilo propio."""
+    q = queue.Queue(maxsize=maxsize)
+    queue_handler = NonBlockingQueueHandler(q)
+    for f in filters:
+        queue_handler.addFilter(f)
+    logger.addHandler(queue_handler)
+    listener = QueueListener(q, handler, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return queue_handler
+
+
+def _stop_listeners():
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(_stop_listeners)
+
+
+def setup_logging(app):
+    level = getattr(logging, str(app.config.get("LOG_LEVEL", "INFO")).upper(), logging.INFO)
+    window = float(app.config.get("LOG_DEDUP_SECONDS", 60))
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+
+    api_logger = logging.getLogger("api")
+    api_logger.setLevel(level)
+    api_logger.propagate = False
+    for h in list(api_logger.handlers):
+        api_logger.removeHandler(h)
+    attach_queued_handler(api_logger, stream,
+                          filters=(RequestIdFilter(), DedupFilter(window)))
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get("X-Request-ID", "")
+        g.request_id = incoming[:64] if incoming else uuid.uuid4().hex
+
+    @app.after_request
+    def expose_request_id(response):
+        if "request_id" in g:
+            response.headers["X-Request-ID"] = g.request_id
+        return response
@@ -0,0 +1,70 @@
+"""
+Métricas internas del proceso (contadores, tiempos y gauges).
+
+Registro mínimo en memoria, seguro entre hilos, que el resto de módulos usan para
+publicar su coste (compresión, caché, etc.). Se consulta en GET /api/metrics.
+Los valores son por proceso: con varios workers de gunicorn cada uno tiene los suyos.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+        self._gauges = {}
+        self._collectors = {}
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            t = self._timers.get(name)
+            if t is None:
+                t = self._timers[name] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            ms = seconds * 1000
+            t["count"] += 1
+            t["total_ms"] += ms
+            if ms > t["max_ms"]:
+                t["max_ms"] = ms
+
+    def gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def register_collector(self, name: str, fn):
+        """`fn()` devuelve un dict que se incluye tal cual en el snapshot."""
+        with self._lock:
+            self._collectors[name] = fn
+
+    @contextmanager
+    def cpu_timer(self, name: str):
+        """Mide tiempo de CPU del hilo actual (no incluye esperas de I/O)."""
+        start = time.thread_time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.thread_time() - start)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            data = {
+                "counters": dict(self._counters),
+                "timers": {k: dict(v) for k, v in self._timers.items()},
+                "gauges": dict(self._gauges),
+            }
+            collectors = list(self._collectors.items())
+        for name, fn in collectors:
+            try:
+                data[name] = fn()
+            except Exception as e:
+                data[name] = {"error": str(e)}
+        return data
+
+
+metrics = Metrics()
@@ -1,11 +1,26 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, ForeignKey, Integer, DateTime, Text
-from datetime import datetime
+import sqlite3
+from sqlalchemy import (String, Boolean, BigInteger, ForeignKey, Integer, Date, DateTime, Text,
+                        Index, event, func, text)
+from sqlalchemy.engine import Engine
+from datetime import datetime, date
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from werkzeug.security import generate_password_hash, check_password_hash
 
-db = SQLAlchemy()
+from .db_routing import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+@event.listens_for(Engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite no aplica FOREIGN KEY / ON DELETE CASCADE salvo que se active por conexión
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
 
 
 class User(db.Model):
@@ -31,15 +46,18 @@ class User(db.Model):
         String(255), nullable=True)
 
     # Relaciones
+    # passive_deletes: el borrado de hijos lo hace la BD (ON DELETE CASCADE)
+    # sin cargarlos antes en la sesión
     events = relationship("Event", back_populates="user",
-                          cascade="all, delete-orphan")
+                          cascade="all, delete-orphan", passive_deletes=True)
     tasks = relationship("Task", back_populates="user",
-                         cascade="all, delete-orphan")
+                         cascade="all, delete-orphan", passive_deletes=True)
     task_groups = relationship("TaskGroup", back_populates="user",
-                               cascade="all, delete-orphan")
+                               cascade="all, delete-orphan", passive_deletes=True)
 
     calendars = relationship(
-        "Calendar", back_populates="user", cascade="all, delete-orphan")
+        "Calendar", back_populates="user", cascade="all, delete-orphan",
+        passive_deletes=True)
 
     def set_password(self, password):
         self.password = generate_password_hash(password)
@@ -70,12 +88,19 @@ class User(db.Model):
 
 class Event(db.Model):
     __tablename__ = 'event'
+    __table_args__ = (
+        Index('ix_event_user_id_start_date', 'user_id', 'start_date'),
+        # Clave del upsert de la sincronización con Google (los NULL no chocan)
+        Index('ux_event_user_id_google_event_id', 'user_id', 'google_event_id',
+              unique=True),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey('user.id'), nullable=False)
+        Integer, ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
     calendar_id: Mapped[int] = mapped_column(   # Enlaza con Calendar
-        Integer, ForeignKey('calendar.id', ondelete="CASCADE"), nullable=False
+        Integer, ForeignKey('calendar.id', ondelete="CASCADE"), nullable=False,
+        index=True
     )
 
     title: Mapped[str] = mapped_column(String(200), nullable=False)
@@ -113,18 +138,24 @@ class Task(db.Model):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey('user.id'), nullable=False)
+        Integer, ForeignKey('user.id', ondelete="CASCADE"), nullable=False,
+        index=True)
     task_group_id: Mapped[int] = mapped_column(
         # Cambiado a nullable True para pruebas
-        Integer, ForeignKey('task_group.id'), nullable=True
+        Integer, ForeignKey('task_group.id', ondelete="CASCADE"), nullable=True,
+        index=True, active_history=True
     )
 
     title: Mapped[str] = mapped_column(String(200), nullable=False)
-    status: Mapped[bool] = mapped_column(Boolean, default=False)
+    # active_history: los rollups de api/task_stats.py necesitan el valor anterior
+    status: Mapped[bool] = mapped_column(Boolean, default=False, active_history=True)
     date: Mapped[datetime] = mapped_column(
         DateTime, nullable=True)  # Cambiado a True para pruebas y deberia ser True por el apartado sinFechas
     recurrencia: Mapped[int] = mapped_column(Integer, default=0)
     color: Mapped[str] = mapped_column(String(50))
+    # Lo fija api/task_stats.py al pasar status a True (y lo borra al desmarcarla)
+    completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=True,
+                                                   active_history=True)
 
     # Relaciones
     user = relationship("User", back_populates="tasks")
@@ -140,7 +171,8 @@ class Task(db.Model):
             "status": self.status,
             "date": self.date.isoformat() if self.date else None,
             "recurrencia": self.recurrencia,
-            "color": self.color
+            "color": self.color,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None
         }
 
 
@@ -149,13 +181,14 @@ class TaskGroup(db.Model):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey('user.id'), nullable=False)
+        Integer, ForeignKey('user.id', ondelete="CASCADE"), nullable=False,
+        index=True)
     title: Mapped[str] = mapped_column(String(200), nullable=False)
     color: Mapped[str] = mapped_column(String(50))
 
     user = relationship("User", back_populates="task_groups")
     tasks = relationship("Task", back_populates="task_groups",
-                         cascade="all, delete-orphan")
+                         cascade="all, delete-orphan", passive_deletes=True)
 
     def serialize_with_tasks(self):
         return {
@@ -167,19 +200,41 @@ class TaskGroup(db.Model):
         }
 
 
+class TaskCompletionDaily(db.Model):
+    """Tareas completadas por usuario, día y grupo (ver api/task_stats.py)."""
+    __tablename__ = 'task_completion_daily'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
+    # NULL = tareas sin grupo; al borrar el grupo (y sus tareas) se va su parte
+    task_group_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('task_group.id', ondelete="CASCADE"), nullable=True,
+        index=True)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    completed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+# Clave del upsert incremental; COALESCE para que las tareas sin grupo no se dupliquen
+Index('ux_task_completion_daily_user_id_day_group',
+      TaskCompletionDaily.user_id, TaskCompletionDaily.day,
+      func.coalesce(TaskCompletionDaily.task_group_id, text('0')), unique=True)
+
+
 class Calendar(db.Model):
     __tablename__ = 'calendar'
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey('user.id'), nullable=False)
+        Integer, ForeignKey('user.id', ondelete="CASCADE"), nullable=False,
+        index=True)
     title: Mapped[str] = mapped_column(String(200), nullable=False)
     color: Mapped[str] = mapped_column(String(50))
 
     # Relaciones
     user = relationship("User", back_populates="calendars")
     events = relationship("Event", back_populates="calendar",
-                          cascade="all, delete-orphan")
+                          cascade="all, delete-orphan", passive_deletes=True)
 
     def serialize(self):
         return {
@@ -189,3 +244,161 @@ class Calendar(db.Model):
             "color": self.color
 
         }
+
+
+class CalendarShare(db.Model):
+    """Acceso de otro usuario a un calendario: rol "read" o "write" (ver api/permissions.py)."""
+    __tablename__ = 'calendar_share'
+    __table_args__ = (
+        Index('ux_calendar_share_calendar_id_user_id', 'calendar_id', 'user_id',
+              unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    calendar_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('calendar.id', ondelete="CASCADE"), nullable=False)
+    # Usuario con quien se comparte (no el dueño)
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('user.id', ondelete="CASCADE"), nullable=False,
+        index=True)
+    role: Mapped[str] = mapped_column(String(10), nullable=False, default="read")
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow)
+
+    def serialize(self):
+        return {
+            "calendar_id": self.calendar_id,
+            "user_id": self.user_id,
+            "role": self.role,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class Job(db.Model):
+    """Trabajo en segundo plano (ver api/jobs.py)."""
+    __tablename__ = 'job'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('user.id', ondelete="CASCADE"), nullable=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=True)   # JSON
+    status: Mapped[str] = mapped_column(
+        String(20), nullable=False, default="queued", index=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=3)
+    result: Mapped[str] = mapped_column(Text, nullable=True)    # JSON
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow)
+    run_after: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow)
+    locked_by: Mapped[str] = mapped_column(String(64), nullable=True)
+    locked_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class GoogleSyncState(db.Model):
+    """Estado de la sincronización incremental con Google Calendar (ver api/google_sync.py)."""
+    __tablename__ = 'google_sync_state'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('user.id', ondelete="CASCADE"), nullable=False,
+        unique=True)
+    # Calendario local donde se guardan los eventos importados
+    calendar_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('calendar.id', ondelete="SET NULL"), nullable=True)
+    google_calendar_id: Mapped[str] = mapped_column(
+        String(255), nullable=False, default="primary")
+    sync_token: Mapped[str] = mapped_column(Text, nullable=True)
+    last_synced_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+
+    def serialize(self):
+        return {
+            "user_id": self.user_id,
+            "calendar_id": self.calendar_id,
+            "google_calendar_id": self.google_calendar_id,
+            "incremental": self.sync_token is not None,
+            "last_synced_at": self.last_synced_at.isoformat() if self.last_synced_at else None,
+            "last_error": self.last_error,
+        }
+
+
+class Reminder(db.Model):
+    """Aviso de un evento o una tarea `minutes_before` minutos antes (ver api/reminders.py)."""
+    __tablename__ = 'reminder'
+    __table_args__ = (
+        # El planificador solo recorre los pendientes por remind_at (índice parcial)
+        Index('ix_reminder_pending_remind_at', 'remind_at',
+              postgresql_where=text('sent_at IS NULL'),
+              sqlite_where=text('sent_at IS NULL')),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('user.id', ondelete="CASCADE"), nullable=False,
+        index=True)
+    event_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('event.id', ondelete="CASCADE"), nullable=True,
+        index=True)
+    task_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('task.id', ondelete="CASCADE"), nullable=True,
+        index=True)
+    minutes_before: Mapped[int] = mapped_column(Integer, nullable=False, default=10)
+    remind_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    sent_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "event_id": self.event_id,
+            "task_id": self.task_id,
+            "minutes_before": self.minutes_before,
+            "remind_at": self.remind_at.isoformat() if self.remind_at else None,
+            "sent_at": self.sent_at.isoformat() if self.sent_at else None,
+        }
+
+
+class SchedulerLease(db.Model):
+    """Lease con nombre para elegir un único líder entre workers (ver api/reminders.py)."""
+    __tablename__ = 'scheduler_lease'
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    holder: Mapped[str] = mapped_column(String(64), nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+
+class UserShard(db.Model):
+    """Shard en el que viven los eventos y tareas de cada usuario (ver api/sharding.py)."""
+    __tablename__ = 'user_shard'
+
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('user.id', ondelete="CASCADE"), primary_key=True)
+    shard: Mapped[str] = mapped_column(String(50), nullable=False)
+    # True mientras `flask shards-rebalance` copia sus datos (las peticiones dan 503)
+    moving: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ShardIdSequence(db.Model):
+    """Siguiente id libre de una tabla repartida en shards (se reserva por bloques)."""
+    __tablename__ = 'shard_id_sequence'
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    next_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
@@ -0,0 +1,147 @@
+"""
+Permisos sobre calendarios propios y compartidos (tabla calendar_share).
+
+Roles, de menos a más:
+- "read":  ver el calendario y sus eventos
+- "write": además crear, editar y borrar sus eventos
+- "owner": el dueño; solo él edita/borra el calendario y gestiona con quién se comparte
+
+calendar_roles(user_id) carga en una sola consulta (UNION de los calendarios
+propios y los compartidos) todo el conjunto efectivo del usuario,
+{calendar_id: (rol, dueño)}, y lo guarda en `g` para el resto de la petición.
+Así comprobar varios calendarios o eventos cuesta como mucho una consulta, y los
+objetos propios (user_id del usuario) ni siquiera la necesitan. No se guarda entre
+peticiones: una compartición retirada deja de valer en la siguiente.
+
+Los eventos de un calendario compartido siguen perteneciendo (user_id) al dueño
+del calendario, también los que crea otro usuario con rol "write". Los cambios en
+esos eventos y calendarios se anotan además para los usuarios con acceso
+(api/changes.py), así su caché de respuestas y sus notificaciones push se
+invalidan igual que las del dueño. Las escrituras masivas que no pasan por el
+flush (importación, sincronización con Google) solo avisan al dueño; los demás
+las ven al caducar CACHE_TTL.
+"""
+from flask import g, has_app_context
+from sqlalchemy import event, inspect, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from . import changes, sharding
+from .metrics import metrics
+from .models import db, Calendar, CalendarShare, Event
+from .utils import APIException
+
+ROLES = ("read", "write")
+_RANK = {"read": 1, "write": 2, "owner": 3}
+
+
+def calendar_roles(user_id: int) -> dict:
+    """{calendar_id: (rol, user_id del dueño)} de todos los calendarios accesibles."""
+    cache = g.setdefault("calendar_roles", {}) if has_app_context() else {}
+    roles = cache.get(user_id)
+    if roles is None:
+        owned = select(Calendar.id, Calendar.user_id, literal("owner")).where(
+            Calendar.user_id == user_id)
+        shared = (select(Calendar.id, Calendar.user_id, CalendarShare.role)
+                  .join(CalendarShare, CalendarShare.calendar_id == Calendar.id)
+                  .where(CalendarShare.user_id == user_id))
+        roles = cache[user_id] = {
+            calendar_id: (role, owner_id)
+            for calendar_id, owner_id, role in db.session.execute(union_all(owned, shared))}
+        metrics.incr("permissions.loads")
+    return roles
+
+
+def forget(user_id: int):
+    """Descarta el conjunto cargado en esta petición (tras cambiar comparticiones)."""
+    if has_app_context():
+        g.get("calendar_roles", {}).pop(user_id, None)
+
+
+def shared_calendar_ids(user_id: int):
+    """Subconsulta con los calendarios compartidos con el usuario (para los listados)."""
+    return select(CalendarShare.calendar_id).where(CalendarShare.user_id == user_id)
+
+
+def calendar_contacts(user_id: int):
+    """
+    Subconsulta con los usuarios que comparten algún calendario con el usuario, en
+    cualquier sentido: dueños de calendarios compartidos con él y usuarios con acceso
+    a alguno de los suyos.
+    """
+    owners = (select(Calendar.user_id)
+              .join(CalendarShare, CalendarShare.calendar_id == Calendar.id)
+              .where(CalendarShare.user_id == user_id))
+    sharees = (select(CalendarShare.user_id)
+               .join(Calendar, CalendarShare.calendar_id == Calendar.id)
+               .where(Calendar.user_id == user_id))
+    return union_all(owners, sharees)
+
+
+def require_calendar(calendar_id: int, user_id: int, role: str = "read") -> int:
+    """Comprueba el acceso al calendario y devuelve el user_id de su dueño."""
+    entry = calendar_roles(user_id).get(calendar_id)
+    if entry is None:
+        raise APIException("El calendario no existe o no pertenece al usuario", 404)
+    if _RANK[entry[0]] < _RANK[role]:
+        raise APIException("No tienes permiso para modificar este calendario", 403)
+    return entry[1]
+
+
+def require_owned_calendar(calendar_id: int, user_id: int) -> Calendar:
+    """El calendario si el usuario es su dueño; 403 si solo lo tiene compartido."""
+    cal = db.session.get(Calendar, calendar_id)
+    if cal is None or (cal.user_id != user_id
+                       and calendar_id not in calendar_roles(user_id)):
+        raise APIException("Calendario no encontrado", 404)
+    if cal.user_id != user_id:
+        raise APIException("Solo el dueño puede modificar el calendario", 403)
+    return cal
+
+
+def require_event(event_id: int, user_id: int, role: str = "read") -> Event:
+    """Devuelve el evento si el usuario es su dueño o tiene `role` en su calendario."""
+    ev = db.session.get(Event, event_id)
+    if ev is None and sharding.enabled():
+        # Con shards, el evento de un calendario compartido está en el shard de su
+        # dueño: el resto de la petición (también el refresco tras el commit) va allí
+        owners = {owner_id for _, owner_id in calendar_roles(user_id).values()} - {user_id}
+        for shard, _ in sharding.split_users(owners):
+            sharding.pin_request(shard)
+            ev = db.session.get(Event, event_id)
+            if ev is not None:
+                break
+    if ev is None:
+        raise APIException("Evento no encontrado", 404)
+    if ev.user_id != user_id:
+        entry = calendar_roles(user_id).get(ev.calendar_id)
+        if entry is None:
+            raise APIException("Evento no encontrado", 404)
+        if _RANK[entry[0]] < _RANK[role]:
+            raise APIException("No tienes permiso para modificar este evento", 403)
+    return ev
+
+
+@event.listens_for(Session, "before_flush")
+def _notify_share_audience(session, flush_context, instances):
+    # Antes del flush: al borrar un calendario la BD borra sus comparticiones
+    touched = set()     # (tabla, calendar_id)
+    for obj in session.new | session.dirty | session.deleted:
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Event):
+            touched.add(("event", obj.calendar_id))
+            for old in inspect(obj).attrs.calendar_id.history.deleted:
+                touched.add(("event", old))
+        elif isinstance(obj, Calendar) and obj.id is not None:
+            touched.add(("calendar", obj.id))
+    calendar_ids = {calendar_id for _, calendar_id in touched if calendar_id is not None}
+    if not calendar_ids:
+        return
+    shared_with = {}
+    for calendar_id, user_id in session.execute(
+            select(CalendarShare.calendar_id, CalendarShare.user_id)
+            .where(CalendarShare.calendar_id.in_(calendar_ids))):
+        shared_with.setdefault(calendar_id, []).append(user_id)
+    for table, calendar_id in touched:
+        for user_id in shared_with.get(calendar_id, ()):
+            changes.record(session, table, user_id)
@@ -0,0 +1,253 @@
+"""
+Reparto de notificaciones de cambios a las conexiones SSE (GET /api/stream).
+
+Cada commit publica sus pares (tabla, user_id) (api/changes.py) y el broker los
+reparte a los suscriptores de ese usuario. Pensado para muchas conexiones ociosas:
+- Un canal por usuario conectado (no por conexión): un commit hace un único
+  notify_all en el canal del usuario, así el coste de publicar depende de los
+  usuarios afectados y no del número de conexiones abiertas.
+- El canal guarda un log corto (STREAM_BACKLOG entradas) de (seq, tablas); cada
+  conexión solo recuerda el último seq que envió. Si se queda atrás más que el
+  log, recibe un único aviso de "resync" con todas las tablas. La memoria por
+  conexión es constante, aunque el cliente lea despacio.
+- El heartbeat es el timeout de la espera en la condición: un comentario SSE
+  precalculado, sin consultas ni serialización.
+- No se usa la BD mientras la conexión está abierta (el token se valida al
+  conectar; la conexión se cierra a los STREAM_MAX_SECONDS y el cliente reconecta).
+
+Con varios workers de gunicorn cada proceso solo ve sus propios commits. Con
+PUSH_RELAY=postgres los cambios se reenvían entre procesos con LISTEN/NOTIFY.
+
+Métricas (GET /api/metrics → "stream"): conexiones y usuarios conectados. La
+memoria por suscriptor y el coste del fan-out se miden con `flask bench-stream`.
+"""
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import text
+
+from . import changes
+from .cache import _DEPENDENTS
+from .metrics import metrics
+from .models import db
+
+logger = logging.getLogger("api.push")
+
+RELAY_CHANNEL = "api_changes"
+# pg_notify admite hasta 8000 bytes por mensaje: ~200 pares (tabla, user_id)
+RELAY_CHUNK = 200
+
+
+class Channel:
+    __slots__ = ("cond", "seq", "log", "subscribers")
+
+    def __init__(self, backlog: int):
+        self.cond = threading.Condition(threading.Lock())
+        self.seq = 0
+        self.log = deque(maxlen=backlog)    # (seq, frozenset de tablas)
+        self.subscribers = 0
+
+
+class Broker:
+    def __init__(self, backlog: int = 64, max_connections: int = 1000):
+        self.backlog = backlog
+        self.max_connections = max_connections
+        self._channels = {}
+        self._lock = threading.Lock()
+        self.connections = 0
+
+    def subscribe(self, user_id: int):
+        """Devuelve (canal, seq actual) o None si se alcanzó max_connections."""
+        with self._lock:
+            if self.connections >= self.max_connections:
+                return None
+            channel = self._channels.get(user_id)
+            if channel is None:
+                channel = self._channels[user_id] = Channel(self.backlog)
+            channel.subscribers += 1
+            self.connections += 1
+        metrics.gauge("stream.connections", self.connections)
+        return channel, channel.seq
+
+    def unsubscribe(self, user_id: int, channel: Channel):
+        with self._lock:
+            channel.subscribers -= 1
+            self.connections -= 1
+            if channel.subscribers == 0 and self._channels.get(user_id) is channel:
+                del self._channels[user_id]
+        metrics.gauge("stream.connections", self.connections)
+
+    def publish(self, changed):
+        by_user = {}
+        for table, user_id in changed:
+            if user_id is not None:
+                tables = by_user.setdefault(user_id, set())
+                tables.add(table)
+                tables.update(_DEPENDENTS.get(table, ()))
+        for user_id, tables in by_user.items():
+            channel = self._channels.get(user_id)
+            if channel is None:
+                continue
+            with channel.cond:
+                channel.seq += 1
+                channel.log.append((channel.seq, frozenset(tables)))
+                channel.cond.notify_all()
+            metrics.incr("stream.published")
+
+    def wait(self, channel: Channel, last_seq: int, timeout: float):
+        """Espera cambios posteriores a last_seq: (nuevo seq, tablas | None = resync)."""
+        with channel.cond:
+            if channel.seq == last_seq:
+                channel.cond.wait(timeout)
+            if channel.seq == last_seq:
+                return last_seq, set()
+            oldest = channel.log[0][0] if channel.log else channel.seq + 1
+            if last_seq + 1 < oldest:
+                return channel.seq, None
+            tables = set()
+            for seq, entry in channel.log:
+                if seq > last_seq:
+                    tables.update(entry)
+            return channel.seq, tables
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"connections": self.connections, "users": len(self._channels),
+                    "max_connections": self.max_connections}
+
+
+def _sse(event: str, data: dict, event_id: int = None) -> bytes:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+HEARTBEAT = b": hb\n\n"
+
+
+def event_stream(broker: Broker, user_id: int, channel: Channel, seq: int,
+                 heartbeat: float, max_seconds: float, resync: bool):
+    """Generador de la respuesta SSE; libera la suscripción al cerrarse."""
+    deadline = time.monotonic() + max_seconds
+    try:
+        # retry: milisegundos que espera EventSource antes de reconectar
+        yield b"retry: 3000\n" + _sse("ready", {"user_id": user_id}, seq)
+        if resync:
+            yield _sse("change", {"tables": None, "resync": True}, seq)
+        while time.monotonic() < deadline:
+            seq, tables = broker.wait(channel, seq, min(heartbeat, deadline - time.monotonic()))
+            if tables is None:
+                metrics.incr("stream.resyncs")
+                yield _sse("change", {"tables": None, "resync": True}, seq)
+            elif tables:
+                metrics.incr("stream.messages")
+                yield _sse("change", {"tables": sorted(tables)}, seq)
+            else:
+                metrics.incr("stream.heartbeats")
+                yield HEARTBEAT
+    finally:
+        broker.unsubscribe(user_id, channel)
+
+
+# ---------- relay entre procesos (Postgres LISTEN/NOTIFY) ----------
+
+class PostgresRelay:
+    def __init__(self, engine, broker: Broker):
+        self.engine = engine
+        self.broker = broker
+        self._thread = None
+
+    @property
+    def origin(self) -> str:
+        # Con el pid actual: tras el fork cada worker tiene el suyo
+        return f"{os.getpid()}:{id(self)}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen, name="push-relay", daemon=True)
+        self._thread.start()
+
+    def forward(self, changed):
+        items = [[table, user_id] for table, user_id in changed if user_id is not None]
+        if not items:
+            return
+        with self.engine.connect() as conn:
+            for i in range(0, len(items), RELAY_CHUNK):
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"), {
+                    "channel": RELAY_CHANNEL,
+                    "payload": json.dumps({"origin": self.origin,
+                                           "changes": items[i:i + RELAY_CHUNK]})})
+            conn.commit()
+
+    def _listen(self):
+        while True:
+            raw = None
+            try:
+                raw = self.engine.raw_connection()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {RELAY_CHANNEL}")
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        note = json.loads(conn.notifies.pop(0).payload)
+                        if note.get("origin") != self.origin:
+                            self.broker.publish([tuple(c) for c in note["changes"]])
+            except Exception:
+                logger.exception("Push relay error, reconnecting")
+                time.sleep(5)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.invalidate()
+                    except Exception:
+                        pass
+
+
+_broker = None
+
+
+def setup_push(app):
+    global _broker
+    _broker = Broker(backlog=int(app.config.get("STREAM_BACKLOG", 64)),
+                     max_connections=int(app.config.get("STREAM_MAX_CONNECTIONS", 1000)))
+    changes.subscribe(_broker.publish)
+    metrics.register_collector("stream", _broker.stats)
+
+    relay = app.config.get("PUSH_RELAY", "none")
+    if relay == "postgres":
+        with app.app_context():
+            engine = db.engine
+        if engine.dialect.name != "postgresql":
+            raise RuntimeError("PUSH_RELAY=postgres requiere una BD Postgres")
+        pg_relay = PostgresRelay(engine, _broker)
+
+        @changes.subscribe
+        def _forward(changed):
+            try:
+                pg_relay.forward(changed)
+            except Exception:
+                logger.exception("Push relay publish failed")
+
+        started = threading.Lock()
+
+        @app.before_request
+        def start_push_relay():
+            # Como los trabajos: el hilo se crea en el worker, no antes del fork
+            if pg_relay._thread is None and started.acquire(blocking=False):
+                pg_relay.start()
+    elif relay != "none":
+        raise RuntimeError(f"PUSH_RELAY desconocido: {relay}")
+    return _broker
+
+
+def get_broker() -> Broker:
+    return _broker
@@ -0,0 +1,117 @@
+"""
+Detector de N+1 y presupuesto de consultas por petición (desarrollo y tests).
+
+Con QUERY_BUDGET_MODE distinto de "off" se cuentan las sentencias SQL de cada
+petición y, al terminar:
+- si una misma forma de sentencia (SQL normalizado) se repite QUERY_BUDGET_REPEAT
+  veces o más, se avisa de un posible N+1 con los puntos del código que la lanzan
+- si se supera el presupuesto del endpoint, se avisa ("warn") o la petición falla
+  con QueryBudgetExceeded ("raise", pensado para los tests)
+
+El presupuesto se declara en la ruta, justo debajo de @api.route:
+
+    @api.route("/task-groups", methods=["GET"])
+    @query_budget(2)
+    @token_required
+    def list_task_groups(auth_payload): ...
+
+Los endpoints sin presupuesto usan QUERY_BUDGET_DEFAULT (0 = sin límite).
+La respuesta lleva la cabecera X-Query-Count. Capturar la pila de cada sentencia
+es caro: en producción debe quedarse en "off".
+
+Configuración (app.config / variables de entorno):
+- QUERY_BUDGET_MODE     off | warn | raise (por defecto off)
+- QUERY_BUDGET_DEFAULT  presupuesto de los endpoints sin @query_budget (por defecto 0)
+- QUERY_BUDGET_REPEAT   repeticiones a partir de las que se sospecha N+1 (por defecto 3)
+"""
+import json
+import logging
+import os
+import traceback
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from .models import db
+from .querylog import normalize_sql
+
+logger = logging.getLogger("api.query_budget")
+
+_API_DIR = os.path.dirname(os.path.realpath(__file__))
+_SRC_DIR = os.path.dirname(_API_DIR)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries: int):
+    """Declara el nº máximo de sentencias SQL que puede emitir el endpoint."""
+    def decorator(fn):
+        fn.query_budget = max_queries
+        return fn
+    return decorator
+
+
+def _call_site() -> str:
+    """Frames de nuestro código (no SQLAlchemy/Flask) que originaron la sentencia."""
+    frames = [f for f in traceback.extract_stack()[:-2]
+              if f.filename.startswith(_SRC_DIR) and f.filename != __file__
+              and "site-packages" not in f.filename]
+    return " ← ".join(f"{os.path.relpath(f.filename, _SRC_DIR)}:{f.lineno} {f.name}"
+                      for f in reversed(frames[-2:]))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "query_log" in g:
+        g.query_log.append((normalize_sql(statement), _call_site()))
+
+
+def _endpoint_budget(app, default: int):
+    budget = getattr(app.view_functions.get(request.endpoint), "query_budget", None)
+    return budget if budget is not None else (default or None)
+
+
+def setup_query_budget(app):
+    mode = app.config.get("QUERY_BUDGET_MODE", "off")
+    if mode == "off":
+        return
+    if mode not in ("warn", "raise"):
+        raise RuntimeError(f"QUERY_BUDGET_MODE desconocido: {mode}")
+    default = int(app.config.get("QUERY_BUDGET_DEFAULT", 0))
+    repeat = int(app.config.get("QUERY_BUDGET_REPEAT", 3))
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+    @app.before_request
+    def start_query_log():
+        g.query_log = []
+
+    @app.after_request
+    def check_query_budget(response):
+        queries = g.pop("query_log", None)
+        if queries is None:
+            return response
+        response.headers["X-Query-Count"] = str(len(queries))
+
+        shapes = Counter(shape for shape, _ in queries)
+        for shape, count in shapes.items():
+            if count < repeat:
+                continue
+            sites = sorted({site for s, site in queries if s == shape})
+            logger.warning("Possible N+1", extra={
+                "endpoint": request.endpoint, "count": count, "sql": shape[:300],
+                "call_sites": sites[:5]})
+
+        budget = _endpoint_budget(app, default)
+        if budget is not None and len(queries) > budget:
+            detail = {"endpoint": request.endpoint, "queries": len(queries),
+                      "budget": budget,
+                      "by_call_site": Counter(site for _, site in queries).most_common(5)}
+            if mode == "raise":
+                raise QueryBudgetExceeded(json.dumps(detail))
+            logger.warning("Query budget exceeded", extra=detail)
+        return response
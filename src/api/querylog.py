@@ -0,0 +1,168 @@
+"""
+Registro de consultas lentas (slow-query log) con captura automática de EXPLAIN.
+
+Se engancha a los eventos de SQLAlchemy de todos los engines de `db` y mide cada
+sentencia. Las que superan SLOW_QUERY_MS se escriben (una línea JSON por consulta)
+en un fichero rotativo con:
+- SQL normalizado (literales sustituidos por `?`)
+- forma de los parámetros (tipos, no valores)
+- endpoint de Flask que originó la consulta
+- plan EXPLAIN (SQLite y Postgres)
+
+Configuración (app.config / variables de entorno):
+- SLOW_QUERY_MS        umbral en milisegundos (por defecto 200, 0 = desactivado)
+- SLOW_QUERY_LOG       ruta del fichero (por defecto /tmp/slow_queries.log)
+- SLOW_QUERY_EXPLAIN   "0" para no capturar el plan
+"""
+import json
+import logging
+import re
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+from .logs import attach_queued_handler
+from .models import db
+
+logger = logging.getLogger("api.slow_queries")
+
+# Últimas consultas lentas en memoria (para inspección rápida sin abrir el fichero)
+recent_slow_queries = deque(maxlen=200)
+_log_paths = set()
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)+\s*\?\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+def normalize_sql(statement: str) -> str:
+    """Colapsa espacios y sustituye literales para agrupar consultas iguales."""
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = re.sub(r"%\(\w+\)s|%s", "?", sql)
+    sql = _IN_LIST.sub("IN (?...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def param_shape(parameters) -> object:
+    """Describe los parámetros por su tipo, sin exponer valores (pueden ser datos personales)."""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            # executemany: basta con la forma de la primera fila y el número de filas
+            return {"rows": len(parameters), "row": param_shape(parameters[0])}
+        return [type(v).__name__ for v in parameters]
+    return type(parameters).__name__
+
+
+def _current_endpoint() -> str:
+    if has_request_context():
+        return request.endpoint or request.path
+    return "-"
+
+
+def _explain(conn, statement: str, parameters, executemany: bool):
+    """Ejecuta EXPLAIN sobre la misma conexión DBAPI. Nunca propaga errores."""
+    if executemany or not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif dialect == "postgresql":
+        prefix = "EXPLAIN "
+    else:
+        return None
+
+    cursor = conn.connection.cursor()
+    try:
+        # En Postgres un error aborta la transacción en curso: lo aislamos con un savepoint
+        if dialect == "postgresql":
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(prefix + statement, parameters or ())
+            rows = cursor.fetchall()
+        except Exception as e:
+            if dialect == "postgresql":
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return [f"EXPLAIN no disponible: {e}"]
+        if dialect == "postgresql":
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    finally:
+        cursor.close()
+
+    if dialect == "sqlite":
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _handle_error(exception_context):
+    # La sentencia falló: descartamos su marca de tiempo para no desalinear la pila
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+def _make_after_cursor_execute(threshold_ms: float, capture_explain: bool):
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+        if elapsed_ms < threshold_ms:
+            return
+
+        entry = {
+            "ts": datetime.utcnow().isoformat(),
+            "ms": round(elapsed_ms, 2),
+            "endpoint": _current_endpoint(),
+            "sql": normalize_sql(statement),
+            "params": param_shape(parameters),
+        }
+        if capture_explain:
+            entry["plan"] = _explain(conn, statement, parameters, executemany)
+
+        recent_slow_queries.append(entry)
+        logger.warning(json.dumps(entry, default=str))
+
+    return _after_cursor_execute
+
+
+def setup_query_log(app):
+    """Registra los listeners en todos los engines configurados (incluidos binds)."""
+    threshold_ms = float(app.config.get("SLOW_QUERY_MS", 200))
+    if threshold_ms <= 0:
+        return
+
+    path = app.config.get("SLOW_QUERY_LOG", "/tmp/slow_queries.log")
+    if path not in _log_paths:
+        # La escritura al fichero la hace el hilo de logging, no la petición
+        handler = RotatingFileHandler(path, maxBytes=5 * 1024 * 1024, backupCount=3)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        attach_queued_handler(logger, handler)
+        _log_paths.add(path)
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False
+
+    capture_explain = str(app.config.get("SLOW_QUERY_EXPLAIN", "1")) != "0"
+    after = _make_after_cursor_execute(threshold_ms, capture_explain)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", after)
+            event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,390 @@
+"""
+Recordatorios de eventos y tareas (tabla `reminder`, p. ej. 10 minutos antes).
+
+El planificador no recorre los eventos: cada recordatorio guarda su remind_at
+(inicio - minutes_before) y hay un índice parcial sobre los pendientes. Cada
+REMINDERS_POLL_SECONDS se lee por ese índice solo la ventana deslizante
+[ahora - REMINDERS_GRACE_SECONDS, ahora + REMINDERS_WINDOW_SECONDS) y los
+recordatorios se meten en un heap en memoria ordenado por remind_at. El hilo
+duerme hasta el siguiente vencimiento, así el coste no depende del número total
+de eventos. Los recordatorios creados en este proceso despiertan al hilo al
+hacer commit (api/changes.py); los de otros procesos entran en el siguiente scan.
+
+Al vencer se comprueba contra el evento/tarea actual (si se movió, se reprograma),
+se marcan como enviados con un UPDATE condicional (sent_at IS NULL) y se entregan
+en bloque al notificador (REMINDER_NOTIFIER):
+- "log":     escribe cada aviso en el log (desarrollo y tests)
+- "webhook": POST JSON {"reminders": [...]} a REMINDER_WEBHOOK_URL
+Si el notificador falla se desmarcan y se reintentan en el siguiente scan.
+
+Con varios workers de gunicorn todos arrancan el hilo, pero solo envía el líder:
+el que tiene el lease "reminders" de la tabla scheduler_lease (UPDATE condicional,
+renovado cada REMINDERS_LEASE_SECONDS / 3). Si el líder muere, otro toma el
+relevo cuando caduca el lease.
+
+Mover un evento/tarea por el ORM recalcula sus remind_at en el mismo flush. Las
+escrituras masivas (importación, sincronización con Google) se corrigen al vencer.
+Las fechas se comparan con datetime.utcnow(), como el resto de la app.
+
+También se puede levantar un proceso dedicado con `flask reminders-worker`. Con
+shards (api/sharding.py) los recordatorios están desactivados: el planificador no
+arranca y POST /api/reminders responde 501.
+"""
+import heapq
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from urllib.request import Request, urlopen
+
+from sqlalchemy import event, inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import changes
+from .metrics import metrics
+from .models import db, Event, Reminder, SchedulerLease, Task
+
+logger = logging.getLogger("api.reminders")
+
+LEASE_NAME = "reminders"
+_NOTIFIERS = {}
+_scheduler = None
+
+
+# ---------- notificadores ----------
+
+def register_notifier(name: str):
+    def decorator(cls):
+        _NOTIFIERS[name] = cls
+        return cls
+    return decorator
+
+
+@register_notifier("log")
+class LogNotifier:
+    def __init__(self, config=None):
+        self.sent = 0
+
+    def send(self, reminders: list):
+        for reminder in reminders:
+            logger.info("Reminder due", extra=reminder)
+        self.sent += len(reminders)
+
+
+@register_notifier("webhook")
+class WebhookNotifier:
+    def __init__(self, config):
+        self.url = config.get("REMINDER_WEBHOOK_URL")
+        self.timeout = float(config.get("REMINDER_WEBHOOK_TIMEOUT", 10))
+        if not self.url:
+            raise RuntimeError("REMINDER_WEBHOOK_URL es obligatorio con el notificador webhook")
+
+    def send(self, reminders: list):
+        body = json.dumps({"reminders": reminders}).encode()
+        req = Request(self.url, data=body, method="POST",
+                      headers={"Content-Type": "application/json"})
+        # urlopen lanza HTTPError con status >= 400: el planificador lo reintenta
+        with urlopen(req, timeout=self.timeout) as resp:
+            resp.read()
+
+
+def notifier_from_config(config):
+    name = config.get("REMINDER_NOTIFIER", "log")
+    if name not in _NOTIFIERS:
+        raise RuntimeError(f"REMINDER_NOTIFIER desconocido: {name}")
+    return _NOTIFIERS[name](config)
+
+
+# ---------- lease (elección de líder) ----------
+
+def try_acquire_lease(name: str, holder: str, lease_seconds: float) -> bool:
+    """Toma o renueva el lease si está libre, caducado o ya es nuestro."""
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=lease_seconds)
+    result = db.session.execute(
+        update(SchedulerLease)
+        .where(SchedulerLease.name == name,
+               or_(SchedulerLease.holder == holder, SchedulerLease.holder.is_(None),
+                   SchedulerLease.expires_at < now))
+        .values(holder=holder, expires_at=expires))
+    if result.rowcount == 1:
+        db.session.commit()
+        return True
+    if db.session.get(SchedulerLease, name) is not None:
+        db.session.commit()
+        return False
+    try:
+        db.session.add(SchedulerLease(name=name, holder=holder, expires_at=expires))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        # Otro worker creó la fila a la vez
+        db.session.rollback()
+        return False
+
+
+def release_lease(name: str, holder: str):
+    db.session.execute(
+        update(SchedulerLease)
+        .where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+        .values(holder=None, expires_at=None))
+    db.session.commit()
+
+
+# ---------- reprogramación al mover eventos/tareas ----------
+
+def remind_at_for(start: datetime, minutes_before: int) -> datetime:
+    return start - timedelta(minutes=minutes_before)
+
+
+@event.listens_for(Session, "before_flush")
+def _reschedule_moved(session, flush_context, instances):
+    moved = {}
+    for obj in session.dirty:
+        if isinstance(obj, Event):
+            attr, column = "start_date", "event_id"
+        elif isinstance(obj, Task):
+            attr, column = "date", "task_id"
+        else:
+            continue
+        if inspect(obj).attrs[attr].history.has_changes():
+            moved[(column, obj.id)] = getattr(obj, attr)
+    if not moved:
+        return
+
+    now = datetime.utcnow()
+    event_ids = [i for c, i in moved if c == "event_id"]
+    task_ids = [i for c, i in moved if c == "task_id"]
+    with session.no_autoflush:
+        reminders = session.scalars(select(Reminder).where(or_(
+            Reminder.event_id.in_(event_ids), Reminder.task_id.in_(task_ids)))).all()
+        for reminder in reminders:
+            column = "event_id" if reminder.event_id is not None else "task_id"
+            start = moved[(column, getattr(reminder, column))]
+            if start is None:
+                session.delete(reminder)    # la tarea ya no tiene fecha
+                continue
+            reminder.remind_at = remind_at_for(start, reminder.minutes_before)
+            if reminder.remind_at > now:
+                reminder.sent_at = None
+
+
+# ---------- planificador ----------
+
+class ReminderScheduler:
+    def __init__(self, app, notifier, window_seconds: float = 600,
+                 poll_seconds: float = 30, lease_seconds: float = 60,
+                 grace_seconds: float = 3600, max_batch: int = 5000):
+        self.app = app
+        self.notifier = notifier
+        self.window = timedelta(seconds=window_seconds)
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.grace = timedelta(seconds=grace_seconds)
+        self.max_batch = max_batch
+        # Sufijo aleatorio: dos planificadores del mismo proceso no comparten lease
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.leader = False
+        self._heap = []             # (remind_at, reminder_id)
+        self._queued = set()
+        self._next_scan = 0.0
+        self._next_renew = 0.0
+        self._rescan = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        changes.subscribe(self._on_changes)
+        self._thread = threading.Thread(target=self._loop, name="reminder-scheduler",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.leader:
+            with self.app.app_context():
+                release_lease(LEASE_NAME, self.worker_id)
+                db.session.remove()
+
+    def _on_changes(self, changed):
+        if any(table == "reminder" for table, _ in changed):
+            self._rescan = True
+            self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    timeout = self.tick()
+                    db.session.remove()
+            except Exception:
+                logger.exception("Reminder scheduler error")
+                timeout = self.poll_seconds
+            if timeout > 0:
+                self._wake.wait(timeout)
+                self._wake.clear()
+
+    def tick(self) -> float:
+        """Una vuelta del planificador; devuelve cuántos segundos puede dormir."""
+        if time.monotonic() >= self._next_renew:
+            was_leader = self.leader
+            self.leader = try_acquire_lease(LEASE_NAME, self.worker_id, self.lease_seconds)
+            self._next_renew = time.monotonic() + self.lease_seconds / 3
+            if self.leader and not was_leader:
+                logger.info("Reminder scheduler is leader", extra={"worker": self.worker_id})
+                self._rescan = True
+            elif was_leader and not self.leader:
+                logger.warning("Reminder scheduler lost leadership",
+                               extra={"worker": self.worker_id})
+                self._heap, self._queued = [], set()
+        if not self.leader:
+            return self._next_renew - time.monotonic()
+
+        if self._rescan or time.monotonic() >= self._next_scan:
+            self._rescan = False
+            self.scan()
+            self._next_scan = time.monotonic() + self.poll_seconds
+        self.deliver_due()
+
+        wait = min(self._next_scan, self._next_renew) - time.monotonic()
+        if self._heap:
+            wait = min(wait, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+        return max(0.0, wait)
+
+    def scan(self) -> int:
+        """Carga en el heap los pendientes de la ventana (consulta por índice)."""
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            select(Reminder.id, Reminder.remind_at)
+            .where(Reminder.sent_at.is_(None),
+                   Reminder.remind_at >= now - self.grace,
+                   Reminder.remind_at < now + self.window)
+            .order_by(Reminder.remind_at)
+            .limit(self.max_batch)).all()
+        added = 0
+        for reminder_id, remind_at in rows:
+            if reminder_id not in self._queued:
+                heapq.heappush(self._heap, (remind_at, reminder_id))
+                self._queued.add(reminder_id)
+                added += 1
+        metrics.incr("reminders.scans")
+        metrics.gauge("reminders.queued", len(self._heap))
+        return added
+
+    def _payload(self, reminder, title, start) -> dict:
+        return {
+            "reminder_id": reminder.id,
+            "user_id": reminder.user_id,
+            "kind": "event" if reminder.event_id is not None else "task",
+            "item_id": reminder.event_id if reminder.event_id is not None else reminder.task_id,
+            "title": title,
+            "starts_at": start.isoformat(),
+            "remind_at": reminder.remind_at.isoformat(),
+            "minutes_before": reminder.minutes_before,
+        }
+
+    def deliver_due(self) -> int:
+        now = datetime.utcnow()
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.max_batch:
+            _, reminder_id = heapq.heappop(self._heap)
+            self._queued.discard(reminder_id)
+            due.append(reminder_id)
+        if not due:
+            return 0
+
+        # Se valida contra el evento/tarea actual: pudo borrarse o moverse
+        rows = db.session.execute(
+            select(Reminder, Event.title, Event.start_date, Task.title, Task.date)
+            .outerjoin(Event, Reminder.event_id == Event.id)
+            .outerjoin(Task, Reminder.task_id == Task.id)
+            .where(Reminder.id.in_(due), Reminder.sent_at.is_(None))).all()
+        payloads = {}
+        for reminder, event_title, event_start, task_title, task_date in rows:
+            title, start = ((event_title, event_start) if reminder.event_id is not None
+                            else (task_title, task_date))
+            if start is None:
+                db.session.delete(reminder)
+                continue
+            expected = remind_at_for(start, reminder.minutes_before)
+            if expected != reminder.remind_at:
+                reminder.remind_at = expected
+                metrics.incr("reminders.rescheduled")
+                if expected > now:
+                    continue
+            payloads[reminder.id] = self._payload(reminder, title, start)
+        db.session.flush()
+
+        claimed = []
+        if payloads:
+            # Compare-and-set: si el lease cambió de manos a mitad, no se envía dos veces
+            claimed = db.session.scalars(
+                update(Reminder.__table__)
+                .where(Reminder.__table__.c.id.in_(list(payloads)),
+                       Reminder.__table__.c.sent_at.is_(None))
+                .values(sent_at=now)
+                .returning(Reminder.__table__.c.id)).all()
+        db.session.commit()
+        if not claimed:
+            return 0
+
+        batch = [payloads[i] for i in claimed]
+        started = time.perf_counter()
+        try:
+            self.notifier.send(batch)
+        except Exception as e:
+            logger.warning("Reminder delivery failed", exc_info=e,
+                           extra={"count": len(batch)})
+            metrics.incr("reminders.failed", len(batch))
+            db.session.execute(
+                update(Reminder.__table__)
+                .where(Reminder.__table__.c.id.in_(claimed))
+                .values(sent_at=None))
+            db.session.commit()
+            return 0
+        metrics.observe("reminders.deliver", time.perf_counter() - started)
+        metrics.incr("reminders.sent", len(batch))
+        lag = max((now - datetime.fromisoformat(p["remind_at"])).total_seconds()
+                  for p in batch)
+        metrics.gauge("reminders.max_lag_seconds", lag)
+        return len(batch)
+
+
+def setup_reminders(app, start: bool = True):
+    """Crea el planificador; el hilo arranca con la primera petición del proceso."""
+    global _scheduler
+    if not app.config.get("REMINDERS_ENABLED", True):
+        return None
+    if "shard_router" in app.extensions:
+        # El planificador hace join de reminder con event/task, que están en otros binds
+        logger.warning("Reminders are disabled: not supported with DATABASE_SHARD_URLS")
+        return None
+    config = app.config
+    _scheduler = ReminderScheduler(
+        app, notifier_from_config(config),
+        window_seconds=float(config.get("REMINDERS_WINDOW_SECONDS", 600)),
+        poll_seconds=float(config.get("REMINDERS_POLL_SECONDS", 30)),
+        lease_seconds=float(config.get("REMINDERS_LEASE_SECONDS", 60)),
+        grace_seconds=float(config.get("REMINDERS_GRACE_SECONDS", 3600)),
+        max_batch=int(config.get("REMINDERS_MAX_BATCH", 5000)))
+    if not start:
+        return _scheduler
+
+    started = threading.Lock()
+
+    @app.before_request
+    def start_reminder_scheduler():
+        # Igual que los trabajos: no se arranca al importar por gunicorn --preload
+        if _scheduler._thread is None and started.acquire(blocking=False):
+            _scheduler.start()
+
+    return _scheduler
@@ -4,6 +4,7 @@ API routes with secure password hashing and signed tokens (no extra installs).
 from flask import request, jsonify, Blueprint, current_app
 from api.models import db, User
 from api.utils import APIException
+from api.metrics import metrics
 from werkzeug.security import check_password_hash
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from functools import wraps
@@ -155,6 +156,23 @@ def profile(auth_payload):
     return jsonify({"user": user_to_public(user)}), 200
 
 
+def is_support_user(user_id) -> bool:
+    """
+    Acceso interno (métricas, soporte): solo los ids de SUPPORT_USER_IDS. No vale el
+    campo rol, que el propio cliente puede elegir en /signup.
+    """
+    return user_id in current_app.config.get("SUPPORT_USER_IDS", ())
+
+
+@api.route('/metrics', methods=['GET'])
+@token_required
+def get_metrics(auth_payload):
+    """Métricas internas del worker que atiende la petición (solo SUPPORT_USER_IDS)."""
+    if not is_support_user(auth_payload.get("user_id")):
+        raise APIException("No autorizado", 403)
+    return jsonify(metrics.snapshot()), 200
+
+
 # ------------------- Recuperación de contraseña -------------------
 
 @api.route('/forgot-password', methods=['POST'])
@@ -2,13 +2,21 @@
 Rutas de eventos (agenda/calendario) con soporte de rangos horarios.
 Se integran al mismo Blueprint `api` definido en routes.py.
 """
-from flask import request, jsonify, Blueprint
+from flask import request, jsonify, Blueprint, current_app
 from datetime import datetime, date, time
 from typing import Optional
 
-from .models import db, Event, Calendar
+from sqlalchemy import or_
+
+from .models import db, Event, Calendar, CalendarShare
 # Reutilizamos el mismo blueprint y decorador de auth del módulo principal
 from .routes import api, token_required
+from .cache import cached_response
+from .query_budget import query_budget
+from .jobs import enqueue, job_handler
+from .permissions import (calendar_roles, require_calendar, require_event,
+                          require_owned_calendar, shared_calendar_ids)
+from . import changes, sharding
 
 # ---------- Helpers ----------
 
@@ -94,17 +102,19 @@ def _get_datetimes(payload: dict) -> tuple[datetime, datetime]:
         "Debes enviar start/end en ISO o bien date + start_time + end_time")
 
 
-def _validate_ownership(calendar_id: Optional[int], user_id: int):
+def _calendar_owner(calendar_id: Optional[int], user_id: int) -> int:
     """
-    Si se pasa calendar_id, valida que el grupo pertenezca al usuario.
+    Si se pasa calendar_id, valida que el usuario pueda escribir en él (propio o
+    compartido con rol "write") y devuelve su dueño, que es quien posee el evento.
     """
     if not calendar_id:
-        return
-    calendar = Calendar.query.filter_by(
-        id=calendar_id, user_id=user_id).first()
-    if not calendar:
+        return user_id
+    try:
+        calendar_id = int(calendar_id)
+    except (TypeError, ValueError):
         from .utils import APIException
-        raise APIException("El grupo no existe o no pertenece al usuario", 404)
+        raise APIException("calendar_id no válido", 400)
+    return require_calendar(calendar_id, user_id, "write")
 
 def _normalize_all_day(start_dt: datetime, end_dt: datetime, is_all_day: bool) -> tuple[datetime, datetime]:
     """
@@ -129,17 +139,28 @@ def events_options(event_id=None):
 
 
 @api.route("/events", methods=["GET"])
+@query_budget(1)
 @token_required
+@cached_response("event")
 def list_events(auth_payload):
     """
-    Lista eventos del usuario autenticado.
+    Lista eventos del usuario autenticado y de los calendarios compartidos con él.
     Filtros opcionales por rango:
       /api/events?start=2025-09-08&end=2025-09-09
       /api/events?start=2025-09-08T00:00&end=2025-09-08T23:59
     """
     user_id = auth_payload.get("user_id")
 
-    q = Event.query.filter_by(user_id=user_id)
+    if sharding.enabled():
+        # Con shards calendar_share no está en la misma base: los ids salen de los
+        # permisos y se consulta el shard de cada dueño
+        roles = calendar_roles(user_id)
+        shared = [cid for cid, (_, owner_id) in roles.items() if owner_id != user_id]
+        owners = {user_id} | {owner_id for _, owner_id in roles.values()}
+    else:
+        # Una sola consulta: los compartidos entran como subconsulta
+        shared, owners = shared_calendar_ids(user_id), [user_id]
+    q = Event.query.filter(or_(Event.user_id == user_id, Event.calendar_id.in_(shared)))
 
     start_qs = request.args.get("start")
     end_qs = request.args.get("end")
@@ -155,7 +176,9 @@ def list_events(auth_payload):
         from .utils import APIException
         raise APIException(str(e), 400)
 
-    events = q.order_by(Event.start_date.asc()).all()
+    events = sharding.scatter(q.order_by(Event.start_date.asc()), owners)
+    if len(owners) > 1:
+        events.sort(key=lambda e: e.start_date)
     return jsonify([e.serialize() for e in events]), 200
 
 
@@ -205,10 +228,10 @@ def create_event(auth_payload):
             "La hora de fin debe ser posterior a la de inicio", 400)
 
     calendar_id = data.get("calendar_id")
-    _validate_ownership(calendar_id, user_id)
+    owner_id = _calendar_owner(calendar_id, user_id)
 
     ev = Event(
-        user_id=user_id,
+        user_id=owner_id,
         calendar_id=calendar_id,
         title=title,
         start_date=start_dt,
@@ -225,12 +248,9 @@ def create_event(auth_payload):
 @api.route("/events/<int:event_id>", methods=["GET"])
 @token_required
 def get_event(auth_payload, event_id: int):
-    from .utils import APIException
     user_id = auth_payload.get("user_id")
 
-    ev = Event.query.filter_by(id=event_id, user_id=user_id).first()
-    if not ev:
-        raise APIException("Evento no encontrado", 404)
+    ev = require_event(event_id, user_id)
     return jsonify(ev.serialize()), 200
 
 
@@ -241,10 +261,8 @@ def update_event(auth_payload, event_id: int):
     user_id = auth_payload.get("user_id")
     data = request.get_json() or {}
 
-    ev = Event.query.filter_by(id=event_id, user_id=user_id).first()
-    if not ev:
-        raise APIException("Evento no encontrado", 404)
-    
+    ev = require_event(event_id, user_id, "write")
+
     all_day = ev.all_day
     if "all_day" in data:
         all_day = bool(data.get("all_day"))
@@ -293,7 +311,9 @@ def update_event(auth_payload, event_id: int):
 
     if "calendar_id" in data:
         gid = data.get("calendar_id")
-        _validate_ownership(gid, user_id)
+        if _calendar_owner(gid, user_id) != ev.user_id:
+            raise APIException(
+                "No se puede mover un evento a un calendario de otro usuario", 400)
         ev.calendar_id = gid
 
     ev.all_day = all_day
@@ -305,12 +325,9 @@ def update_event(auth_payload, event_id: int):
 @api.route("/events/<int:event_id>", methods=["DELETE"])
 @token_required
 def delete_event(auth_payload, event_id: int):
-    from .utils import APIException
     user_id = auth_payload.get("user_id")
 
-    ev = Event.query.filter_by(id=event_id, user_id=user_id).first()
-    if not ev:
-        raise APIException("Evento no encontrado", 404)
+    ev = require_event(event_id, user_id, "write")
 
     db.session.delete(ev)
     db.session.commit()
@@ -327,31 +344,38 @@ def calendars_options(calendar_id=None):
 
 
 @api.route("/calendars", methods=["GET"])
+@query_budget(1)
 @token_required
+@cached_response("calendar")
 def list_calendars(auth_payload):
     """
-    Lista todos los calendarios del usuario autenticado.
+    Lista los calendarios del usuario autenticado y los compartidos con él,
+    cada uno con su "role" ("owner", "write" o "read").
     """
     user_id = auth_payload.get("user_id")
-    calendars = Calendar.query.filter_by(
-        user_id=user_id).order_by(Calendar.id.asc()).all()
-    return jsonify([c.serialize() for c in calendars]), 200
+    rows = (db.session.query(Calendar, CalendarShare.role)
+            .outerjoin(CalendarShare, (CalendarShare.calendar_id == Calendar.id)
+                       & (CalendarShare.user_id == user_id))
+            .filter(or_(Calendar.user_id == user_id, CalendarShare.user_id == user_id))
+            .order_by(Calendar.id.asc()).all())
+    return jsonify([dict(c.serialize(), role=role or "owner") for c, role in rows]), 200
 
 
 @api.route("/calendars/<int:calendar_id>", methods=["GET"])
 @token_required
 def get_calendar(auth_payload, calendar_id: int):
     """
-    Devuelve un calendario específico.
+    Devuelve un calendario específico (propio o compartido) con el rol del usuario.
     """
     from .utils import APIException
     user_id = auth_payload.get("user_id")
 
-    cal = Calendar.query.filter_by(id=calendar_id, user_id=user_id).first()
+    role, _ = calendar_roles(user_id).get(calendar_id, (None, None))
+    cal = db.session.get(Calendar, calendar_id) if role else None
     if not cal:
         raise APIException("Calendario no encontrado", 404)
 
-    return jsonify(cal.serialize()), 200
+    return jsonify(dict(cal.serialize(), role=role)), 200
 
 
 @api.route("/calendars", methods=["POST"])
@@ -396,11 +420,7 @@ def update_calendar(auth_payload, calendar_id: int):
     from .utils import APIException
     user_id = auth_payload.get("user_id")
     data = request.get_json() or {}
-    print(data)
-    cal = Calendar.query.filter_by(id=calendar_id, user_id=user_id).first()
-    print(cal)
-    if not cal:
-        raise APIException("Calendario no encontrado", 404)
+    cal = require_owned_calendar(calendar_id, user_id)
 
     if "title" in data:
         title = (data.get("title") or "").strip()
@@ -420,18 +440,56 @@ def update_calendar(auth_payload, calendar_id: int):
 def delete_calendar(auth_payload, calendar_id: int):
     """
     Elimina un calendario (y opcionalmente sus eventos).
+    Con ?async=1, o si tiene más de JOBS_ASYNC_DELETE_THRESHOLD eventos, el borrado
+    se hace en segundo plano y se responde 202 con el trabajo a consultar.
     """
-    from .utils import APIException
     user_id = auth_payload.get("user_id")
 
+    cal = require_owned_calendar(calendar_id, user_id)
+
+    threshold = int(current_app.config.get("JOBS_ASYNC_DELETE_THRESHOLD", 5000))
+    run_async = request.args.get("async") in ("1", "true")
+    if not run_async and current_app.config.get("JOBS_WORKERS", 2) > 0:
+        # Basta con saber si hay más de `threshold` eventos, no contarlos todos
+        run_async = db.session.query(Event.id).filter_by(
+            calendar_id=calendar_id).offset(threshold).first() is not None
+    if run_async:
+        job = enqueue("delete_calendar",
+                      {"calendar_id": calendar_id, "user_id": user_id},
+                      user_id=user_id)
+        response = jsonify({"message": "Borrado en curso", "job": job.serialize()})
+        response.headers["Location"] = f"/api/jobs/{job.id}"
+        return response, 202
+
+    # Los eventos los borra la BD (ON DELETE CASCADE): una sola sentencia DELETE.
+    # Con shards no hay clave foránea entre bases y se borran aquí, en su shard
+    if sharding.enabled():
+        Event.query.filter_by(calendar_id=calendar_id).delete(synchronize_session=False)
+    db.session.delete(cal)
+    db.session.commit()
+
+    return jsonify({"message": "Calendario eliminado"}), 200
+
+
+@job_handler("delete_calendar")
+def _delete_calendar_job(payload: dict):
+    """Borra los eventos por lotes (transacciones cortas) y después el calendario."""
+    calendar_id, user_id = payload["calendar_id"], payload["user_id"]
     cal = Calendar.query.filter_by(id=calendar_id, user_id=user_id).first()
     if not cal:
-        raise APIException("Calendario no encontrado", 404)
-
-    # Si quieres eliminar también los eventos asociados, descomenta:
-    # Event.query.filter_by(calendar_id=calendar_id, user_id=user_id).delete()
+        return {"deleted_events": 0, "calendar_deleted": False}
+
+    deleted = 0
+    while True:
+        ids = [i for (i,) in db.session.query(Event.id).filter_by(
+            calendar_id=calendar_id).limit(1000)]
+        if not ids:
+            break
+        Event.query.filter(Event.id.in_(ids)).delete(synchronize_session=False)
+        changes.record(db.session, "event", user_id)
+        db.session.commit()
+        deleted += len(ids)
 
     db.session.delete(cal)
     db.session.commit()
-
-    return jsonify({"message": "Calendario eliminado"}), 200
+    return {"deleted_events": deleted, "calendar_deleted": True}
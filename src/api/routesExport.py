@@ -0,0 +1,151 @@
+"""
+Exportación completa de la cuenta:
+- GET /api/export              → NDJSON (una línea JSON por fila)
+- GET /api/export?format=zip   → ZIP con un .ndjson por entidad
+
+Cada línea NDJSON es {"type": "<entidad>", "data": {...}} con los mismos campos
+que los serialize() de los modelos; el orden es user, calendar, task_group, event,
+task (padres antes que hijos), que es lo que espera POST /api/import.
+
+La respuesta se genera en streaming: las filas se leen con un cursor del lado del
+servidor en bloques de EXPORT_CHUNK_SIZE (sin pasar por la sesión del ORM), así
+la memoria es constante sea cual sea el tamaño de la cuenta.
+
+Los usuarios de soporte (SUPPORT_USER_IDS, no el campo rol que elige el cliente)
+pueden exportar otra cuenta con ?user_id=<id>. Con shards (api/sharding.py) los
+eventos y tareas se leen del shard de la cuenta exportada, no del de quien pide.
+"""
+import json
+import zipfile
+from datetime import date, datetime
+
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import select
+
+from . import sharding
+from .models import db, User, Calendar, TaskGroup, Event, Task
+from .metrics import metrics
+from .routes import api, is_support_user, token_required, user_to_public
+from .utils import APIException
+
+# (tipo, modelo, orden): el orden sigue índices existentes para no ordenar en memoria
+EXPORT_ENTITIES = (
+    ("calendar", Calendar, Calendar.id),
+    ("task_group", TaskGroup, TaskGroup.id),
+    ("event", Event, Event.start_date),
+    ("task", Task, Task.id),
+)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"No serializable: {type(value).__name__}")
+
+
+def _line(kind: str, data: dict) -> bytes:
+    return (json.dumps({"type": kind, "data": data}, ensure_ascii=False,
+                       default=_json_default) + "\n").encode("utf-8")
+
+
+def _iter_chunks(model, order_by, user_id: int, chunk_size: int):
+    """Bloques de líneas NDJSON de una tabla, leída con cursor en servidor."""
+    stmt = (select(model.__table__)
+            .where(model.__table__.c.user_id == user_id)
+            .order_by(order_by))
+    result = db.session.execute(stmt, execution_options={"yield_per": chunk_size})
+    kind = model.__tablename__
+    for rows in result.partitions():
+        metrics.incr("export.rows", len(rows))
+        yield b"".join(_line(kind, dict(row._mapping)) for row in rows)
+
+
+def _export_ndjson(profile: dict, chunk_size: int):
+    yield _line("user", profile)
+    for _, model, order_by in EXPORT_ENTITIES:
+        yield from _iter_chunks(model, order_by, profile["id"], chunk_size)
+
+
+def _on_user_shard(user_id: int, body):
+    """Itera `body` con event/task enrutados al shard de `user_id`."""
+    # Se entra dentro del generador: el contexto dura lo que dura el streaming
+    with sharding.for_user(user_id):
+        yield from body
+
+
+class _ChunkBuffer:
+    """Destino no buscable para ZipFile: acumula lo escrito hasta que se recoge."""
+
+    def __init__(self):
+        self._parts = []
+        self._offset = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _export_zip(profile: dict, chunk_size: int):
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("user.ndjson", _line("user", profile))
+        yield buffer.drain()
+        for kind, model, order_by in EXPORT_ENTITIES:
+            # force_zip64: el tamaño final no se conoce al empezar la entrada
+            with zf.open(f"{kind}.ndjson", mode="w", force_zip64=True) as entry:
+                for chunk in _iter_chunks(model, order_by, profile["id"], chunk_size):
+                    entry.write(chunk)
+                    yield buffer.drain()
+    yield buffer.drain()
+
+
+@api.route("/export", methods=["OPTIONS"])
+def export_options():
+    return ("", 204)
+
+
+@api.route("/export", methods=["GET"])
+@token_required
+def export_account(auth_payload):
+    user_id = auth_payload.get("user_id")
+    requested = request.args.get("user_id", type=int)
+    if requested and requested != user_id:
+        if not is_support_user(user_id):
+            raise APIException("No autorizado", 403)
+        user_id = requested
+
+    user = db.session.get(User, user_id)
+    if not user:
+        raise APIException("Usuario no encontrado", 404)
+
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "zip"):
+        raise APIException("format debe ser ndjson o zip", 400)
+
+    chunk_size = int(current_app.config.get("EXPORT_CHUNK_SIZE", 1000))
+    stamp = datetime.utcnow().strftime("%Y%m%d")
+    metrics.incr(f"export.{fmt}")
+    profile = user_to_public(user)
+    if fmt == "zip":
+        body, mimetype = _export_zip(profile, chunk_size), "application/zip"
+    else:
+        body, mimetype = _export_ndjson(profile, chunk_size), "application/x-ndjson"
+
+    response = Response(stream_with_context(_on_user_shard(user.id, body)),
+                        mimetype=mimetype)
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="export-{user.id}-{stamp}.{fmt}"')
+    response.headers["Cache-Control"] = "no-store"
+    return response
@@ -0,0 +1,260 @@
+"""
+Importación masiva en NDJSON:
+- POST /api/import              → crea todo como filas nuevas
+- POST /api/import?mode=merge   → las filas cuyo id ya es del usuario se actualizan
+
+Acepta el mismo formato que GET /api/export: una línea {"type", "data"} por fila,
+con type calendar | task_group | event | task (las líneas "user" se ignoran). Los
+padres deben ir antes que sus hijos: los ids de origen de calendarios y grupos se
+remapean a los nuevos y los calendar_id / task_group_id de eventos y tareas se
+traducen con ese mapa.
+
+El cuerpo se lee línea a línea sin cargarlo entero. Las filas válidas se acumulan
+y se escriben en bloques de IMPORT_CHUNK_SIZE con INSERT/UPDATE masivos, un commit
+por bloque (transacciones acotadas). Si falla un bloque solo se pierden sus
+líneas. La respuesta resume lo insertado/actualizado y los errores por línea
+(hasta IMPORT_MAX_ERRORS).
+"""
+import json
+from datetime import datetime
+
+from flask import current_app, jsonify, request
+from sqlalchemy import insert, select, update
+
+from . import changes, sharding, task_stats
+from .metrics import metrics
+from .models import db, Calendar, TaskGroup, Event, Task
+from .routes import api, token_required
+from .routesEvent import _get_datetimes, _normalize_all_day, _parse_iso_datetime
+from .utils import APIException
+
+MODELS = {"calendar": Calendar, "task_group": TaskGroup, "event": Event, "task": Task}
+# hijo → (tipo del padre, columna)
+PARENTS = {"event": ("calendar", "calendar_id"), "task": ("task_group", "task_group_id")}
+MAX_LINE_BYTES = 1024 * 1024
+
+
+def _text(data: dict, field: str, required: bool = True):
+    value = data.get(field)
+    if isinstance(value, str):
+        value = value.strip()
+    if required and not value:
+        raise ValueError(f"'{field}' es requerido")
+    return value or None
+
+
+def _validate_calendar(data: dict) -> dict:
+    return {"title": _text(data, "title"), "color": _text(data, "color")}
+
+
+_validate_task_group = _validate_calendar
+
+
+def _validate_event(data: dict) -> dict:
+    all_day = bool(data.get("all_day") if "all_day" in data else data.get("allDay"))
+    start_dt, end_dt = _get_datetimes(data)
+    start_dt, end_dt = _normalize_all_day(start_dt, end_dt, all_day)
+    if end_dt <= start_dt:
+        raise ValueError("La hora de fin debe ser posterior a la de inicio")
+    return {
+        "title": _text(data, "title"),
+        "start_date": start_dt,
+        "end_date": end_dt,
+        "all_day": all_day,
+        "description": _text(data, "description", required=False),
+        "color": _text(data, "color", required=False),
+        "google_event_id": _text(data, "google_event_id", required=False),
+        "status": _text(data, "status", required=False) or "confirmed",
+    }
+
+
+def _validate_task(data: dict) -> dict:
+    date_raw = data.get("date")
+    try:
+        recurrencia = int(data.get("recurrencia") or 0)
+    except (TypeError, ValueError):
+        raise ValueError("'recurrencia' debe ser un entero")
+    status = bool(data.get("status", False))
+    completed_raw = data.get("completed_at")
+    completed_at = None
+    if status:
+        # Sin completed_at (exportaciones antiguas) cuenta como completada ahora
+        completed_at = (_parse_iso_datetime(completed_raw) if completed_raw
+                        else datetime.utcnow())
+    return {
+        "title": _text(data, "title"),
+        "status": status,
+        "completed_at": completed_at,
+        "date": _parse_iso_datetime(date_raw) if date_raw else None,
+        "recurrencia": recurrencia,
+        "color": _text(data, "color"),
+    }
+
+
+VALIDATORS = {"calendar": _validate_calendar, "task_group": _validate_task_group,
+              "event": _validate_event, "task": _validate_task}
+
+
+class Importer:
+    def __init__(self, user_id: int, merge: bool, chunk_size: int, max_errors: int):
+        self.user_id = user_id
+        self.merge = merge
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.pending = {kind: [] for kind in MODELS}     # (nº línea, id origen, valores)
+        self.id_map = {"calendar": {}, "task_group": {}}
+        self.owned = {}
+        self.inserted = {kind: 0 for kind in MODELS}
+        self.updated = {kind: 0 for kind in MODELS}
+        self.errors = []
+        self.error_count = 0
+        self.lines = 0
+
+    def error(self, line_no: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line_no, "error": message})
+
+    def _owned_parents(self, kind: str) -> set:
+        # Calendarios/grupos ya existentes del usuario (para modo merge)
+        if kind not in self.owned:
+            model = MODELS[kind]
+            self.owned[kind] = set(db.session.scalars(
+                select(model.id).where(model.user_id == self.user_id)))
+        return self.owned[kind]
+
+    def _resolve_parent(self, kind: str, values: dict, data: dict):
+        parent_kind, column = PARENTS[kind]
+        source_id = data.get(column)
+        if source_id is None:
+            if kind == "event":
+                raise ValueError("'calendar_id' es requerido")
+            values[column] = None
+            return
+        if self.pending[parent_kind]:
+            # El padre puede estar aún en el bloque pendiente: se escribe antes
+            self.flush(parent_kind)
+        if source_id in self.id_map[parent_kind]:
+            values[column] = self.id_map[parent_kind][source_id]
+        elif self.merge and source_id in self._owned_parents(parent_kind):
+            values[column] = source_id
+        else:
+            raise ValueError(f"'{column}' {source_id} no existe en la importación")
+
+    def add(self, line_no: int, raw: bytes):
+        self.lines += 1
+        if raw is None:
+            self.error(line_no, f"Línea demasiado larga (máx. {MAX_LINE_BYTES} bytes)")
+            return
+        try:
+            item = json.loads(raw)
+            kind, data = item.get("type"), item.get("data")
+            if kind == "user":
+                return
+            if kind not in MODELS or not isinstance(data, dict):
+                raise ValueError("Se espera {\"type\": calendar|task_group|event|task, \"data\": {...}}")
+            values = VALIDATORS[kind](data)
+            if kind in PARENTS:
+                self._resolve_parent(kind, values, data)
+        except (ValueError, TypeError, AttributeError) as e:
+            # json.JSONDecodeError es ValueError; tipos inesperados dan TypeError/AttributeError
+            self.error(line_no, str(e))
+            return
+        self.pending[kind].append((line_no, data.get("id"), values))
+        if len(self.pending[kind]) >= self.chunk_size:
+            self.flush(kind)
+
+    def _existing_ids(self, kind: str, source_ids: list) -> set:
+        if kind in self.id_map:
+            return self._owned_parents(kind) & set(source_ids)
+        model = MODELS[kind]
+        return set(db.session.scalars(
+            select(model.id).where(model.user_id == self.user_id, model.id.in_(source_ids))))
+
+    def flush(self, kind: str):
+        rows, self.pending[kind] = self.pending[kind], []
+        if not rows:
+            return
+        model = MODELS[kind]
+        existing = set()
+        if self.merge:
+            existing = self._existing_ids(kind, [sid for _, sid, _ in rows if isinstance(sid, int)])
+        updates = [dict(values, id=sid) for _, sid, values in rows if sid in existing]
+        inserts = [(sid, dict(values, user_id=self.user_id))
+                   for _, sid, values in rows if sid not in existing]
+        # Con shards los ids de event/task no los da la base: se reservan antes
+        sharding.assign_ids(model, [values for _, values in inserts])
+        try:
+            if updates:
+                # UPDATE masivo por clave primaria (executemany)
+                db.session.execute(update(model), updates)
+            new_ids = []
+            if inserts:
+                new_ids = db.session.scalars(
+                    insert(model).returning(model.id, sort_by_parameter_order=True),
+                    [values for _, values in inserts]).all()
+            changes.record(db.session, model.__tablename__, self.user_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for line_no, _, _ in rows:
+                self.error(line_no, f"Error al guardar el bloque: {type(e).__name__}")
+            return
+
+        if kind in self.id_map:
+            for (sid, _), new_id in zip(inserts, new_ids):
+                if sid is not None:
+                    self.id_map[kind][sid] = new_id
+            for values in updates:
+                self.id_map[kind][values["id"]] = values["id"]
+        self.inserted[kind] += len(new_ids)
+        self.updated[kind] += len(updates)
+        metrics.incr("import.rows", len(rows))
+
+    def finish(self) -> dict:
+        for kind in MODELS:
+            self.flush(kind)
+        if self.inserted["task"] or self.updated["task"]:
+            # Las tareas se escriben sin pasar por el flush del ORM
+            task_stats.rebuild([self.user_id])
+        return {"lines": self.lines, "inserted": self.inserted, "updated": self.updated,
+                "error_count": self.error_count, "errors": self.errors}
+
+
+def _iter_lines(stream):
+    """(nº línea, bytes) del cuerpo sin cargarlo entero; las líneas enormes son error."""
+    line_no = 0
+    while True:
+        line = stream.readline(MAX_LINE_BYTES)
+        if not line:
+            return
+        line_no += 1
+        if len(line) >= MAX_LINE_BYTES and not line.endswith(b"\n"):
+            # Se descarta el resto de la línea
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(MAX_LINE_BYTES)
+            yield line_no, None
+            continue
+        if line.strip():
+            yield line_no, line
+
+
+@api.route("/import", methods=["OPTIONS"])
+def import_options():
+    return ("", 204)
+
+
+@api.route("/import", methods=["POST"])
+@token_required
+def import_account(auth_payload):
+    mode = request.args.get("mode", "new")
+    if mode not in ("new", "merge"):
+        raise APIException("mode debe ser new o merge", 400)
+
+    importer = Importer(
+        user_id=auth_payload.get("user_id"), merge=mode == "merge",
+        chunk_size=int(current_app.config.get("IMPORT_CHUNK_SIZE", 1000)),
+        max_errors=int(current_app.config.get("IMPORT_MAX_ERRORS", 1000)))
+    for line_no, raw in _iter_lines(request.stream):
+        importer.add(line_no, raw)
+    return jsonify(importer.finish()), 200
@@ -0,0 +1,23 @@
+"""
+Consulta de trabajos en segundo plano:
+- GET /api/jobs/<id>  → estado del trabajo (solo el propietario)
+"""
+from flask import jsonify
+
+from .models import Job
+from .routes import api, token_required
+from .utils import APIException
+
+
+@api.route("/jobs/<int:job_id>", methods=["OPTIONS"])
+def jobs_options(job_id=None):
+    return ("", 204)
+
+
+@api.route("/jobs/<int:job_id>", methods=["GET"])
+@token_required
+def get_job(auth_payload, job_id: int):
+    job = Job.query.filter_by(id=job_id, user_id=auth_payload.get("user_id")).first()
+    if not job:
+        raise APIException("Trabajo no encontrado", 404)
+    return jsonify(job.serialize()), 200
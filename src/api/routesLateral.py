@@ -4,23 +4,18 @@ Rutas para la barra lateral:
 - TaskGroups (grupos de tareas)
 """
 from flask import request, jsonify, Blueprint
-from .models import db, Calendar, TaskGroup
+from .models import db, TaskGroup
 from .routes import api, token_required
 from .utils import APIException
+from .cache import cached_response
+from .query_budget import query_budget
+from sqlalchemy.orm import selectinload
 
 # ---------- Helpers ----------
 
 lateral = Blueprint('apiLateral', __name__)
 
 
-def _validate_calendar_ownership(calendar_id: int, user_id: int) -> Calendar:
-    cal = Calendar.query.filter_by(id=calendar_id, user_id=user_id).first()
-    if not cal:
-        raise APIException(
-            "El calendario no existe o no pertenece al usuario", 404)
-    return cal
-
-
 def _validate_taskgroup_ownership(group_id: int, user_id: int) -> TaskGroup:
     tg = TaskGroup.query.filter_by(id=group_id, user_id=user_id).first()
     if not tg:
@@ -36,11 +31,15 @@ def taskgroups_options(group_id=None):
 
 
 @api.route("/task-groups", methods=["GET"])
+@query_budget(2)
 @token_required
+@cached_response("task_group", "task")
 def list_task_groups(auth_payload):
     user_id = auth_payload.get("user_id")
-    groups = TaskGroup.query.filter_by(
-        user_id=user_id).order_by(TaskGroup.id.asc()).all()
+    # selectinload: todas las tareas en una sola consulta (no una por grupo)
+    groups = (TaskGroup.query.filter_by(user_id=user_id)
+              .options(selectinload(TaskGroup.tasks))
+              .order_by(TaskGroup.id.asc()).all())
     return jsonify([g.serialize_with_tasks() for g in groups]), 200
 
 
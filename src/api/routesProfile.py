@@ -0,0 +1,218 @@
+"""
+Foto de perfil:
+- POST /api/profile/picture   multipart/form-data con el campo "file"
+- GET  /api/media/<key>       sirve original y miniaturas con caché de un año
+
+La subida se procesa en streaming: el cuerpo multipart se decodifica por bloques
+(werkzeug.sansio) y cada bloque va directo al backend de almacenamiento
+(api/storage.py), sin cargar el fichero entero en memoria ni pasar por el
+temporal de request.files. El tipo se comprueba con los primeros bytes (JPEG,
+PNG, GIF o WebP) y el tamaño se corta en PROFILE_PIC_MAX_BYTES mientras llega.
+
+Las miniaturas (PROFILE_THUMB_SIZES, JPEG cuadradas) se generan después en el pool
+de trabajos en segundo plano (api/jobs.py); la respuesta ya incluye sus URLs y el
+id del trabajo. Pillow es opcional: sin él solo se guarda el original.
+
+Cada subida usa un prefijo nuevo (avatars/<user>/<token>/), así una URL nunca
+cambia de contenido y se sirve con Cache-Control: immutable. El prefijo anterior
+se borra en el mismo trabajo.
+"""
+import logging
+import re
+import secrets
+from io import BytesIO
+
+from flask import current_app, jsonify, request
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from .jobs import enqueue, job_handler
+from .metrics import metrics
+from .models import db, User
+from .routes import api, token_required, user_to_public
+from .storage import get_storage
+from .utils import APIException
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow es opcional; sin él no hay miniaturas
+    Image = ImageOps = None
+
+logger = logging.getLogger("api.profile")
+
+CHUNK_SIZE = 64 * 1024
+# (firma, extensión); WebP se reconoce aparte (RIFF....WEBP)
+_SIGNATURES = ((b"\xff\xd8\xff", "jpg"), (b"\x89PNG\r\n\x1a\n", "png"),
+               (b"GIF87a", "gif"), (b"GIF89a", "gif"))
+_SNIFF_BYTES = 12
+_PREFIX_RE = re.compile(r"(avatars/\d+/[0-9a-f]+/)original\.\w+$")
+
+
+def _sniff(head: bytes):
+    for signature, ext in _SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class _Upload:
+    """Recibe los bloques del campo "file" y los escribe en el almacenamiento."""
+
+    def __init__(self, storage, prefix: str, max_bytes: int):
+        self.storage = storage
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.head = b""
+        self.writer = None
+        self.key = None
+        self.size = 0
+        self.finished = False
+
+    def _open(self):
+        ext = _sniff(self.head)
+        if ext is None:
+            raise APIException("Formato no soportado (JPEG, PNG, GIF o WebP)", 415)
+        self.key = f"{self.prefix}original.{ext}"
+        self.writer = self.storage.writer(self.key)
+        self.writer.write(self.head)
+
+    def feed(self, data: bytes, more: bool):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise APIException(f"La imagen supera {self.max_bytes // 1024} KB", 413)
+        if self.writer is None:
+            self.head += data
+            if len(self.head) < _SNIFF_BYTES and more:
+                return
+            self._open()
+        else:
+            self.writer.write(data)
+        if not more:
+            self.finished = True
+
+    def commit(self):
+        self.writer.commit()
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.abort()
+
+
+def _stream_multipart(stream, boundary: bytes, upload: _Upload):
+    decoder = MultipartDecoder(boundary, max_form_memory_size=64 * 1024)
+    in_file = False
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        decoder.receive_data(chunk or None)
+        event = decoder.next_event()
+        while not isinstance(event, NeedData):
+            if isinstance(event, File):
+                # Solo el primer campo "file"; el resto se descarta
+                in_file = event.name == "file" and upload.size == 0 and not upload.finished
+            elif isinstance(event, Field):
+                in_file = False
+            elif isinstance(event, Data) and in_file:
+                upload.feed(event.data, event.more_data)
+            elif isinstance(event, Epilogue):
+                return
+            event = decoder.next_event()
+        if not chunk:
+            raise ValueError("Cuerpo multipart incompleto")
+
+
+def _thumbnail_sizes() -> list:
+    return sorted(int(s) for s in str(current_app.config.get(
+        "PROFILE_THUMB_SIZES", "64,256")).split(",") if s.strip())
+
+
+@api.route("/profile/picture", methods=["OPTIONS"])
+def profile_picture_options():
+    return ("", 204)
+
+
+@api.route("/profile/picture", methods=["POST"])
+@token_required
+def upload_profile_picture(auth_payload):
+    user = db.session.get(User, auth_payload.get("user_id"))
+    if not user:
+        raise APIException("Usuario no encontrado", 404)
+    if request.mimetype != "multipart/form-data" or "boundary" not in request.mimetype_params:
+        raise APIException("Se espera multipart/form-data con el campo 'file'", 400)
+    max_bytes = int(current_app.config.get("PROFILE_PIC_MAX_BYTES", 5 * 1024 * 1024))
+    if request.content_length and request.content_length > max_bytes + 64 * 1024:
+        raise APIException(f"La imagen supera {max_bytes // 1024} KB", 413)
+
+    storage = get_storage()
+    prefix = f"avatars/{user.id}/{secrets.token_hex(8)}/"
+    upload = _Upload(storage, prefix, max_bytes)
+    try:
+        _stream_multipart(request.stream, request.mimetype_params["boundary"].encode(), upload)
+        if upload.writer is None and upload.head:
+            upload._open()      # ficheros de menos de _SNIFF_BYTES
+        if upload.writer is None:
+            raise APIException("Falta el fichero 'file'", 400)
+        upload.commit()
+    except ValueError as e:
+        upload.abort()
+        raise APIException(f"Multipart no válido: {e}", 400)
+    except Exception:
+        upload.abort()
+        raise
+    metrics.incr("profile.uploads")
+    metrics.incr("profile.upload_bytes", upload.size)
+
+    previous = _PREFIX_RE.search(user.profile_pic or "")
+    user.profile_pic = storage.url(upload.key)
+    db.session.commit()
+
+    sizes = _thumbnail_sizes()
+    job = enqueue("profile_thumbnails", {
+        "user_id": user.id, "original": upload.key, "prefix": prefix, "sizes": sizes,
+        "previous": previous.group(1) if previous else None,
+    }, user_id=user.id)
+    return jsonify({
+        "user": user_to_public(user),
+        "thumbnails": {str(s): storage.url(f"{prefix}{s}.jpg") for s in sizes},
+        "job": job.serialize(),
+    }), 201
+
+
+@api.route("/media/<path:key>", methods=["GET"])
+def get_media(key):
+    max_age = int(current_app.config.get("MEDIA_MAX_AGE", 31536000))
+    try:
+        return get_storage().response(key, max_age)
+    except (ValueError, FileNotFoundError):
+        raise APIException("No encontrado", 404)
+
+
+@job_handler("profile_thumbnails")
+def _profile_thumbnails_job(payload: dict):
+    """Miniaturas cuadradas en JPEG de la foto subida y limpieza de la anterior."""
+    storage = get_storage()
+    created = []
+    if Image is None:
+        logger.warning("Pillow not installed, skipping thumbnails")
+    else:
+        max_pixels = int(current_app.config.get("PROFILE_PIC_MAX_PIXELS", 40_000_000))
+        with storage.open(payload["original"]) as f:
+            img = Image.open(BytesIO(f.read()))
+            if img.width * img.height > max_pixels:
+                raise ValueError(f"Imagen demasiado grande ({img.width}x{img.height})")
+            sizes = sorted(payload["sizes"], reverse=True)
+            # JPEG: se decodifica directamente a escala reducida (mucho más rápido)
+            img.draft("RGB", (sizes[0] * 2, sizes[0] * 2))
+            img = ImageOps.exif_transpose(img).convert("RGB")
+        # De mayor a menor, cada miniatura parte de la anterior
+        for size in sizes:
+            img = ImageOps.fit(img, (size, size), Image.LANCZOS)
+            out = BytesIO()
+            img.save(out, "JPEG", quality=85, optimize=True, progressive=True)
+            storage.save(f"{payload['prefix']}{size}.jpg", out.getvalue())
+            created.append(size)
+        metrics.incr("profile.thumbnails", len(created))
+
+    if payload.get("previous") and payload["previous"] != payload["prefix"]:
+        storage.delete_prefix(payload["previous"])
+    return {"thumbnails": created}
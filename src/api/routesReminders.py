@@ -0,0 +1,87 @@
+"""
+Recordatorios (los envía el planificador de api/reminders.py):
+- GET    /api/reminders?event_id=&task_id=   → recordatorios del usuario
+- POST   /api/reminders                       → {"event_id" | "task_id", "minutes_before"}
+- DELETE /api/reminders/<id>
+"""
+from datetime import datetime
+
+from flask import jsonify, request
+
+from . import sharding
+from .models import db, Event, Reminder, Task
+from .reminders import remind_at_for
+from .routes import api, token_required
+from .utils import APIException
+
+MAX_MINUTES_BEFORE = 60 * 24 * 28
+
+
+@api.route("/reminders", methods=["OPTIONS"])
+@api.route("/reminders/<int:reminder_id>", methods=["OPTIONS"])
+def reminders_options(reminder_id=None):
+    return ("", 204)
+
+
+@api.route("/reminders", methods=["GET"])
+@token_required
+def list_reminders(auth_payload):
+    query = Reminder.query.filter_by(user_id=auth_payload.get("user_id"))
+    event_id = request.args.get("event_id", type=int)
+    task_id = request.args.get("task_id", type=int)
+    if event_id:
+        query = query.filter_by(event_id=event_id)
+    if task_id:
+        query = query.filter_by(task_id=task_id)
+    reminders = query.order_by(Reminder.remind_at.asc()).limit(500).all()
+    return jsonify([r.serialize() for r in reminders]), 200
+
+
+@api.route("/reminders", methods=["POST"])
+@token_required
+def create_reminder(auth_payload):
+    if sharding.enabled():
+        raise APIException("Los recordatorios no están disponibles con shards", 501)
+    user_id = auth_payload.get("user_id")
+    data = request.get_json(silent=True) or {}
+    event_id, task_id = data.get("event_id"), data.get("task_id")
+    if bool(event_id) == bool(task_id):
+        raise APIException("Indica event_id o task_id (solo uno)", 400)
+    try:
+        minutes_before = int(data.get("minutes_before", 10))
+    except (TypeError, ValueError):
+        raise APIException("minutes_before debe ser un entero", 400)
+    if not 0 <= minutes_before <= MAX_MINUTES_BEFORE:
+        raise APIException(f"minutes_before debe estar entre 0 y {MAX_MINUTES_BEFORE}", 400)
+
+    if event_id:
+        item = Event.query.filter_by(id=event_id, user_id=user_id).first()
+        start = item.start_date if item else None
+    else:
+        item = Task.query.filter_by(id=task_id, user_id=user_id).first()
+        start = item.date if item else None
+    if not item:
+        raise APIException("El evento o tarea no existe o no pertenece al usuario", 404)
+    if start is None:
+        raise APIException("La tarea no tiene fecha", 400)
+
+    reminder = Reminder(user_id=user_id, event_id=event_id or None, task_id=task_id or None,
+                        minutes_before=minutes_before,
+                        remind_at=remind_at_for(start, minutes_before))
+    if reminder.remind_at < datetime.utcnow():
+        raise APIException("El recordatorio quedaría en el pasado", 400)
+    db.session.add(reminder)
+    db.session.commit()
+    return jsonify(reminder.serialize()), 201
+
+
+@api.route("/reminders/<int:reminder_id>", methods=["DELETE"])
+@token_required
+def delete_reminder(auth_payload, reminder_id: int):
+    reminder = Reminder.query.filter_by(
+        id=reminder_id, user_id=auth_payload.get("user_id")).first()
+    if not reminder:
+        raise APIException("Recordatorio no encontrado", 404)
+    db.session.delete(reminder)
+    db.session.commit()
+    return jsonify({"message": "Recordatorio eliminado"}), 200
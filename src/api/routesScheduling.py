@@ -0,0 +1,125 @@
+"""
+Buscador de huecos para reuniones con varios participantes (ver api/scheduling.py):
+- POST /api/scheduling/find-slots
+  {
+    "participants": [2, "ana@example.com"],     ids o emails; el usuario se incluye siempre
+    "duration_minutes": 30,
+    "start": "2026-10-20", "end": "2026-10-24",  una fecha sin hora en "end" incluye ese día
+    "working_hours": {"start": "09:00", "end": "18:00"},
+    "weekdays": [0, 1, 2, 3, 4],                 0 = lunes
+    "step_minutes": 30, "limit": 20, "include_all_day": false
+  }
+Solo devuelve los huecos libres, nunca los eventos de los demás participantes, y
+solo admite como participantes a usuarios que comparten algún calendario con quien
+pregunta (api/permissions.py). Un participante desconocido o sin esa relación da el
+mismo error genérico, para no revelar qué ids o emails existen.
+"""
+from datetime import time, timedelta
+
+from flask import current_app, jsonify, request
+from sqlalchemy import or_
+
+from .metrics import metrics
+from .models import User
+from .permissions import calendar_contacts
+from .query_budget import query_budget
+from .routes import api, token_required
+from .routesEvent import _parse_iso_datetime
+from .scheduling import fetch_busy, find_slots, merge_busy
+from .utils import APIException
+
+MAX_LIMIT = 200
+
+
+def _int_field(data: dict, name: str, default: int, lo: int, hi: int) -> int:
+    try:
+        value = int(data.get(name, default))
+    except (TypeError, ValueError):
+        raise APIException(f"{name} debe ser un entero", 400)
+    if not lo <= value <= hi:
+        raise APIException(f"{name} debe estar entre {lo} y {hi}", 400)
+    return value
+
+
+def _parse_time(value, name: str) -> time:
+    try:
+        return time.fromisoformat(str(value))
+    except ValueError:
+        raise APIException(f"{name} no válido (usa HH:MM)", 400)
+
+
+def _resolve_participants(user_id: int, participants) -> list:
+    if not isinstance(participants, list):
+        raise APIException("participants debe ser una lista de ids o emails", 400)
+    max_participants = int(current_app.config.get("SCHEDULING_MAX_PARTICIPANTS", 20))
+    if len(participants) > max_participants:
+        raise APIException(f"Como máximo {max_participants} participantes", 400)
+    if any(isinstance(p, bool) or not isinstance(p, (int, str)) for p in participants):
+        raise APIException("participants debe ser una lista de ids o emails", 400)
+    ids = {p for p in participants if isinstance(p, int)}
+    emails = {p.strip().lower() for p in participants if isinstance(p, str)}
+    # Una sola consulta: busca los participantes solo entre el propio usuario y sus contactos
+    found = (User.query.with_entities(User.id, User.email)
+             .filter(or_(User.id.in_(ids), User.email.in_(emails)),
+                     or_(User.id == user_id, User.id.in_(calendar_contacts(user_id))))
+             .all()
+             if ids or emails else [])
+    missing = (ids - {uid for uid, _ in found}) | (emails - {email for _, email in found})
+    if missing:
+        raise APIException("Algún participante no existe o no comparte ningún "
+                           "calendario contigo", 404)
+    return sorted({user_id} | {uid for uid, _ in found})
+
+
+@api.route("/scheduling/find-slots", methods=["OPTIONS"])
+def find_slots_options():
+    return ("", 204)
+
+
+@api.route("/scheduling/find-slots", methods=["POST"])
+@query_budget(2)
+@token_required
+def find_meeting_slots(auth_payload):
+    data = request.get_json(silent=True) or {}
+    config = current_app.config
+
+    try:
+        start = _parse_iso_datetime(data.get("start"))
+        end = _parse_iso_datetime(data.get("end"))
+    except ValueError as e:
+        raise APIException(str(e), 400)
+    if "T" not in str(data.get("end")).strip().replace(" ", "T"):
+        end += timedelta(days=1)
+    if end <= start:
+        raise APIException("end debe ser posterior a start", 400)
+    max_days = int(config.get("SCHEDULING_MAX_DAYS", 31))
+    if end - start > timedelta(days=max_days):
+        raise APIException(f"El rango no puede superar {max_days} días", 400)
+
+    duration = timedelta(minutes=_int_field(data, "duration_minutes", 30, 5, 60 * 24))
+    step = timedelta(minutes=_int_field(data, "step_minutes", 30, 5, 60 * 24))
+    limit = _int_field(data, "limit", 20, 1, MAX_LIMIT)
+    hours = data.get("working_hours") or {}
+    day_start = _parse_time(hours.get("start", "09:00"), "working_hours.start")
+    day_end = _parse_time(hours.get("end", "18:00"), "working_hours.end")
+    if day_end <= day_start:
+        raise APIException("working_hours.end debe ser posterior a start", 400)
+    weekdays = data.get("weekdays", [0, 1, 2, 3, 4])
+    if not isinstance(weekdays, list) or not all(
+            isinstance(d, int) and 0 <= d <= 6 for d in weekdays):
+        raise APIException("weekdays debe ser una lista de 0 (lunes) a 6 (domingo)", 400)
+
+    user_ids = _resolve_participants(auth_payload.get("user_id"), data.get("participants", []))
+    lookbehind = timedelta(days=int(config.get("SCHEDULING_LOOKBEHIND_DAYS", 31)))
+    runs = fetch_busy(user_ids, start, end, lookbehind, bool(data.get("include_all_day")))
+    busy = merge_busy(runs)
+    slots = find_slots(busy, start, end, duration, day_start, day_end, set(weekdays),
+                       step, limit)
+    metrics.incr("scheduling.searches")
+    metrics.incr("scheduling.busy_intervals", sum(len(r) for r in runs))
+
+    return jsonify({
+        "participants": user_ids,
+        "slots": [{"start": s.isoformat(), "end": e.isoformat()} for s, e in slots],
+        "truncated": len(slots) >= limit,
+    }), 200
@@ -0,0 +1,82 @@
+"""
+Compartir calendarios (los permisos se resuelven en api/permissions.py):
+- GET    /api/calendars/<id>/shares             → con quién se comparte (solo el dueño)
+- PUT    /api/calendars/<id>/shares             → {"email" | "user_id", "role": "read" | "write"}
+- DELETE /api/calendars/<id>/shares/<user_id>   → el dueño retira el acceso, o el
+                                                  propio usuario deja de ver el calendario
+"""
+from flask import jsonify, request
+
+from .models import db, CalendarShare, User
+from .permissions import ROLES, forget, require_owned_calendar
+from .routes import api, token_required
+from .utils import APIException
+
+
+@api.route("/calendars/<int:calendar_id>/shares", methods=["OPTIONS"])
+@api.route("/calendars/<int:calendar_id>/shares/<int:user_id>", methods=["OPTIONS"])
+def shares_options(calendar_id, user_id=None):
+    return ("", 204)
+
+
+def _share_to_dict(share: CalendarShare, user: User) -> dict:
+    return dict(share.serialize(), email=user.email, display_name=user.display_name)
+
+
+@api.route("/calendars/<int:calendar_id>/shares", methods=["GET"])
+@token_required
+def list_shares(auth_payload, calendar_id: int):
+    require_owned_calendar(calendar_id, auth_payload.get("user_id"))
+    rows = (db.session.query(CalendarShare, User)
+            .join(User, User.id == CalendarShare.user_id)
+            .filter(CalendarShare.calendar_id == calendar_id)
+            .order_by(CalendarShare.id.asc()).all())
+    return jsonify([_share_to_dict(share, user) for share, user in rows]), 200
+
+
+@api.route("/calendars/<int:calendar_id>/shares", methods=["PUT"])
+@token_required
+def put_share(auth_payload, calendar_id: int):
+    owner_id = auth_payload.get("user_id")
+    cal = require_owned_calendar(calendar_id, owner_id)
+    data = request.get_json(silent=True) or {}
+
+    role = data.get("role", "read")
+    if role not in ROLES:
+        raise APIException(f"role debe ser uno de {', '.join(ROLES)}", 400)
+    if data.get("email"):
+        user = User.query.filter_by(email=str(data["email"]).strip().lower()).first()
+    elif data.get("user_id"):
+        user = db.session.get(User, data["user_id"])
+    else:
+        raise APIException("Indica email o user_id", 400)
+    if not user:
+        raise APIException("Usuario no encontrado", 404)
+    if user.id == cal.user_id:
+        raise APIException("El calendario ya es de este usuario", 400)
+
+    share = CalendarShare.query.filter_by(calendar_id=calendar_id, user_id=user.id).first()
+    created = share is None
+    if created:
+        share = CalendarShare(calendar_id=calendar_id, user_id=user.id, role=role)
+        db.session.add(share)
+    else:
+        share.role = role
+    db.session.commit()
+    forget(user.id)
+    return jsonify(_share_to_dict(share, user)), 201 if created else 200
+
+
+@api.route("/calendars/<int:calendar_id>/shares/<int:user_id>", methods=["DELETE"])
+@token_required
+def delete_share(auth_payload, calendar_id: int, user_id: int):
+    current_id = auth_payload.get("user_id")
+    if current_id != user_id:
+        require_owned_calendar(calendar_id, current_id)
+    share = CalendarShare.query.filter_by(calendar_id=calendar_id, user_id=user_id).first()
+    if not share:
+        raise APIException("El calendario no está compartido con ese usuario", 404)
+    db.session.delete(share)
+    db.session.commit()
+    forget(user_id)
+    return jsonify({"message": "Acceso retirado"}), 200
@@ -0,0 +1,44 @@
+"""
+Estadísticas de productividad (solo leen los rollups de api/task_stats.py):
+- GET /api/stats/tasks?from=YYYY-MM-DD&to=YYYY-MM-DD
+  → completadas por día (con ceros, para gráficas), por grupo y rachas.
+  Por defecto los últimos 30 días.
+"""
+from datetime import date, datetime, timedelta
+
+from flask import jsonify, request
+
+from .cache import cached_response
+from .query_budget import query_budget
+from .routes import api, token_required
+from .task_stats import MAX_RANGE_DAYS, task_stats
+from .utils import APIException
+
+
+def _parse_day(name: str, default: date) -> date:
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise APIException(f"'{name}' debe ser una fecha YYYY-MM-DD", 400)
+
+
+@api.route("/stats/tasks", methods=["OPTIONS"])
+def stats_tasks_options():
+    return ("", 204)
+
+
+@api.route("/stats/tasks", methods=["GET"])
+@query_budget(1)
+@token_required
+@cached_response("task")
+def get_task_stats(auth_payload):
+    end = _parse_day("to", datetime.utcnow().date())
+    start = _parse_day("from", end - timedelta(days=29))
+    if end < start:
+        raise APIException("'to' debe ser posterior a 'from'", 400)
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise APIException(f"El rango no puede superar {MAX_RANGE_DAYS} días", 400)
+    return jsonify(task_stats(auth_payload.get("user_id"), start, end)), 200
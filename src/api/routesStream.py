@@ -0,0 +1,60 @@
+"""
+Notificaciones en tiempo real por Server-Sent Events:
+- GET /api/stream   (token en Authorization: Bearer o ?token=, porque EventSource
+                     no permite cabeceras)
+
+Mensajes:
+    event: ready    data: {"user_id": 1}
+    event: change   data: {"tables": ["event", "calendar"]}   → volver a pedir esos listados
+    event: change   data: {"tables": null, "resync": true}    → volver a pedirlo todo
+    : hb                                                       → heartbeat (comentario)
+
+Al reconectar con Last-Event-ID el cliente recibe un resync (pudo perder cambios).
+Cada conexión ocupa un hilo del worker: hay que servir con gunicorn gthread
+(--threads) y STREAM_MAX_CONNECTIONS acota cuántas acepta cada proceso.
+"""
+from flask import Response, current_app, request
+
+from .push import event_stream, get_broker
+from .routes import api, verify_token
+from .utils import APIException
+
+
+def _request_token() -> str:
+    parts = request.headers.get("Authorization", "").split()
+    if len(parts) == 2 and parts[0].lower() == "bearer":
+        return parts[1]
+    token = request.args.get("token")
+    if not token:
+        raise APIException("Falta header Authorization Bearer o ?token=", 401)
+    return token
+
+
+@api.route("/stream", methods=["OPTIONS"])
+def stream_options():
+    return ("", 204)
+
+
+@api.route("/stream", methods=["GET"])
+def stream():
+    user_id = verify_token(_request_token()).get("user_id")
+    if not user_id:
+        raise APIException("Token inválido", 401)
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    if subscription is None:
+        response = Response("Demasiadas conexiones", status=503, mimetype="text/plain")
+        response.headers["Retry-After"] = "30"
+        return response
+    channel, seq = subscription
+
+    config = current_app.config
+    # Sin stream_with_context: la conexión no retiene el contexto ni la sesión de BD
+    body = event_stream(broker, user_id, channel, seq,
+                        heartbeat=float(config.get("STREAM_HEARTBEAT_SECONDS", 20)),
+                        max_seconds=float(config.get("STREAM_MAX_SECONDS", 3600)),
+                        resync="Last-Event-ID" in request.headers)
+    response = Response(body, mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Accel-Buffering"] = "no"    # que nginx no acumule el stream
+    return response
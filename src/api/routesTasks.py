@@ -3,6 +3,10 @@ from flask import Flask, request, jsonify, url_for, Blueprint
 from api.models import db, User, Task, TaskGroup
 from datetime import datetime
 from .routes import api
+from . import sharding
+from .cache import cached_response
+from .query_budget import query_budget
+from sqlalchemy.orm import selectinload
 
 # Handle/serialize errors like a JSON object
 task = Blueprint('task', __name__)
@@ -16,6 +20,8 @@ task = Blueprint('task', __name__)
 #  Obtener todas las tareas de un usuario
 
 @api.route("/users/<int:user_id>/tasks", methods=["GET"])
+@query_budget(1)
+@cached_response("task")
 def get_user_tasks(user_id):
     tasks = Task.query.filter_by(user_id=user_id).all()
     return jsonify([task.serialize() for task in tasks]), 200
@@ -99,8 +105,12 @@ def update_task(user_id, task_id):
 
 
 @api.route("/users/<int:user_id>/groups", methods=["GET"])
+@query_budget(2)
+@cached_response("task_group", "task")
 def get_user_groups(user_id):
-    groups = TaskGroup.query.filter_by(user_id=user_id).all()
+    # selectinload: todas las tareas en una sola consulta (no una por grupo)
+    groups = TaskGroup.query.filter_by(user_id=user_id).options(
+        selectinload(TaskGroup.tasks)).all()
     return jsonify([g.serialize_with_tasks() for g in groups]), 200
 
 # Crear un nuevo grupo para un usuario
@@ -123,6 +133,7 @@ def create_group(user_id):
 
 # Obtener un grupo específico con sus tareas
 @api.route("/users/<int:user_id>/groups/<int:task_group_id>", methods=["GET"])
+@query_budget(2)
 def get_group(user_id, task_group_id):
     group = TaskGroup.query.filter_by(id=task_group_id, user_id=user_id).first()
     if not group:
@@ -186,6 +197,9 @@ def delete_group(user_id, task_group_id):
     if not group:
         return jsonify({"error": "Grupo no encontrado"}), 404
 
+    # Con shards las tareas no están en la base del grupo: sin cascade, se borran aquí
+    if sharding.enabled():
+        Task.query.filter_by(task_group_id=group.id).delete(synchronize_session=False)
     db.session.delete(group)
     db.session.commit()
     return jsonify({"msg": "Grupo eliminado correctamente"}), 200
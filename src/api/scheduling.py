@@ -0,0 +1,101 @@
+"""
+Búsqueda de huecos comunes para reuniones (POST /api/scheduling/find-slots).
+
+1. Una sola consulta trae los intervalos ocupados de todos los participantes en la
+   ventana pedida, ordenados por (user_id, start_date): la recorre el índice
+   ix_event_user_id_start_date, acotada por abajo con SCHEDULING_LOOKBEHIND_DAYS
+   para no leer todo el historial buscando eventos largos que empezaron antes.
+2. Cada participante aporta una lista ya ordenada; heapq.merge las mezcla (k-way,
+   O(n log k)) y un único barrido une los solapes en una lista de ocupados.
+3. Se recorren los tramos de horario laboral día a día avanzando un puntero sobre
+   esa lista, y en cada hueco se proponen inicios alineados a step_minutes.
+
+Las fechas son naive, como las de los eventos. Los eventos cancelados no cuentan
+y los de todo el día solo si se pide (include_all_day). Con shards
+(api/sharding.py) la consulta se repite una vez por shard con participantes.
+"""
+import heapq
+from datetime import datetime, time, timedelta
+from itertools import groupby
+
+from sqlalchemy import or_, select
+
+from . import sharding
+from .models import db, Event
+
+
+def fetch_busy(user_ids, start: datetime, end: datetime, lookbehind: timedelta,
+               include_all_day: bool = False) -> list:
+    """Listas ordenadas de (inicio, fin) ocupados, una por participante."""
+    runs = []
+    for shard, ids in sharding.split_users(user_ids):
+        query = (select(Event.user_id, Event.start_date, Event.end_date)
+                 .where(Event.user_id.in_(ids),
+                        Event.start_date >= start - lookbehind,
+                        Event.start_date < end,
+                        Event.end_date > start,
+                        or_(Event.status.is_(None), Event.status != "cancelled"))
+                 .order_by(Event.user_id, Event.start_date))
+        if not include_all_day:
+            query = query.where(Event.all_day.isnot(True))
+        with sharding.use_shard(shard):
+            rows = db.session.execute(query)
+            runs += [[(s, e) for _, s, e in run]
+                     for _, run in groupby(rows, key=lambda r: r[0])]
+    return runs
+
+
+def merge_busy(runs) -> list:
+    """Une listas ordenadas de intervalos en una sola sin solapes."""
+    merged = []
+    for start, end in heapq.merge(*runs):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _working_windows(start: datetime, end: datetime, day_start: time, day_end: time,
+                     weekdays):
+    day = start.date()
+    while day <= end.date():
+        if day.weekday() in weekdays:
+            lo = max(start, datetime.combine(day, day_start))
+            hi = min(end, datetime.combine(day, day_end))
+            if lo < hi:
+                yield lo, hi
+        day += timedelta(days=1)
+
+
+def _align(value: datetime, step: timedelta) -> datetime:
+    midnight = datetime.combine(value.date(), time())
+    steps = -(-(value - midnight) // step)      # redondeo hacia arriba
+    return midnight + steps * step
+
+
+def find_slots(busy: list, start: datetime, end: datetime, duration: timedelta,
+               day_start: time, day_end: time, weekdays, step: timedelta,
+               limit: int) -> list:
+    """Huecos de `duration` libres para todos dentro del horario laboral."""
+    slots = []
+    i = 0
+    for lo, hi in _working_windows(start, end, day_start, day_end, weekdays):
+        # Los ocupados que terminan antes de este tramo ya no afectan a los siguientes
+        while i < len(busy) and busy[i][1] <= lo:
+            i += 1
+        cursor, j = lo, i
+        while cursor < hi:
+            gap_end = hi if j >= len(busy) else min(hi, busy[j][0])
+            candidate = _align(cursor, step)
+            while candidate + duration <= gap_end:
+                slots.append((candidate, candidate + duration))
+                if len(slots) >= limit:
+                    return slots
+                candidate += step
+            if j >= len(busy) or busy[j][0] >= hi:
+                break
+            cursor = max(cursor, busy[j][1])
+            j += 1
+    return slots
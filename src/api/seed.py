@@ -0,0 +1,206 @@
+"""
+Generador de datos sintéticos para pruebas de rendimiento (`flask seed`).
+
+Crea usuarios con sus calendarios, eventos, grupos de tareas y tareas con una
+distribución parecida a la real:
+- la mayoría de usuarios tiene pocos eventos y unos pocos ("densos") muchos
+- hay eventos de todo el día y eventos de varios días
+- los eventos se reparten en horario laboral a lo largo de `days` días
+
+Es determinista: con la misma semilla y los mismos parámetros genera los mismos
+datos, así una medición se puede repetir a escala de producción (p. ej. 100k
+usuarios y 10M de eventos).
+
+Se inserta con INSERT masivos (Core, sin pasar objetos por la sesión) en lotes de
+`batch` filas, y los usuarios se procesan por bloques para acotar la memoria.
+Los ids se asignan aquí (a partir del máximo actual) para no tener que leerlos
+de vuelta; en Postgres se reajustan las secuencias al terminar.
+
+Al no pasar por el flush del ORM, no se disparan las invalidaciones de caché de
+api/changes.py: está pensado para poblar una BD antes de arrancar la app.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, text
+from werkzeug.security import generate_password_hash
+
+from . import sharding, task_stats
+from .models import db, User, Calendar, Event, TaskGroup, Task
+
+SEED_PASSWORD = "123456"
+
+_COLORS = ("#3b82f6", "#ef4444", "#10b981", "#f59e0b", "#8b5cf6", "#ec4899", "#64748b")
+_FIRST_NAMES = ("Ana", "Luis", "Marta", "Carlos", "Lucía", "Javier", "Sofía", "Pablo",
+                "Elena", "Diego", "Laura", "Andrés", "Paula", "Miguel", "Carmen", "Raúl")
+_LAST_NAMES = ("García", "López", "Martínez", "Sánchez", "Pérez", "Gómez", "Díaz",
+               "Ruiz", "Moreno", "Álvarez", "Romero", "Navarro")
+_CALENDARS = ("Personal", "Trabajo", "Familia", "Deporte", "Estudios")
+_EVENTS = ("Reunión", "Llamada", "Dentista", "Gimnasio", "Comida", "Clase", "Revisión",
+           "Entrevista", "Cumpleaños", "Viaje", "Formación", "Sprint review")
+_GROUPS = ("Casa", "Trabajo", "Compras", "Proyecto", "Ideas")
+_TASKS = ("Comprar pan", "Enviar informe", "Pagar factura", "Llamar a mamá",
+          "Preparar presentación", "Revisar correo", "Sacar al perro", "Leer capítulo")
+
+# Fracción de usuarios "densos" y cuántas veces más eventos tienen que la media
+DENSE_RATIO = 0.02
+DENSE_FACTOR = 20
+
+
+def _next_id(model) -> int:
+    if sharding.enabled() and model in (Event, Task):
+        # Con shards el máximo está repartido (y hay bloques ya reservados)
+        return sharding.next_free_id(model)
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _reset_sequences(models):
+    """En Postgres las secuencias no avanzan con ids explícitos: se ajustan a mano."""
+    if db.engine.dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM \"{table}\"))"))
+
+
+class _BatchInserter:
+    """Acumula filas por tabla y las inserta en lotes de `batch`."""
+
+    def __init__(self, batch: int):
+        self.batch = batch
+        self.pending = {}
+        self.counts = {}
+
+    def add(self, model, row: dict):
+        rows = self.pending.setdefault(model, [])
+        rows.append(row)
+        if len(rows) >= self.batch:
+            # Se vacían todas las tablas para que los padres estén ya insertados
+            self.flush()
+
+    def _flush(self, model):
+        rows = self.pending.get(model)
+        if rows:
+            if model in (Event, Task):
+                # Cada usuario en su shard, si los hay
+                sharding.insert_rows(model, rows)
+            else:
+                db.session.execute(insert(model.__table__), rows)
+            self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + len(rows)
+            self.pending[model] = []
+
+    def flush(self):
+        # Orden de padres a hijos para respetar las claves foráneas
+        for model in (User, Calendar, TaskGroup, Event, Task):
+            self._flush(model)
+
+
+def seed(users: int = 100, calendars: int = 2, events: int = 100,
+         task_groups: int = 3, tasks: int = 30, days: int = 365,
+         seed_value: int = 42, batch: int = 10000, users_per_commit: int = 1000,
+         start: datetime = datetime(2025, 1, 1), progress=None) -> dict:
+    """
+    `calendars`, `events`, `task_groups` y `tasks` son medias por usuario.
+    Todos los usuarios tienen la contraseña SEED_PASSWORD.
+    """
+    rng = random.Random(seed_value)
+    # Un único hash para todos: calcularlo por usuario dominaría el tiempo total
+    password_hash = generate_password_hash(SEED_PASSWORD)
+    now = datetime.utcnow()
+
+    ids = {model: _next_id(model) for model in (User, Calendar, Event, TaskGroup, Task)}
+    inserter = _BatchInserter(batch)
+    started = time.perf_counter()
+
+    for n in range(users):
+        user_id = ids[User]
+        ids[User] += 1
+        first, last = rng.choice(_FIRST_NAMES), rng.choice(_LAST_NAMES)
+        inserter.add(User, {
+            "id": user_id, "email": f"seed{user_id}@seed.local",
+            "name": f"{first} {last}", "display_name": first,
+            "password": password_hash, "is_active": True, "rol": "user",
+            "profile_pic": "", "signup_date": now, "last_session": now, "status": True,
+        })
+
+        calendar_ids = []
+        for c in range(max(1, round(rng.uniform(0.5, 1.5) * calendars))):
+            calendar_ids.append(ids[Calendar])
+            inserter.add(Calendar, {
+                "id": ids[Calendar], "user_id": user_id,
+                "title": _CALENDARS[c % len(_CALENDARS)], "color": rng.choice(_COLORS),
+            })
+            ids[Calendar] += 1
+
+        n_events = int(rng.expovariate(1 / events)) if events else 0
+        if events and rng.random() < DENSE_RATIO:
+            n_events = events * DENSE_FACTOR
+        for _ in range(n_events):
+            day = start + timedelta(days=rng.randrange(days))
+            kind = rng.random()
+            if kind < 0.1:      # todo el día
+                start_date = day
+                end_date = day + timedelta(days=1)
+                all_day = True
+            elif kind < 0.15:   # varios días
+                start_date = day + timedelta(hours=rng.randrange(8, 18))
+                end_date = start_date + timedelta(days=rng.randint(2, 7))
+                all_day = False
+            else:
+                start_date = day + timedelta(hours=rng.randrange(8, 19),
+                                             minutes=rng.choice((0, 15, 30, 45)))
+                end_date = start_date + timedelta(minutes=rng.choice((15, 30, 45, 60, 90, 120)))
+                all_day = False
+            inserter.add(Event, {
+                "id": ids[Event], "user_id": user_id,
+                "calendar_id": rng.choice(calendar_ids), "title": rng.choice(_EVENTS),
+                "start_date": start_date, "end_date": end_date, "description": None,
+                "color": None, "all_day": all_day, "google_event_id": None,
+                "status": "confirmed",
+            })
+            ids[Event] += 1
+
+        group_ids = []
+        for g in range(round(rng.uniform(0.5, 1.5) * task_groups)):
+            group_ids.append(ids[TaskGroup])
+            inserter.add(TaskGroup, {
+                "id": ids[TaskGroup], "user_id": user_id,
+                "title": _GROUPS[g % len(_GROUPS)], "color": rng.choice(_COLORS),
+            })
+            ids[TaskGroup] += 1
+
+        for _ in range(round(rng.uniform(0.5, 1.5) * tasks)):
+            # Algunas tareas sin fecha y sin grupo (apartado "sin fechas" / bandeja)
+            date = (start + timedelta(days=rng.randrange(days))
+                    if rng.random() < 0.7 else None)
+            task_group_id = rng.choice(group_ids) if group_ids and rng.random() < 0.8 else None
+            title, status = rng.choice(_TASKS), rng.random() < 0.4
+            inserter.add(Task, {
+                "id": ids[Task], "user_id": user_id, "task_group_id": task_group_id,
+                "title": title, "status": status, "date": date,
+                # Completada el día de su fecha (sin consumir más números aleatorios)
+                "completed_at": date if status else None,
+                "recurrencia": 0, "color": rng.choice(_COLORS),
+            })
+            ids[Task] += 1
+
+        if (n + 1) % users_per_commit == 0:
+            inserter.flush()
+            db.session.commit()
+            if progress:
+                progress(n + 1, inserter.counts)
+
+    inserter.flush()
+    _reset_sequences((User, Calendar, Event, TaskGroup, Task))
+    db.session.commit()
+    sharding.reset_id_sequences()
+    # Los INSERT masivos no pasan por el flush: rollups de estadísticas de una vez
+    task_stats.rebuild(range(ids[User] - users, ids[User]))
+
+    elapsed = time.perf_counter() - started
+    total = sum(inserter.counts.values())
+    return {"seed": seed_value, "rows": inserter.counts, "seconds": round(elapsed, 2),
+            "rows_per_second": round(total / elapsed) if elapsed else None}
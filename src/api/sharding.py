@@ -0,0 +1,519 @@
+"""
+Sharding opcional de las tablas event y task por usuario entre varios binds.
+
+Con DATABASE_SHARD_URLS (URLs separadas por comas) cada URL es un bind "shard_N" y
+los eventos y tareas de un usuario viven todos en uno de ellos. El resto de tablas
+(usuarios, calendarios, grupos, comparticiones, rollups...) siguen en el primario.
+
+- Colocación: user_shard (en el primario) dice en qué shard está cada usuario. Quien
+  no tiene fila va al que da crc32(user_id) % N; la fila se crea, en la misma
+  transacción, al insertar su primer evento o tarea.
+- Enrutado: RoutingSession.get_bind manda las sentencias sobre event/task al shard de
+  los objetos que se escriben en el flush en curso (un flush no puede mezclar shards),
+  al fijado con use_shard() / for_user(), o al del usuario de la petición
+  (request_user_id()). Si no hay ninguno es un error: nunca se cae en silencio al
+  primario. Los trabajos en segundo plano corren con for_user(job.user_id).
+- Ids: sin autoincremento compartido, los ids de event/task se reservan por bloques de
+  SHARD_ID_BLOCK en shard_id_sequence (transacción aparte) y se asignan antes del
+  flush; los INSERT masivos usan assign_ids() o insert_rows() (el seed pone ids
+  explícitos y luego reset_id_sequences()). Así un id sigue siendo único aunque la
+  fila cambie de shard.
+- Integridad: las tablas de los shards no tienen claves foráneas (los padres están en
+  el primario). Los borrados que hacía ON DELETE CASCADE (calendario → eventos,
+  grupo → tareas) se hacen a mano en routesEvent.py y routesTasks.py.
+- Rebalanceo (`flask shards-rebalance`): mueve a los usuarios cuyo shard ya no es el
+  que les toca por hash (p. ej. tras añadir una URL) y a los que aún tienen datos en
+  las tablas del primario (la migración inicial). Marca al usuario con moving (sus
+  peticiones responden 503), espera SHARD_DIRECTORY_TTL para que todos los procesos
+  lo vean, copia por lotes, cambia el directorio y borra el origen. Se puede relanzar
+  si se corta a medias.
+
+No soportado con shards: recordatorios (clave foránea y join con event/task; se
+desactivan con un aviso en el log) y las vistas de eventos/tareas del admin. Los cambios de esquema de event/task hay que
+aplicarlos también en los shards (`flask shards-init` solo crea las tablas).
+
+Para probarlo en local con varios ficheros SQLite:
+    DATABASE_URL=sqlite:////tmp/primary.db
+    DATABASE_SHARD_URLS=sqlite:////tmp/shard0.db,sqlite:////tmp/shard1.db
+    $ flask db upgrade && flask shards-init && flask seed --users 100
+    (se añade sqlite:////tmp/shard2.db a DATABASE_SHARD_URLS)
+    $ flask shards-init && flask shards-rebalance
+"""
+import contextvars
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app, g, has_app_context, has_request_context
+from sqlalchemy import (Column, Index, MetaData, Table, delete, event, func, insert,
+                        inspect, select, update)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+from .db_routing import request_user_id
+from .metrics import metrics
+from .models import db, Event, ShardIdSequence, Task, UserShard
+from .utils import APIException
+
+SHARDED = {Event.__tablename__: Event, Task.__tablename__: Task}
+_DIRECTORY = UserShard.__table__
+_SEQUENCE = ShardIdSequence.__table__
+
+# Shard fijado con use_shard()/for_user() (por hilo y por contexto)
+_forced_shard = contextvars.ContextVar("forced_shard", default=None)
+
+
+class ShardMoving(APIException):
+    status_code = 503
+
+
+def _insert_ignore(conn, table):
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    raise RuntimeError(f"Upsert no soportado en {dialect}")
+
+
+def _sharded_table(mapper, clause) -> bool:
+    if mapper is not None:
+        table = inspect(mapper).local_table
+    elif isinstance(clause, Table):
+        table = clause
+    elif isinstance(clause, UpdateBase):
+        table = clause.table
+    else:
+        return False
+    return getattr(table, "name", None) in SHARDED
+
+
+class ShardRouter:
+    """Directorio usuario → shard (con caché por proceso) y reserva de ids."""
+
+    def __init__(self, binds: list, ttl: float, id_block: int):
+        self.binds = list(binds)
+        self.ttl = ttl
+        self.id_block = id_block
+        self._directory = {}        # user_id → (shard o None, moving, caduca)
+        self._ids = {}              # tabla → (siguiente, fin)
+        self._lock = threading.Lock()
+
+    def hash_shard(self, user_id: int) -> str:
+        return self.binds[zlib.crc32(str(user_id).encode()) % len(self.binds)]
+
+    # ---------- directorio ----------
+
+    def _primary(self, session):
+        return session.connection(bind_arguments={"bind": db.engines[None]})
+
+    def _lookup(self, session, user_ids) -> dict:
+        now = time.monotonic()
+        found, missing = {}, []
+        for user_id in user_ids:
+            entry = self._directory.get(user_id)
+            if entry is not None and entry[2] > now:
+                found[user_id] = entry[:2]
+            else:
+                missing.append(user_id)
+        if missing:
+            rows = {user_id: (shard, moving) for user_id, shard, moving in
+                    self._primary(session).execute(
+                        select(_DIRECTORY.c.user_id, _DIRECTORY.c.shard, _DIRECTORY.c.moving)
+                        .where(_DIRECTORY.c.user_id.in_(missing)))}
+            if len(self._directory) > 100000:
+                # Limpieza perezosa de entradas caducadas
+                self._directory = {u: e for u, e in self._directory.items() if e[2] > now}
+            for user_id in missing:
+                found[user_id] = rows.get(user_id, (None, False))
+                self._directory[user_id] = found[user_id] + (now + self.ttl,)
+            metrics.incr("shards.directory_loads")
+        return found
+
+    def shards_for(self, session, user_ids, place: bool = False) -> dict:
+        """{user_id: shard}; con place=True se crea la fila de quien aún no la tiene."""
+        placed = {}
+        new = []
+        for user_id, (shard, moving) in self._lookup(session, set(user_ids)).items():
+            if moving:
+                raise ShardMoving("Datos del usuario en migración, reintenta en unos segundos")
+            if shard is None:
+                shard = self.hash_shard(user_id)
+                if place:
+                    new.append({"user_id": user_id, "shard": shard, "moving": False,
+                                "updated_at": datetime.utcnow()})
+            placed[user_id] = shard
+        if new:
+            conn = self._primary(session)
+            conn.execute(_insert_ignore(conn, _DIRECTORY), new)
+            expires = time.monotonic() + self.ttl
+            for row in new:
+                self._directory[row["user_id"]] = (row["shard"], False, expires)
+            metrics.incr("shards.placed", len(new))
+        return placed
+
+    def forget(self, user_ids):
+        for user_id in user_ids:
+            self._directory.pop(user_id, None)
+
+    # ---------- enrutado ----------
+
+    def bind_for(self, session, mapper, clause):
+        """Engine del shard si la sentencia toca event/task; None si no."""
+        if not _sharded_table(mapper, clause):
+            return None
+        shard = session.info.get("flush_shard") if session._flushing else None
+        shard = shard or _forced_shard.get()
+        if shard is None and has_request_context():
+            shard = g.get("request_shard")
+            if shard is None:
+                user_id = request_user_id()
+                if user_id is not None:
+                    shard = g.request_shard = self.shards_for(session, [user_id])[user_id]
+        if shard is None:
+            raise RuntimeError("Consulta sobre event/task sin shard: usa "
+                               "sharding.use_shard() o sharding.for_user()")
+        return db.engines[shard]
+
+    # ---------- ids ----------
+
+    def next_ids(self, table: str, count: int) -> list:
+        ids = []
+        with self._lock:
+            start, end = self._ids.get(table, (0, 0))
+            while len(ids) < count:
+                if start >= end:
+                    start, end = self._reserve(table, max(self.id_block, count - len(ids)))
+                take = min(end - start, count - len(ids))
+                ids.extend(range(start, start + take))
+                start += take
+            self._ids[table] = (start, end)
+        return ids
+
+    def _reserve(self, table: str, n: int) -> tuple:
+        # Transacción propia: el bloque no vuelve a repartirse aunque la petición falle
+        bump = (update(_SEQUENCE).where(_SEQUENCE.c.name == table)
+                .values(next_id=_SEQUENCE.c.next_id + n).returning(_SEQUENCE.c.next_id))
+        with db.engines[None].begin() as conn:
+            end = conn.execute(bump).scalar()
+            if end is None:
+                # Primera reserva: detrás de los ids que ya existan en cualquier base
+                conn.execute(_insert_ignore(conn, _SEQUENCE),
+                             {"name": table, "next_id": self.max_id(table) + 1})
+                end = conn.execute(bump).scalar()
+        metrics.incr("shards.id_blocks")
+        return end - n, end
+
+    def max_id(self, table: str) -> int:
+        column = SHARDED[table].__table__.c.id
+        best = 0
+        for key in [None] + self.binds:
+            with db.engines[key].connect() as conn:
+                best = max(best, conn.execute(select(func.max(column))).scalar() or 0)
+        return best
+
+
+def _router():
+    return current_app.extensions.get("shard_router") if has_app_context() else None
+
+
+def enabled() -> bool:
+    return _router() is not None
+
+
+@contextmanager
+def use_shard(shard):
+    """Enruta event/task a `shard` dentro del bloque (None no cambia nada)."""
+    if shard is None:
+        yield
+        return
+    token = _forced_shard.set(shard)
+    try:
+        yield
+    finally:
+        _forced_shard.reset(token)
+
+
+@contextmanager
+def for_user(user_id):
+    """Enruta event/task al shard del usuario (trabajos, CLI, sincronización)."""
+    router = _router()
+    shard = None
+    if router is not None and user_id is not None:
+        shard = router.shards_for(db.session, [user_id])[user_id]
+    with use_shard(shard):
+        yield
+
+
+def pin_request(shard: str):
+    """Enruta event/task a `shard` durante el resto de la petición."""
+    g.request_shard = shard
+
+
+def split_users(user_ids) -> list:
+    """[(shard, [user_id, ...])] por shard; sin shards, [(None, todos)]."""
+    user_ids = sorted(set(user_ids))
+    router = _router()
+    if router is None:
+        return [(None, user_ids)]
+    groups = {}
+    for user_id, shard in router.shards_for(db.session, user_ids).items():
+        groups.setdefault(shard, []).append(user_id)
+    return sorted(groups.items())
+
+
+def scatter(query, user_ids) -> list:
+    """query.all() en cada shard con datos de alguno de los usuarios (uno solo sin shards)."""
+    results = []
+    for shard, _ in split_users(user_ids):
+        with use_shard(shard):
+            results.extend(query.all())
+    return results
+
+
+def assign_ids(model, rows: list) -> list:
+    """Para INSERT masivos: coloca a sus usuarios y da id a las filas que no lo traen."""
+    router = _router()
+    if router is None or model.__tablename__ not in SHARDED:
+        return rows
+    pending = [row for row in rows if row.get("id") is None]
+    for row, new_id in zip(pending, router.next_ids(model.__tablename__, len(pending))):
+        row["id"] = new_id
+    router.shards_for(db.session, {row["user_id"] for row in rows}, place=True)
+    return rows
+
+
+def insert_rows(model, rows: list):
+    """INSERT masivo de filas de event/task repartidas entre los shards de sus usuarios."""
+    router = _router()
+    if router is None:
+        db.session.execute(insert(model.__table__), rows)
+        return
+    assign_ids(model, rows)
+    placed = router.shards_for(db.session, {row["user_id"] for row in rows})
+    groups = {}
+    for row in rows:
+        groups.setdefault(placed[row["user_id"]], []).append(row)
+    for shard, group in groups.items():
+        db.session.execute(insert(model.__table__), group,
+                           bind_arguments={"bind": db.engines[shard]})
+
+
+def next_free_id(model) -> int:
+    """Primer id libre de event/task en todas las bases y en la secuencia (seed)."""
+    with db.engines[None].connect() as conn:
+        reserved = conn.execute(select(_SEQUENCE.c.next_id).where(
+            _SEQUENCE.c.name == model.__tablename__)).scalar() or 0
+    return max(reserved, _router().max_id(model.__tablename__) + 1)
+
+
+def reset_id_sequences():
+    """Tras insertar con ids explícitos, la secuencia pasa detrás del id más alto."""
+    router = _router()
+    if router is None:
+        return
+    for name in SHARDED:
+        start = router.max_id(name) + 1
+        with db.engines[None].begin() as conn:
+            conn.execute(_insert_ignore(conn, _SEQUENCE), {"name": name, "next_id": start})
+            conn.execute(update(_SEQUENCE).where(_SEQUENCE.c.name == name,
+                                                 _SEQUENCE.c.next_id < start)
+                         .values(next_id=start))
+
+
+def _prepare_flush(session, flush_context, instances):
+    router = _router()
+    if router is None:
+        return
+    objs = [obj for obj in session.new | session.dirty | session.deleted
+            if isinstance(obj, (Event, Task))]
+    session.info.pop("flush_shard", None)
+    if not objs:
+        return
+    # Primero los ids: la reserva usa otra conexión y no debe esperar a esta transacción
+    for model in (Event, Task):
+        new = [obj for obj in objs if isinstance(obj, model) and obj in session.new
+               and obj.id is None]
+        if new:
+            for obj, new_id in zip(new, router.next_ids(model.__tablename__, len(new))):
+                obj.id = new_id
+    shards = set(router.shards_for(session, {obj.user_id for obj in objs},
+                                   place=True).values())
+    if len(shards) > 1:
+        raise RuntimeError("Un flush no puede escribir eventos/tareas en varios shards")
+    session.info["flush_shard"] = shards.pop()
+
+
+# insert=True: antes que los demás before_flush (los rollups ya escriben en el primario)
+event.listen(Session, "before_flush", _prepare_flush, insert=True)
+
+
+# ---------- esquema y rebalanceo ----------
+
+def shard_metadata() -> MetaData:
+    """Tablas event y task con sus índices, sin claves foráneas (los padres no están)."""
+    metadata = MetaData()
+    for model in SHARDED.values():
+        source = model.__table__
+        table = Table(source.name, metadata, *[
+            Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable,
+                   autoincrement=False)
+            for c in source.columns])
+        for index in source.indexes:
+            Index(index.name, *[table.c[c.name] for c in index.columns], unique=index.unique)
+    return metadata
+
+
+def init_shards() -> list:
+    """Crea las tablas que falten en cada shard; devuelve los binds."""
+    router = _router()
+    if router is None:
+        raise RuntimeError("DATABASE_SHARD_URLS no está configurado")
+    metadata = shard_metadata()
+    for shard in router.binds:
+        metadata.create_all(db.engines[shard])
+    return router.binds
+
+
+def _legacy_users() -> set:
+    """Usuarios con eventos o tareas aún en las tablas del primario."""
+    primary = {"bind": db.engines[None]}
+    users = set()
+    for model in SHARDED.values():
+        users |= set(db.session.scalars(select(model.user_id).distinct(),
+                                        bind_arguments=primary))
+    return users
+
+
+def _moves(router, batch: int, user_ids=None):
+    """Lotes de (user_id, origen, destino); origen None = tablas del primario."""
+    legacy = _legacy_users()
+    if user_ids:
+        legacy &= set(user_ids)
+    current = dict(db.session.execute(
+        select(_DIRECTORY.c.user_id, _DIRECTORY.c.shard)
+        .where(_DIRECTORY.c.user_id.in_(legacy))).all()) if legacy else {}
+    # Al migrar del primario se respeta el shard que el usuario ya tuviera
+    moves = [(user_id, None, current.get(user_id) or router.hash_shard(user_id))
+             for user_id in sorted(legacy)]
+    for i in range(0, len(moves), batch):
+        yield moves[i:i + batch]
+
+    last_id = 0
+    while True:
+        query = (select(_DIRECTORY.c.user_id, _DIRECTORY.c.shard, _DIRECTORY.c.moving)
+                 .where(_DIRECTORY.c.user_id > last_id)
+                 .order_by(_DIRECTORY.c.user_id).limit(batch))
+        if user_ids:
+            query = query.where(_DIRECTORY.c.user_id.in_(user_ids))
+        rows = db.session.execute(query).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        # moving sin cambio de shard: una ejecución anterior cortada; solo se desmarca
+        moves = [(user_id, shard, router.hash_shard(user_id))
+                 for user_id, shard, moving in rows
+                 if user_id not in legacy and (moving or shard != router.hash_shard(user_id))]
+        if moves:
+            yield moves
+
+
+def _mark_moving(moves: list):
+    now = datetime.utcnow()
+    with db.engines[None].begin() as conn:
+        conn.execute(_insert_ignore(conn, _DIRECTORY), [
+            {"user_id": user_id, "shard": target, "moving": True, "updated_at": now}
+            for user_id, _, target in moves])
+        conn.execute(update(_DIRECTORY)
+                     .where(_DIRECTORY.c.user_id.in_([user_id for user_id, _, _ in moves]))
+                     .values(moving=True, updated_at=now))
+
+
+def _move_user(user_id: int, source, target: str, rows_batch: int) -> dict:
+    copied = {name: 0 for name in SHARDED}
+    if source != target:
+        with db.engines[source].connect() as src:
+            for name, model in SHARDED.items():
+                table = model.__table__
+                last_id = 0
+                while True:
+                    rows = [dict(row) for row in src.execute(
+                        select(table).where(table.c.user_id == user_id, table.c.id > last_id)
+                        .order_by(table.c.id).limit(rows_batch)).mappings()]
+                    if not rows:
+                        break
+                    last_id = rows[-1]["id"]
+                    # Borrar antes lo ya copiado por un intento anterior lo hace repetible
+                    with db.engines[target].begin() as dst:
+                        dst.execute(delete(table).where(
+                            table.c.id.in_([row["id"] for row in rows])))
+                        dst.execute(insert(table), rows)
+                    copied[name] += len(rows)
+
+    with db.engines[None].begin() as conn:
+        conn.execute(update(_DIRECTORY).where(_DIRECTORY.c.user_id == user_id)
+                     .values(shard=target, moving=False, updated_at=datetime.utcnow()))
+    if source != target:
+        with db.engines[source].begin() as src:
+            for model in SHARDED.values():
+                src.execute(delete(model.__table__).where(model.__table__.c.user_id == user_id))
+    return copied
+
+
+def rebalance(batch: int = 100, rows_batch: int = 1000, user_ids=None,
+              dry_run: bool = False, progress=None) -> dict:
+    """
+    Mueve a cada usuario al shard que le toca por hash, por lotes de `batch` usuarios
+    (una espera de SHARD_DIRECTORY_TTL por lote) copiando de `rows_batch` en `rows_batch`.
+    """
+    router = _router()
+    if router is None:
+        raise RuntimeError("DATABASE_SHARD_URLS no está configurado")
+    totals = {"users": 0, "events": 0, "tasks": 0, "moves": {}}
+    for moves in _moves(router, batch, user_ids):
+        if not dry_run:
+            _mark_moving(moves)
+            router.forget(user_id for user_id, _, _ in moves)
+            time.sleep(router.ttl)
+        for user_id, source, target in moves:
+            key = f"{source or 'primary'} -> {target}"
+            totals["moves"][key] = totals["moves"].get(key, 0) + 1
+            totals["users"] += 1
+            if dry_run:
+                continue
+            copied = _move_user(user_id, source, target, rows_batch)
+            totals["events"] += copied["event"]
+            totals["tasks"] += copied["task"]
+        router.forget(user_id for user_id, _, _ in moves)
+        metrics.incr("shards.moved_users", 0 if dry_run else len(moves))
+        if progress:
+            progress(totals)
+    return totals
+
+
+def status() -> dict:
+    """Usuarios por shard según el directorio (y cuántos están a medio mover)."""
+    router = _router()
+    if router is None:
+        raise RuntimeError("DATABASE_SHARD_URLS no está configurado")
+    report = {shard: {"users": 0, "moving": 0} for shard in router.binds}
+    for shard, moving, count in db.session.execute(
+            select(_DIRECTORY.c.shard, _DIRECTORY.c.moving, func.count())
+            .group_by(_DIRECTORY.c.shard, _DIRECTORY.c.moving)):
+        entry = report.setdefault(shard, {"users": 0, "moving": 0})
+        entry["users"] += count
+        if moving:
+            entry["moving"] += count
+    return report
+
+
+def setup_sharding(app):
+    binds = app.config.get("SHARD_BINDS") or []
+    if not binds:
+        return
+    app.extensions["shard_router"] = ShardRouter(
+        binds, float(app.config.get("SHARD_DIRECTORY_TTL", 5)),
+        int(app.config.get("SHARD_ID_BLOCK", 100)))
@@ -0,0 +1,207 @@
+"""
+Backend de caché compartido entre los workers de gunicorn de una misma máquina.
+
+Tabla hash de tamaño fijo en un fichero mapeado en memoria (mmap), por defecto en
+/dev/shm, sin servicios externos. Estructura del fichero:
+
+    [cabecera 64 B][contadores de generación: n_gens × u64][slots: n_slots × slot_size]
+
+- Los slots se agrupan en buckets de WAYS vías; al llenarse un bucket se expulsa
+  la entrada más antigua.
+- Cada slot lleva un número de secuencia (seqlock): impar mientras se escribe.
+  Las lecturas no toman locks; si la secuencia cambia durante la copia, se
+  descarta la lectura como un fallo de caché.
+- Las escrituras se serializan con flock (entre procesos) + un Lock (entre hilos).
+- Los contadores de generación viven en el propio fichero: un commit en un worker
+  incrementa el contador y las claves antiguas dejan de coincidir en todos.
+- Los valores se guardan comprimidos con zlib para que quepan más respuestas JSON.
+
+Solo POSIX (usa fcntl). Todos los workers deben usar la misma configuración. Un
+fichero existente nunca se redimensiona (otros procesos pueden tenerlo mapeado,
+p. ej. los workers viejos durante un reinicio escalonado): si su geometría no
+coincide se usa otro junto a él, con la geometría en el nombre
+(api-response-cache-<n_slots>x<slot_size>).
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from .metrics import metrics
+
+MAGIC = b"APICACHE"
+VERSION = 1
+WAYS = 4
+MAX_KEY_BYTES = 256
+
+_HEADER = struct.Struct("<8sIIIIQQ")   # magic, version, n_slots, slot_size, n_gens, sets, evictions
+_HEADER_SIZE = 64
+_SEQ = struct.Struct("<Q")
+_SLOT_HEAD = struct.Struct("<QQdHI")   # seq, key_hash, stored_at, key_len, value_len
+_SLOT_HEAD_SIZE = 32
+_U64 = struct.Struct("<Q")
+
+
+def _hash64(data: bytes) -> int:
+    # 0 se reserva para "slot vacío"
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little") or 1
+
+
+def default_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "api-response-cache")
+
+
+class SharedMemoryBackend:
+    name = "shared"
+
+    def __init__(self, path: str = None, n_slots: int = 4096,
+                 slot_size: int = 16 * 1024, n_gens: int = 65536):
+        self.path = path or default_path()
+        self.n_slots = max(WAYS, n_slots - n_slots % WAYS)
+        self.slot_size = slot_size
+        self.n_gens = n_gens
+        self.n_buckets = self.n_slots // WAYS
+        self._gens_off = _HEADER_SIZE
+        gens_end = self._gens_off + n_gens * 8
+        self._slots_off = (gens_end + 63) // 64 * 64
+        self.size = self._slots_off + self.n_slots * slot_size
+
+        self._thread_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            compatible = self._init_file()
+        if not compatible:
+            os.close(self._fd)
+            self.path = f"{self.path}-{self.n_slots}x{self.slot_size}"
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            with self._locked():
+                if not self._init_file():
+                    raise RuntimeError(f"{self.path} tiene otra geometría o versión")
+        self._mm = mmap.mmap(self._fd, self.size)
+
+    # ---------- fichero ----------
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            if os.getpid() != self._pid:
+                # Tras un fork (gunicorn --preload) el descriptor es compartido con el
+                # padre y flock no excluiría entre ambos: cada proceso abre el suyo
+                self._fd = os.open(self.path, os.O_RDWR)
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _init_file(self) -> bool:
+        """El primer proceso crea el fichero; los demás validan que coincide."""
+        expected = (MAGIC, VERSION, self.n_slots, self.slot_size, self.n_gens)
+        size = os.fstat(self._fd).st_size
+        if size == 0:
+            # Fichero nuevo: se crea vacío (disperso)
+            os.ftruncate(self._fd, self.size)
+            os.pwrite(self._fd, _HEADER.pack(*expected, 0, 0), 0)
+            return True
+        header = os.pread(self._fd, _HEADER.size, 0)
+        return (size == self.size and len(header) == _HEADER.size
+                and _HEADER.unpack(header)[:5] == expected)
+
+    def _header_add(self, index: int, value: int):
+        # index 5 = sets, 6 = evictions (se llama con el lock tomado)
+        header = list(_HEADER.unpack_from(self._mm, 0))
+        header[index] += value
+        _HEADER.pack_into(self._mm, 0, *header)
+
+    def _slot_off(self, slot: int) -> int:
+        return self._slots_off + slot * self.slot_size
+
+    @staticmethod
+    def _key_bytes(key: str) -> bytes:
+        kb = key.encode("utf-8")
+        return kb if len(kb) <= MAX_KEY_BYTES else hashlib.sha256(kb).digest()
+
+    # ---------- interfaz de backend ----------
+
+    def get(self, key: str):
+        kb = self._key_bytes(key)
+        h = _hash64(kb)
+        first = (h % self.n_buckets) * WAYS
+        for slot in range(first, first + WAYS):
+            off = self._slot_off(slot)
+            seq1, key_hash, _, key_len, value_len = _SLOT_HEAD.unpack_from(self._mm, off)
+            if key_hash != h or seq1 & 1:
+                continue
+            data_off = off + _SLOT_HEAD_SIZE
+            stored_key = self._mm[data_off:data_off + key_len]
+            value = self._mm[data_off + key_len:data_off + key_len + value_len]
+            seq2 = _SEQ.unpack_from(self._mm, off)[0]
+            if seq1 != seq2:
+                metrics.incr("cache.shared.torn_reads")
+                return None
+            if stored_key == kb:
+                try:
+                    return zlib.decompress(value)
+                except zlib.error:
+                    return None
+        return None
+
+    def set(self, key: str, value: bytes):
+        kb = self._key_bytes(key)
+        packed = zlib.compress(value, 1)
+        if _SLOT_HEAD_SIZE + len(kb) + len(packed) > self.slot_size:
+            metrics.incr("cache.shared.too_large")
+            return
+        h = _hash64(kb)
+        first = (h % self.n_buckets) * WAYS
+
+        with self._locked():
+            target, oldest = None, None
+            for slot in range(first, first + WAYS):
+                _, key_hash, stored_at, _, _ = _SLOT_HEAD.unpack_from(
+                    self._mm, self._slot_off(slot))
+                if key_hash == h or key_hash == 0:
+                    target = slot
+                    break
+                if oldest is None or stored_at < oldest[1]:
+                    oldest = (slot, stored_at)
+            if target is None:
+                target = oldest[0]
+                self._header_add(6, 1)
+
+            off = self._slot_off(target)
+            seq = _SEQ.unpack_from(self._mm, off)[0]
+            _SEQ.pack_into(self._mm, off, seq + 1)          # impar: escribiendo
+            data_off = off + _SLOT_HEAD_SIZE
+            self._mm[data_off:data_off + len(kb)] = kb
+            self._mm[data_off + len(kb):data_off + len(kb) + len(packed)] = packed
+            _SLOT_HEAD.pack_into(self._mm, off, seq + 1, h, time.time(), len(kb), len(packed))
+            _SEQ.pack_into(self._mm, off, seq + 2)          # par: consistente
+            self._header_add(5, 1)
+
+    def _gen_off(self, namespace: str) -> int:
+        # Colisiones de índice solo provocan invalidaciones de más, nunca datos viejos
+        index = _hash64(namespace.encode("utf-8")) % self.n_gens
+        return self._gens_off + index * 8
+
+    def generation(self, namespace: str) -> int:
+        return _U64.unpack_from(self._mm, self._gen_off(namespace))[0]
+
+    def bump(self, namespace: str):
+        off = self._gen_off(namespace)
+        with self._locked():
+            _U64.pack_into(self._mm, off, _U64.unpack_from(self._mm, off)[0] + 1)
+
+    def stats(self) -> dict:
+        _, _, n_slots, slot_size, _, sets, evictions = _HEADER.unpack_from(self._mm, 0)
+        return {"path": self.path, "slots": n_slots, "slot_bytes": slot_size,
+                "sets": sets, "evictions": evictions}
@@ -0,0 +1,119 @@
+"""
+Servido eficiente del build del frontend (carpeta dist/).
+
+Al arrancar se indexa dist/ en memoria, así que cada petición es un lookup en un
+dict en lugar de un os.path.isfile:
+- Los assets con hash de contenido de Vite (assets/index-AbC12xYz.js) se sirven
+  con Cache-Control inmutable de un año: su nombre cambia si cambia el contenido.
+- El resto (favicon, imágenes sueltas...) se revalida con ETag.
+- Si existen variantes precomprimidas (.br / .gz) y el cliente las acepta, se
+  sirven en su lugar con Content-Encoding.
+- index.html se guarda en memoria con su ETag y responde 304 si no ha cambiado.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response, abort, request, send_file
+
+# Vite genera nombres tipo "index-BqX3r1_k.js" dentro de assets/
+_HASHED_NAME = re.compile(r"[.-][A-Za-z0-9_-]{8,}\.\w+$")
+_IMMUTABLE = "public, max-age=31536000, immutable"
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class StaticAsset:
+    __slots__ = ("path", "mimetype", "etag", "hashed", "variants")
+
+    def __init__(self, path: str, rel_path: str):
+        st = os.stat(path)
+        self.path = path
+        self.mimetype = mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+        self.etag = f"{int(st.st_mtime)}-{st.st_size}"
+        self.hashed = rel_path.startswith("assets/") and bool(
+            _HASHED_NAME.search(rel_path))
+        self.variants = {}
+        for encoding, suffix in _ENCODINGS:
+            if os.path.isfile(path + suffix):
+                self.variants[encoding] = path + suffix
+
+
+class StaticIndex:
+    def __init__(self, root: str):
+        self.root = os.path.realpath(root)
+        self.assets = {}
+        self.index_html = None
+        self.index_etag = None
+        self._root_mtime = None
+        self.refresh()
+
+    def refresh(self):
+        """(Re)construye el índice. Se llama al arrancar y si dist/ cambia."""
+        assets = {}
+        if os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    if name.endswith((".br", ".gz")):
+                        continue  # se registran como variantes de su original
+                    full = os.path.join(dirpath, name)
+                    rel = os.path.relpath(full, self.root).replace(os.sep, "/")
+                    assets[rel] = StaticAsset(full, rel)
+            self._root_mtime = os.stat(self.root).st_mtime
+        self.assets = assets
+
+        index_path = os.path.join(self.root, "index.html")
+        if os.path.isfile(index_path):
+            with open(index_path, "rb") as f:
+                self.index_html = f.read()
+            self.index_etag = hashlib.sha1(self.index_html).hexdigest()
+        else:
+            self.index_html = None
+            self.index_etag = None
+
+    def _stale(self) -> bool:
+        # Solo se consulta ante un fallo de lookup (p. ej. tras un `npm run build` sin reiniciar)
+        try:
+            return os.stat(self.root).st_mtime != self._root_mtime
+        except OSError:
+            return False
+
+    def serve_index(self) -> Response:
+        if self.index_html is None:
+            abort(404)
+        response = Response(self.index_html, mimetype="text/html")
+        response.set_etag(self.index_etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
+    def serve(self, path: str) -> Response:
+        asset = self.assets.get(path)
+        if asset is None and self._stale():
+            self.refresh()
+            asset = self.assets.get(path)
+        if asset is None:
+            # Rutas del SPA (React Router) devuelven index.html
+            return self.serve_index()
+
+        file_path, etag, encoding = asset.path, asset.etag, None
+        if asset.variants:
+            accepted = request.accept_encodings
+            for candidate, variant_path in asset.variants.items():
+                if accepted[candidate]:
+                    file_path, encoding = variant_path, candidate
+                    etag = f"{asset.etag}-{candidate}"
+                    break
+
+        response = send_file(file_path, mimetype=asset.mimetype,
+                             download_name=os.path.basename(asset.path),
+                             conditional=True, etag=etag)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if asset.variants:
+            response.vary.add("Accept-Encoding")
+
+        if asset.hashed:
+            response.headers["Cache-Control"] = _IMMUTABLE
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
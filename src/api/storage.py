@@ -0,0 +1,218 @@
+"""
+Almacenamiento de ficheros subidos (fotos de perfil y sus miniaturas).
+
+Los backends se eligen con STORAGE_BACKEND y comparten la misma interfaz:
+- writer(key)          escritor por bloques: write() ... commit() (o abort())
+- save(key, data)      guarda bytes de una vez (miniaturas)
+- open(key)            fichero binario de lectura (FileNotFoundError si no existe)
+- response(key, ...)   respuesta HTTP que sirve el fichero
+- url(key)             URL pública
+- delete_prefix(p)     borra todo lo que cuelga de un prefijo
+
+Backends:
+- "local":      sistema de ficheros bajo STORAGE_LOCAL_ROOT, servido por la API
+                (GET /api/media/<key>). Es el de desarrollo y tests.
+- "cloudinary": sube a Cloudinary (CLOUDINARY_URL) y sirve con redirección a su CDN.
+
+Las claves son rutas relativas ("avatars/12/ab34.../original.jpg"); nunca se
+reescribe una clave existente, así los ficheros se pueden cachear para siempre.
+Se pueden añadir backends con register_backend().
+"""
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from urllib.request import urlopen
+
+from flask import redirect, send_file
+
+_KEY_RE = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_./-]*$")
+_BACKENDS = {}
+_storage = None
+
+
+def register_backend(name: str):
+    def decorator(cls):
+        _BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def _check_key(key: str) -> str:
+    if not _KEY_RE.match(key) or ".." in key.split("/"):
+        raise ValueError(f"Clave de almacenamiento no válida: {key!r}")
+    return key
+
+
+@register_backend("local")
+class LocalStorage:
+    name = "local"
+
+    def __init__(self, root: str, base_url: str = "/api/media"):
+        self.root = os.path.realpath(root)
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(self.root, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["STORAGE_LOCAL_ROOT"], config.get("STORAGE_BASE_URL", "/api/media"))
+
+    def path(self, key: str) -> str:
+        path = os.path.realpath(os.path.join(self.root, _check_key(key)))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Clave de almacenamiento no válida: {key!r}")
+        return path
+
+    def writer(self, key: str):
+        return _LocalWriter(self.path(key))
+
+    def save(self, key: str, data: bytes):
+        with self.writer(key) as w:
+            w.write(data)
+            w.commit()
+
+    def open(self, key: str):
+        return open(self.path(key), "rb")
+
+    def response(self, key: str, max_age: int):
+        path = self.path(key)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(key)
+        # conditional: ETag/Last-Modified y Range los resuelve send_file
+        response = send_file(path, conditional=True, max_age=max_age)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{_check_key(key)}"
+
+    def delete_prefix(self, prefix: str):
+        shutil.rmtree(self.path(prefix.rstrip("/")), ignore_errors=True)
+
+
+class _LocalWriter:
+    """Escribe en un temporal junto al destino y lo renombra (atómico) al confirmar."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._tmp = f"{path}.{uuid.uuid4().hex}.part"
+        self._file = open(self._tmp, "wb")
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self.size += len(data)
+
+    def commit(self):
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._file.closed or os.path.exists(self._tmp):
+            self.abort()
+        return False
+
+
+@register_backend("cloudinary")
+class CloudinaryStorage:
+    """Cloudinary (configurado con CLOUDINARY_URL). La subida se acumula en un
+    temporal en disco (SpooledTemporaryFile) y se envía al confirmar."""
+    name = "cloudinary"
+
+    def __init__(self, folder: str = ""):
+        import cloudinary.uploader  # noqa: F401  (dependencia del Pipfile)
+        self.folder = folder.strip("/")
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get("STORAGE_CLOUDINARY_FOLDER", ""))
+
+    def _public_id(self, key: str) -> str:
+        public_id = os.path.splitext(_check_key(key))[0]
+        return f"{self.folder}/{public_id}" if self.folder else public_id
+
+    def writer(self, key: str):
+        return _CloudinaryWriter(self, key)
+
+    def _upload(self, key: str, fileobj):
+        import cloudinary.uploader
+        cloudinary.uploader.upload(fileobj, public_id=self._public_id(key),
+                                   overwrite=False, resource_type="image")
+
+    def save(self, key: str, data: bytes):
+        self._upload(key, data)
+
+    def open(self, key: str):
+        return urlopen(self.url(key))
+
+    def response(self, key: str, max_age: int):
+        response = redirect(self.url(key), 302)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response
+
+    def url(self, key: str) -> str:
+        import cloudinary.utils
+        fmt = os.path.splitext(key)[1].lstrip(".") or None
+        return cloudinary.utils.cloudinary_url(self._public_id(key), format=fmt,
+                                               secure=True)[0]
+
+    def delete_prefix(self, prefix: str):
+        import cloudinary.api
+        cloudinary.api.delete_resources_by_prefix(self._public_id(prefix.rstrip("/")))
+
+
+class _CloudinaryWriter:
+    def __init__(self, storage: CloudinaryStorage, key: str):
+        self.storage = storage
+        self.key = key
+        self.size = 0
+        self._file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self.size += len(data)
+
+    def commit(self):
+        self._file.seek(0)
+        try:
+            self.storage._upload(self.key, self._file)
+        finally:
+            self._file.close()
+
+    def abort(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._file.closed:
+            self.abort()
+        return False
+
+
+def setup_storage(app):
+    global _storage
+    name = app.config.get("STORAGE_BACKEND", "local")
+    if name not in _BACKENDS:
+        raise RuntimeError(f"STORAGE_BACKEND desconocido: {name}")
+    _storage = _BACKENDS[name].from_config(app.config)
+    return _storage
+
+
+def get_storage():
+    if _storage is None:
+        raise RuntimeError("Almacenamiento no configurado (setup_storage)")
+    return _storage
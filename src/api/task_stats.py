@@ -0,0 +1,203 @@
+"""
+Estadísticas de tareas completadas (GET /api/stats/tasks) a partir de rollups diarios.
+
+La tabla task_completion_daily guarda, por usuario, día y grupo, cuántas tareas se
+completaron. Las consultas de estadísticas solo leen esa tabla (una fila por día y
+grupo con actividad), nunca la de tareas.
+
+Mantenimiento incremental: un listener before_flush mira las tareas nuevas,
+modificadas y borradas. Al pasar status a True se fija completed_at (y se borra al
+desmarcarla), y cada cambio que mueve la "clave de completado" (usuario, día de
+completed_at, grupo) se traduce en deltas -1/+1. Los deltas se aplican con un
+upsert (completed = completed + delta) en la misma transacción: si el commit
+falla, el rollup tampoco cambia. Así quedan cubiertos update_task,
+update_task_in_group y cualquier otra escritura por el ORM, sin tocar los handlers.
+
+Las escrituras masivas que no pasan por el flush (importación) recalculan los
+rollups de ese usuario con rebuild([user_id]). `flask rebuild-task-stats` hace
+lo mismo para todos los usuarios por lotes (backfill tras la migración o
+reparación). Borrar un grupo borra sus tareas y su parte del rollup en cascada.
+Con shards (api/sharding.py) las tareas no están en la base de los rollups: el
+recálculo lee los totales de cada shard y los inserta en el primario.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Date, delete, event, func, inspect, insert, literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import changes, sharding
+from .metrics import metrics
+from .models import db, Task, TaskCompletionDaily, User
+
+MAX_RANGE_DAYS = 366
+_ROLLUP = TaskCompletionDaily.__table__
+
+
+# ---------- mantenimiento incremental ----------
+
+def _previous(state, attr: str):
+    """Valor del atributo antes de los cambios pendientes de este flush."""
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else None
+
+
+def _key(user_id, task_group_id, completed_at):
+    if completed_at is None:
+        return None
+    return (user_id, task_group_id, completed_at.date())
+
+
+@event.listens_for(Session, "before_flush")
+def _track_completions(session, flush_context, instances):
+    deltas = {}
+    now = datetime.utcnow()
+    for obj in session.new | session.dirty | session.deleted:
+        if not isinstance(obj, Task):
+            continue
+        state = inspect(obj)
+        old = None
+        if obj not in session.new and _previous(state, "status"):
+            old = _key(_previous(state, "user_id"), _previous(state, "task_group_id"),
+                       _previous(state, "completed_at"))
+        new = None
+        if obj not in session.deleted:
+            if obj in session.new or state.attrs.status.history.has_changes():
+                if not obj.status:
+                    obj.completed_at = None
+                elif obj.completed_at is None or not state.attrs.completed_at.history.has_changes():
+                    obj.completed_at = now
+            if obj.status:
+                new = _key(obj.user_id, obj.task_group_id, obj.completed_at)
+        if old != new:
+            if old is not None:
+                deltas[old] = deltas.get(old, 0) - 1
+            if new is not None:
+                deltas[new] = deltas.get(new, 0) + 1
+    apply_deltas(session, {k: d for k, d in deltas.items() if d})
+
+
+def _upsert_statement(session):
+    dialect = session.get_bind(mapper=TaskCompletionDaily.__mapper__).dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(_ROLLUP)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(_ROLLUP)
+    else:
+        raise RuntimeError(f"Upsert no soportado en {dialect}")
+    return stmt.on_conflict_do_update(
+        index_elements=[_ROLLUP.c.user_id, _ROLLUP.c.day,
+                        # Literal (no parámetro) para que coincida con la expresión del índice
+                        func.coalesce(_ROLLUP.c.task_group_id, literal_column("0"))],
+        set_={"completed": _ROLLUP.c.completed + stmt.excluded.completed})
+
+
+def apply_deltas(session, deltas: dict):
+    """{(user_id, task_group_id, día): delta} → upsert sumando sobre el rollup."""
+    if not deltas:
+        return
+    session.execute(_upsert_statement(session), [
+        {"user_id": user_id, "task_group_id": group_id, "day": day, "completed": delta}
+        for (user_id, group_id, day), delta in deltas.items()])
+    metrics.incr("task_stats.deltas", len(deltas))
+
+
+# ---------- reconstrucción ----------
+
+def _user_batches(user_ids, batch: int):
+    if user_ids is not None:
+        ids = sorted(set(user_ids))
+        for i in range(0, len(ids), batch):
+            yield ids[i:i + batch]
+        return
+    last_id = 0
+    while True:
+        chunk = list(db.session.scalars(
+            select(User.id).where(User.id > last_id).order_by(User.id).limit(batch)))
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def rebuild(user_ids=None, batch: int = 1000, progress=None) -> dict:
+    """
+    Recalcula los rollups desde la tabla de tareas: de `user_ids` o de todos los
+    usuarios, por lotes de `batch` usuarios (un DELETE + INSERT ... SELECT y un
+    commit por lote; con shards, un SELECT por shard y un INSERT).
+    """
+    day = func.date(Task.completed_at, type_=Date)
+    columns = ["user_id", "task_group_id", "day", "completed"]
+    totals = {"users": 0, "rows": 0}
+    for chunk in _user_batches(user_ids, batch):
+        db.session.execute(delete(_ROLLUP).where(_ROLLUP.c.user_id.in_(chunk)))
+        for shard, ids in sharding.split_users(chunk):
+            query = (select(Task.user_id, Task.task_group_id, day, func.count())
+                     .where(Task.user_id.in_(ids), Task.status.is_(True),
+                            Task.completed_at.isnot(None))
+                     .group_by(Task.user_id, Task.task_group_id, day))
+            if shard is None:
+                result = db.session.execute(insert(_ROLLUP).from_select(columns, query))
+                totals["rows"] += max(result.rowcount or 0, 0)
+                continue
+            with sharding.use_shard(shard):
+                rows = [dict(zip(columns, row)) for row in db.session.execute(query)]
+            if rows:
+                db.session.execute(insert(_ROLLUP), rows)
+            totals["rows"] += len(rows)
+        for user_id in chunk:
+            changes.record(db.session, "task", user_id)
+        db.session.commit()
+        totals["users"] += len(chunk)
+        if progress:
+            progress(totals)
+    metrics.incr("task_stats.rebuilt_users", totals["users"])
+    return totals
+
+
+# ---------- lectura ----------
+
+def _streaks(active_days: set, start: date, end: date) -> dict:
+    longest = run = 0
+    day = start
+    while day <= end:
+        run = run + 1 if day in active_days else 0
+        longest = max(longest, run)
+        day += timedelta(days=1)
+    # La racha actual sigue viva aunque el último día aún no tenga tareas
+    current = 0
+    day = end if end in active_days else end - timedelta(days=1)
+    while day >= start and day in active_days:
+        current += 1
+        day -= timedelta(days=1)
+    return {"current": current, "longest": longest}
+
+
+def task_stats(user_id: int, start: date, end: date) -> dict:
+    """Completadas por día y por grupo, y rachas, entre start y end (incluidos)."""
+    rows = db.session.execute(
+        select(_ROLLUP.c.day, _ROLLUP.c.task_group_id, _ROLLUP.c.completed)
+        .where(_ROLLUP.c.user_id == user_id, _ROLLUP.c.day >= start,
+               _ROLLUP.c.day <= end, _ROLLUP.c.completed > 0)).all()
+    per_day, per_group = {}, {}
+    for day, group_id, completed in rows:
+        per_day[day] = per_day.get(day, 0) + completed
+        per_group[group_id] = per_group.get(group_id, 0) + completed
+
+    days = []
+    day = start
+    while day <= end:
+        days.append({"date": day.isoformat(), "completed": per_day.get(day, 0)})
+        day += timedelta(days=1)
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "total": sum(per_day.values()),
+        "days": days,
+        "groups": [{"task_group_id": group_id, "completed": completed}
+                   for group_id, completed in sorted(per_group.items(),
+                                                     key=lambda item: -item[1])],
+        "streaks": _streaks(set(per_day), start, end),
+    }
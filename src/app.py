@@ -2,16 +2,36 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, jsonify, send_from_directory
-from flask_migrate import Migrate
-from flask_swagger import swagger
+import sys
+import logging
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 import api.routesConfig
+import api.routesJobs
+import api.routesExport
+import api.routesImport
+import api.routesProfile
+import api.routesReminders
+import api.routesStream
+import api.routesSharing
+import api.routesScheduling
+import api.routesStats
 from api.utils import APIException, generate_sitemap
 from api.models import db
 from api.routes import api
-from api.admin import setup_admin
 from api.commands import setup_commands
+from api.querylog import setup_query_log
+from api.query_budget import setup_query_budget
+from api.static_assets import StaticIndex
+from api.compression import setup_compression
+from api.logs import setup_logging
+from api.db_routing import setup_read_replica
+from api.sharding import setup_sharding
+from api.cache import setup_cache
+from api.jobs import setup_jobs
+from api.storage import setup_storage
+from api.reminders import setup_reminders
+from api.push import setup_push
 from api.routesEvent import apiEvent
 from api.routesTasks import task
 from api.routesLateral import lateral
@@ -19,15 +39,50 @@ from api.routesLateral import lateral
 # Detect environment
 ENV = "development" if os.getenv("FLASK_DEBUG") == "1" else "production"
 
+# Modo de arranque: "lite" no importa subsistemas poco usados (migraciones, admin)
+# hasta que hacen falta, para reducir el cold start. Benchmark: `flask bench-startup`
+STARTUP_MODE = os.getenv(
+    "STARTUP_MODE", "full" if ENV == "development" else "lite")
+RUNNING_CLI = os.path.basename(sys.argv[0]) in ("flask", "flask.exe") or \
+    sys.argv[0].endswith(os.path.join("flask", "__main__.py"))
+
+
+def _cli_command(argv):
+    """Subcomando de `flask` (saltando opciones globales como --app app.py)."""
+    args = iter(argv[1:])
+    for arg in args:
+        if arg in ("--app", "-A", "--env-file", "-e"):
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg
+    return None
+
+
+# Hilos en segundo plano (trabajos, recordatorios): en el servidor, también con
+# `flask run`, pero no en los comandos puntuales (db upgrade, seed...)
+START_BACKGROUND = not RUNNING_CLI or _cli_command(sys.argv) == "run"
+# ADMIN_MODE: "on" (registro inmediato), "lazy" (al primer /admin) u "off"
+ADMIN_MODE = os.getenv("ADMIN_MODE", "on" if STARTUP_MODE == "full" else "lazy")
+
 # Static folder (for frontend build)
 static_file_dir = os.path.join(os.path.dirname(
     os.path.realpath(__file__)), '../dist/')
+static_index = StaticIndex(static_file_dir)
 app = Flask(__name__)
 app.url_map.strict_slashes = False
 
 # 🔑 Secret key para firmar tokens (usa variable de entorno o valor por defecto)
 app.config['SECRET_KEY'] = os.environ.get(
     'FLASK_APP_KEY', 'change-this-in-prod')
+# Usuarios con acceso interno (/api/metrics, exportar otras cuentas): ids separados por comas
+app.config['SUPPORT_USER_IDS'] = {
+    int(i) for i in os.getenv("SUPPORT_USER_IDS", "").split(",") if i.strip()}
+
+# Logging JSON en segundo plano (LOG_LEVEL, LOG_DEDUP_SECONDS)
+app.config['LOG_LEVEL'] = os.getenv("LOG_LEVEL", "INFO")
+app.config['LOG_DEDUP_SECONDS'] = float(os.getenv("LOG_DEDUP_SECONDS", "60"))
+setup_logging(app)
+error_logger = logging.getLogger("api.errors")
 
 # ===================== CORS - SIMPLE Y FUNCIONAL =====================
 CORS(app)  # Esto permite todos los orígenes automáticamente
@@ -41,12 +96,137 @@ if db_url is not None:
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
 
+# Réplica de lectura opcional: los GET leen de ella (salvo read-after-write)
+replica_url = os.getenv("DATABASE_REPLICA_URL")
+if replica_url:
+    app.config['SQLALCHEMY_BINDS'] = {
+        "replica": replica_url.replace("postgres://", "postgresql://")}
+app.config['REPLICA_STICKY_SECONDS'] = float(
+    os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+# Sharding opcional de event/task por usuario: un bind "shard_N" por URL
+shard_urls = [url.strip() for url in os.getenv("DATABASE_SHARD_URLS", "").split(",")
+              if url.strip()]
+app.config['SHARD_BINDS'] = [f"shard_{i}" for i in range(len(shard_urls))]
+for bind_key, url in zip(app.config['SHARD_BINDS'], shard_urls):
+    app.config.setdefault('SQLALCHEMY_BINDS', {})[bind_key] = url.replace(
+        "postgres://", "postgresql://")
+app.config['SHARD_DIRECTORY_TTL'] = float(os.getenv("SHARD_DIRECTORY_TTL", "5"))
+app.config['SHARD_ID_BLOCK'] = int(os.getenv("SHARD_ID_BLOCK", "100"))
+
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-MIGRATE = Migrate(app, db, compare_type=True)
 db.init_app(app)
+setup_read_replica(app)
+setup_sharding(app)
+
+# Caché de respuestas de los listados (invalidada por los commits)
+app.config['CACHE_BACKEND'] = os.getenv("CACHE_BACKEND", "memory")
+app.config['CACHE_MAX_ENTRIES'] = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+app.config['CACHE_MAX_BYTES'] = int(
+    os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+app.config['CACHE_TTL'] = float(os.getenv("CACHE_TTL", "60"))
+app.config['CACHE_SHM_PATH'] = os.getenv("CACHE_SHM_PATH")
+app.config['CACHE_SHM_SLOTS'] = int(os.getenv("CACHE_SHM_SLOTS", "4096"))
+app.config['CACHE_SHM_SLOT_BYTES'] = int(
+    os.getenv("CACHE_SHM_SLOT_BYTES", str(16 * 1024)))
+setup_cache(app)
+
+# Push SSE (GET /api/stream): heartbeat, duración máxima y conexiones por proceso
+app.config['STREAM_HEARTBEAT_SECONDS'] = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "20"))
+app.config['STREAM_MAX_SECONDS'] = float(os.getenv("STREAM_MAX_SECONDS", "3600"))
+app.config['STREAM_MAX_CONNECTIONS'] = int(os.getenv("STREAM_MAX_CONNECTIONS", "1000"))
+app.config['STREAM_BACKLOG'] = int(os.getenv("STREAM_BACKLOG", "64"))
+app.config['PUSH_RELAY'] = os.getenv("PUSH_RELAY", "none")
+setup_push(app)
+
+# Flask-Migrate (alembic) solo hace falta para `flask db ...`
+if STARTUP_MODE == "full" or RUNNING_CLI:
+    from flask_migrate import Migrate
+    MIGRATE = Migrate(app, db, compare_type=True)
+
+# Slow-query log: umbral en ms (0 lo desactiva) y fichero rotativo de salida
+app.config['SLOW_QUERY_MS'] = float(os.getenv("SLOW_QUERY_MS", "200"))
+app.config['SLOW_QUERY_LOG'] = os.getenv(
+    "SLOW_QUERY_LOG", "/tmp/slow_queries.log")
+app.config['SLOW_QUERY_EXPLAIN'] = os.getenv("SLOW_QUERY_EXPLAIN", "1")
+setup_query_log(app)
+
+# Detector de N+1 / presupuesto de consultas por petición (solo desarrollo y tests)
+app.config['QUERY_BUDGET_MODE'] = os.getenv("QUERY_BUDGET_MODE", "off")
+app.config['QUERY_BUDGET_DEFAULT'] = int(os.getenv("QUERY_BUDGET_DEFAULT", "0"))
+app.config['QUERY_BUDGET_REPEAT'] = int(os.getenv("QUERY_BUDGET_REPEAT", "3"))
+setup_query_budget(app)
+
+# Trabajos en segundo plano (pool de hilos en este proceso; 0 lo desactiva)
+app.config['JOBS_WORKERS'] = int(os.getenv("JOBS_WORKERS", "2"))
+app.config['JOBS_POLL_SECONDS'] = float(os.getenv("JOBS_POLL_SECONDS", "2"))
+app.config['JOBS_LEASE_SECONDS'] = float(os.getenv("JOBS_LEASE_SECONDS", "300"))
+app.config['JOBS_ASYNC_DELETE_THRESHOLD'] = int(
+    os.getenv("JOBS_ASYNC_DELETE_THRESHOLD", "5000"))
+setup_jobs(app, start=START_BACKGROUND)
+
+# Recordatorios: scan por índice de la ventana próxima + heap; envía solo el líder
+app.config['REMINDERS_ENABLED'] = os.getenv("REMINDERS_ENABLED", "1") == "1"
+app.config['REMINDER_NOTIFIER'] = os.getenv("REMINDER_NOTIFIER", "log")
+app.config['REMINDER_WEBHOOK_URL'] = os.getenv("REMINDER_WEBHOOK_URL")
+app.config['REMINDERS_WINDOW_SECONDS'] = float(os.getenv("REMINDERS_WINDOW_SECONDS", "600"))
+app.config['REMINDERS_POLL_SECONDS'] = float(os.getenv("REMINDERS_POLL_SECONDS", "30"))
+app.config['REMINDERS_LEASE_SECONDS'] = float(os.getenv("REMINDERS_LEASE_SECONDS", "60"))
+app.config['REMINDERS_GRACE_SECONDS'] = float(os.getenv("REMINDERS_GRACE_SECONDS", "3600"))
+setup_reminders(app, start=START_BACKGROUND)
+
+# Buscador de huecos (POST /api/scheduling/find-slots)
+app.config['SCHEDULING_MAX_PARTICIPANTS'] = int(os.getenv("SCHEDULING_MAX_PARTICIPANTS", "20"))
+app.config['SCHEDULING_MAX_DAYS'] = int(os.getenv("SCHEDULING_MAX_DAYS", "31"))
+# Hasta cuántos días antes del rango se buscan eventos largos que lo solapen
+app.config['SCHEDULING_LOOKBEHIND_DAYS'] = int(os.getenv("SCHEDULING_LOOKBEHIND_DAYS", "31"))
+
+# Exportación en streaming: filas leídas por bloque con cursor en servidor
+app.config['EXPORT_CHUNK_SIZE'] = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+# Importación: filas por INSERT/UPDATE masivo (y por commit) y errores devueltos
+app.config['IMPORT_CHUNK_SIZE'] = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+app.config['IMPORT_MAX_ERRORS'] = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+# Almacenamiento de fotos de perfil (local | cloudinary) y límites de subida
+app.config['STORAGE_BACKEND'] = os.getenv("STORAGE_BACKEND", "local")
+app.config['STORAGE_LOCAL_ROOT'] = os.getenv(
+    "STORAGE_LOCAL_ROOT", os.path.join(os.path.dirname(os.path.realpath(__file__)), '../media'))
+app.config['STORAGE_BASE_URL'] = os.getenv("STORAGE_BASE_URL", "/api/media")
+app.config['STORAGE_CLOUDINARY_FOLDER'] = os.getenv("STORAGE_CLOUDINARY_FOLDER", "")
+app.config['PROFILE_PIC_MAX_BYTES'] = int(os.getenv("PROFILE_PIC_MAX_BYTES", str(5 * 1024 * 1024)))
+app.config['PROFILE_THUMB_SIZES'] = os.getenv("PROFILE_THUMB_SIZES", "64,256")
+app.config['MEDIA_MAX_AGE'] = int(os.getenv("MEDIA_MAX_AGE", "31536000"))
+setup_storage(app)
+
+# Sincronización con Google Calendar (URLs configurables para usar un servidor local)
+app.config['GOOGLE_API_BASE_URL'] = os.getenv(
+    "GOOGLE_API_BASE_URL", "https://www.googleapis.com/calendar/v3")
+app.config['GOOGLE_TOKEN_URL'] = os.getenv(
+    "GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+app.config['GOOGLE_CLIENT_ID'] = os.getenv("GOOGLE_CLIENT_ID")
+app.config['GOOGLE_CLIENT_SECRET'] = os.getenv("GOOGLE_CLIENT_SECRET")
+app.config['GOOGLE_SYNC_WORKERS'] = int(os.getenv("GOOGLE_SYNC_WORKERS", "4"))
+app.config['GOOGLE_SYNC_PAGE_SIZE'] = int(os.getenv("GOOGLE_SYNC_PAGE_SIZE", "2500"))
+app.config['GOOGLE_SYNC_MAX_RETRIES'] = int(os.getenv("GOOGLE_SYNC_MAX_RETRIES", "5"))
+app.config['GOOGLE_SYNC_TIMEOUT'] = float(os.getenv("GOOGLE_SYNC_TIMEOUT", "30"))
+
+# Compresión gzip/brotli de respuestas JSON grandes
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+app.config['COMPRESS_LEVEL'] = int(os.getenv("COMPRESS_LEVEL", "6"))
+if os.getenv("COMPRESS_MIMETYPES"):
+    app.config['COMPRESS_MIMETYPES'] = [
+        m.strip() for m in os.getenv("COMPRESS_MIMETYPES").split(",") if m.strip()]
+setup_compression(app)
 
 # Add the admin
-setup_admin(app)
+if ADMIN_MODE == "on":
+    from api.admin import setup_admin
+    setup_admin(app)
+elif ADMIN_MODE == "lazy":
+    from werkzeug.middleware.dispatcher import DispatcherMiddleware
+    from api.lazy_admin import LazyAdminApp
+    app.wsgi_app = DispatcherMiddleware(
+        app.wsgi_app, {'/admin': LazyAdminApp(app)})
 
 # Add CLI commands
 setup_commands(app)
@@ -69,11 +249,9 @@ def handle_invalid_usage(error):
 
 @app.errorhandler(Exception)
 def handle_unexpected_error(err):
-    try:
-        import traceback
-        print("UNHANDLED ERROR:", traceback.format_exc())
-    except Exception:
-        pass
+    # Se encola y lo escribe el hilo de logging (JSON, con request_id y deduplicado)
+    error_logger.error("Unhandled error", exc_info=err,
+                       extra={"method": request.method, "path": request.path})
     return jsonify({"message": "Internal Server Error", "detail": str(err)}), 500
 
 # Generate sitemap with all your endpoints
@@ -83,18 +261,14 @@ def handle_unexpected_error(err):
 def sitemap():
     if ENV == "development":
         return generate_sitemap(app)
-    return send_from_directory(static_file_dir, 'index.html')
+    return static_index.serve_index()
 
-# Any other endpoint will try to serve it like a static file
+# Any other endpoint will try to serve it like a static file (índice en memoria de dist/)
 
 
 @app.route('/<path:path>', methods=['GET'])
 def serve_any_other_file(path):
-    if not os.path.isfile(os.path.join(static_file_dir, path)):
-        path = 'index.html'
-    response = send_from_directory(static_file_dir, path)
-    response.cache_control.max_age = 0  # avoid cache memory
-    return response
+    return static_index.serve(path)
 
 
 # @app.route('/assets/<path:filename>')